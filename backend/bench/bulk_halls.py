@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import statistics
+import time
+from bench import common
+
+# Hall creation time by hall size (python -m bench.bulk_halls).
+# - bulk: crud.create_hall, one transaction with all seats in one batched insert
+# - per_row: one INSERT per seat, as before the bulk path, for comparison
+# Each size is created `--repeat` times and the median is reported.
+
+SIZES = {100: (10, 10), 1000: (25, 40), 5000: (50, 100)}
+
+async def _create_per_row(hall) -> None:
+    import crud
+    import models
+    from database import database
+    values = crud._hall_values(hall)
+    hall_id = await database.execute(models.Hall.__table__.insert().values(**values).returning(models.Hall.id))
+    for seat in crud._hall_seats(hall_id, values):
+        await database.execute(models.Seat.__table__.insert().values(is_active=True, **seat))
+
+async def variant(sizes, repeat: int) -> dict:
+    import crud
+    import schemas
+    from database import database
+    await database.connect()
+    rows = []
+    try:
+        for size in sizes:
+            rows_count, seats_per_row = SIZES[size]
+            timings = {"bulk": [], "per_row": []}
+            for i in range(repeat):
+                for method, create in (("bulk", crud.create_hall), ("per_row", _create_per_row)):
+                    hall = schemas.HallCreate(
+                        name=f"Bench {method} {size} #{i}", capacity=size, rows=rows_count, seats_per_row=seats_per_row
+                    )
+                    started = time.perf_counter()
+                    await create(hall)
+                    timings[method].append(time.perf_counter() - started)
+            bulk, per_row = (statistics.median(timings[m]) * 1000 for m in ("bulk", "per_row"))
+            rows.append({"seats": size, "bulk_ms": round(bulk, 1), "per_row_ms": round(per_row, 1), "speedup": round(per_row / bulk, 1)})
+    finally:
+        await database.disconnect()
+    return {"rows": rows}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variant", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--sizes", type=int, nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="short run for the test suite")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.sizes, args.repeat = [100, 1000], 2
+
+    if args.variant:
+        common.prepare()
+        common.report(asyncio.run(variant(args.sizes, args.repeat)))
+        return
+
+    result = common.run_variant("bulk_halls", args=["--sizes", *map(str, args.sizes), "--repeat", str(args.repeat)])
+    print(f"Hall creation time (median of {args.repeat})")
+    common.print_table(result["rows"], ["seats", "bulk_ms", "per_row_ms", "speedup"])
+    common.report(result)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+# Shared setup for the benchmarks. Every benchmark is a module run from backend/
+# (python -m bench.<name>). The backend reads its settings at import time, so a
+# comparison (e.g. logging on vs off) runs each variant in its own process with
+# its own environment and a fresh SQLite database; the variant prints its numbers
+# as a RESULT line and the parent prints the comparison.
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Settings every benchmark process starts from; variants override them
+BASE_SETTINGS = {
+    "LOG_LEVEL": "WARNING",
+    "RATE_LIMIT_ENABLED": "0",
+    "SLOW_QUERY_MS": "0",
+    "SEAT_HOLD_SWEEP_INTERVAL_SECONDS": "3600",
+    "REVOCATION_SYNC_SECONDS": "3600",
+}
+
+def prepare(seed: bool = True) -> str:
+    # Points the backend at a fresh database in a temporary directory; call before
+    # importing any backend module. Returns the directory
+    directory = tempfile.mkdtemp(prefix="cinema-bench-")
+    for name, value in BASE_SETTINGS.items():
+        os.environ.setdefault(name, value)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'cinema.db')}"
+    os.chdir(directory)
+    sys.path.insert(0, BACKEND)
+    if seed:
+        import seed as seed_module
+        seed_module.create_tables()
+        asyncio.run(seed_module.seed_data())
+    return directory
+
+def summary(samples: List[float]) -> Dict[str, float]:
+    # Latency samples in seconds -> milliseconds
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+RESULT_PREFIX = "RESULT "
+
+def report(result: dict) -> None:
+    # Log records share stdout, so the result line is marked
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+def run_variant(module: str, settings: Optional[Dict[str, str]] = None, args: Optional[List[str]] = None) -> dict:
+    # Runs `python -m bench.<module> --variant` with extra environment and returns its result
+    env = {**os.environ, **(settings or {})}
+    completed = subprocess.run(
+        [sys.executable, "-m", f"bench.{module}", "--variant", *(args or [])],
+        cwd=BACKEND, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"bench.{module} failed:\n{completed.stderr}")
+    results = [line for line in completed.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    return json.loads(results[-1][len(RESULT_PREFIX):])
+
+def print_table(rows: List[dict], columns: List[str]) -> None:
+    widths = {column: max(len(column), *(len(str(row.get(column, ""))) for row in rows)) for column in columns}
+    print("  ".join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print("  ".join(str(row.get(column, "")).ljust(widths[column]) for column in columns))
@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import time
+from bench import common
+
+# Login throughput with logging on vs off (python -m bench.login_logging).
+# `--clients` clients log in back to back for `--duration` seconds. The user's
+# password is rehashed with the lowest bcrypt cost, so the numbers show the cost
+# of the request path and its logging rather than of bcrypt.
+# - off: LOG_LEVEL=CRITICAL, nothing is emitted
+# - info: the default, an access log line per request plus the login records
+# - debug: everything, including the per-step authentication records
+
+LEVELS = {"off": "CRITICAL", "info": "INFO", "debug": "DEBUG"}
+BCRYPT_ROUNDS = 4
+
+def _cheap_password(username: str, password: str) -> None:
+    from passlib.hash import bcrypt
+    from sqlalchemy import update
+    import models
+    from database import engine
+    with engine.begin() as connection:
+        connection.execute(update(models.User).where(models.User.username == username).values(
+            hashed_password=bcrypt.using(rounds=BCRYPT_ROUNDS).hash(password)
+        ))
+
+async def _login(client, stop: asyncio.Event, samples: list, statuses: dict) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.post("/token", data={"username": "user", "password": "user123"})
+        samples.append(time.perf_counter() - started)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+async def variant(level: str, clients: int, duration: float) -> dict:
+    import httpx
+    import logs
+    import main
+    _cheap_password("user", "user123")
+    await main.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.post("/token", data={"username": "user", "password": "user123"})
+            stop = asyncio.Event()
+            samples, statuses = [], {}
+            tasks = [asyncio.create_task(_login(client, stop, samples, statuses)) for _ in range(clients)]
+            await asyncio.sleep(duration)
+            stop.set()
+            await asyncio.gather(*tasks)
+        dropped = logs.dropped()
+    finally:
+        await main.shutdown()
+    return {
+        "level": level,
+        "logins_per_s": round(statuses.get(200, 0) / duration, 1),
+        "latency": common.summary(samples),
+        "statuses": {str(code): count for code, count in statuses.items()},
+        "dropped_log_records": dropped,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variant", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--level", choices=list(LEVELS), default="info")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--quick", action="store_true", help="short run for the test suite")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.clients, args.duration = 8, 2.0
+
+    if args.variant:
+        common.prepare()
+        common.report(asyncio.run(variant(args.level, args.clients, args.duration)))
+        return
+
+    rows = []
+    for level, log_level in LEVELS.items():
+        result = common.run_variant("login_logging", settings={"LOG_LEVEL": log_level}, args=[
+            "--level", level, "--clients", str(args.clients), "--duration", str(args.duration)
+        ])
+        rows.append({"logging": level, "logins/s": result["logins_per_s"], **result["latency"], "dropped": result["dropped_log_records"]})
+    print(f"/token throughput, {args.clients} clients, bcrypt cost {BCRYPT_ROUNDS}; latency in ms")
+    common.print_table(rows, ["logging", "logins/s", "p50", "p95", "p99", "max", "dropped"])
+    common.report({"rows": rows})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import time
+from bench import common
+
+# /movies/ latency while /token is hammered (python -m bench.login_storm).
+# A probe requests /movies/ every 10 ms, first alone, then while `--logins`
+# clients log in back to back. With bcrypt in the password pool the probe's
+# p99 should barely move; the "inline" variant runs bcrypt on the event loop,
+# as before the pool existed, for comparison.
+
+PROBE_INTERVAL = 0.01
+
+async def _probe(client, stop: asyncio.Event, samples: list) -> None:
+    # Latency is counted from when the request was due, so time the event loop
+    # spent blocked before sending it counts too
+    due = time.perf_counter()
+    while not stop.is_set():
+        response = await client.get("/movies/")
+        samples.append(time.perf_counter() - due)
+        assert response.status_code == 200
+        due = max(due + PROBE_INTERVAL, time.perf_counter())
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+
+async def _login(client, stop: asyncio.Event, statuses: dict) -> None:
+    while not stop.is_set():
+        response = await client.post("/token", data={"username": "user", "password": "user123"})
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+async def _measure(client, duration: float, logins: int) -> dict:
+    stop = asyncio.Event()
+    samples, statuses = [], {}
+    tasks = [asyncio.create_task(_probe(client, stop, samples))]
+    tasks += [asyncio.create_task(_login(client, stop, statuses)) for _ in range(logins)]
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return {"movies": common.summary(samples), "logins": {str(code): count for code, count in statuses.items()}}
+
+async def variant(mode: str, duration: float, logins: int) -> dict:
+    import httpx
+    import main
+    if mode == "inline":
+        async def run_inline(func, *args):
+            return func(*args)
+        main.password_hasher._run = run_inline
+
+    await main.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.get("/movies/")
+            idle = await _measure(client, duration, 0)
+            storm = await _measure(client, duration, logins)
+    finally:
+        await main.shutdown()
+    return {"mode": mode, "idle": idle["movies"], "storm": storm["movies"], "logins": storm["logins"]}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variant", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=["pool", "inline"], default="pool")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--logins", type=int, default=32, help="concurrent login clients")
+    parser.add_argument("--quick", action="store_true", help="short run for the test suite")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.duration, args.logins = 1.5, 8
+
+    if args.variant:
+        common.prepare()
+        common.report(asyncio.run(variant(args.mode, args.duration, args.logins)))
+        return
+
+    rows = []
+    for mode in ("pool", "inline"):
+        result = common.run_variant("login_storm", args=[
+            "--mode", mode, "--duration", str(args.duration), "--logins", str(args.logins)
+        ])
+        for phase in ("idle", "storm"):
+            rows.append({"bcrypt": mode, "phase": phase, **result[phase], "logins": result["logins"] if phase == "storm" else ""})
+    print(f"/movies/ latency (ms), {args.logins} login clients during the storm phase")
+    common.print_table(rows, ["bcrypt", "phase", "count", "p50", "p95", "p99", "max", "logins"])
+    common.report({"rows": rows})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import statistics
+import time
+from bench import common
+
+# Per-request cost of the metrics (python -m bench.metrics_overhead).
+# Cheap requests served from memory (a cached catalogue page and a seat map) are
+# sent straight to the ASGI app, one at a time, with METRICS_ENABLED=1 and =0;
+# the difference is what the middleware and the query counters add per request.
+# Each variant runs `--rounds` rounds of `--requests` requests and reports the
+# median round.
+
+PATHS = ["/movies/", "/showtime/1/seats"]
+
+async def _request(app, path: str) -> int:
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app({
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 10000), "server": ("bench", 80),
+    }, receive, send)
+    return status
+
+async def variant(enabled: bool, requests: int, rounds: int) -> dict:
+    import main
+    await main.startup()
+    try:
+        for path in PATHS:
+            assert await _request(main.app, path) == 200
+        means = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for i in range(requests):
+                await _request(main.app, PATHS[i % len(PATHS)])
+            means.append((time.perf_counter() - started) / requests)
+    finally:
+        await main.shutdown()
+    return {"metrics": enabled, "us_per_request": round(statistics.median(means) * 1e6, 1)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variant", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--enabled", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="short run for the test suite")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.requests, args.rounds = 1000, 3
+
+    if args.variant:
+        common.prepare()
+        common.report(asyncio.run(variant(bool(args.enabled), args.requests, args.rounds)))
+        return
+
+    results = {}
+    for enabled in (0, 1):
+        results[enabled] = common.run_variant("metrics_overhead", settings={"METRICS_ENABLED": str(enabled)}, args=[
+            "--enabled", str(enabled), "--requests", str(args.requests), "--rounds", str(args.rounds)
+        ])["us_per_request"]
+    overhead = results[1] - results[0]
+    rows = [
+        {"metrics": "off", "us/request": results[0]},
+        {"metrics": "on", "us/request": results[1], "overhead_us": round(overhead, 1),
+         "overhead_pct": round(overhead / results[0] * 100, 1)},
+    ]
+    print(f"Median of {args.rounds} rounds of {args.requests} requests ({', '.join(PATHS)})")
+    common.print_table(rows, ["metrics", "us/request", "overhead_us", "overhead_pct"])
+    common.report({"rows": rows, "off": results[0], "on": results[1]})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import json
+import resource
+import time
+from bench import common
+
+# Seat map stream fan-out (python -m bench.seat_stream).
+# Opens `--viewers` Server-Sent Events streams for one showtime in a single
+# worker, books one seat at a time and measures how long each "seat-taken"
+# event takes to reach the viewers: per delivery, and until the last viewer has
+# it (the broadcast). Viewers are driven through the ASGI app directly, so the
+# numbers are the worker's own cost without sockets.
+
+SHOWTIME_ID = 1
+
+class Viewer:
+    def __init__(self, number: int, deliveries: dict, snapshots: list):
+        self.number = number
+        self.deliveries = deliveries
+        self.snapshots = snapshots
+        self.closed = asyncio.Event()
+        self.requested = False
+
+    def scope(self) -> dict:
+        path = f"/showtime/{SHOWTIME_ID}/seats/stream"
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+            "root_path": "", "query_string": b"", "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 10000 + self.number), "server": ("bench", 80),
+        }
+
+    async def receive(self) -> dict:
+        if not self.requested:
+            self.requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.closed.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message: dict) -> None:
+        if message["type"] != "http.response.body":
+            return
+        received = time.perf_counter()
+        for block in message.get("body", b"").decode().split("\n\n"):
+            if block.startswith("event: snapshot"):
+                self.snapshots.append(self.number)
+            elif block.startswith("event: seat-taken"):
+                data = json.loads(block.split("data: ", 1)[1])
+                self.deliveries[data["seat_ids"][0]].append(received)
+
+async def _wait_until(condition, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("viewers did not receive the event")
+        await asyncio.sleep(0.001)
+
+async def variant(viewers: int, events: int) -> dict:
+    import crud
+    import main
+    import schemas
+
+    published = {}
+    publish = crud.seat_events.publish
+
+    def timed_publish(showtime_id, event, data):
+        published[data["seat_ids"][0]] = time.perf_counter()
+        publish(showtime_id, event, data)
+
+    crud.seat_events.publish = timed_publish
+
+    await main.startup()
+    try:
+        user = await crud.get_user_by_username("user")
+        occupancy = await crud.get_seat_occupancy(SHOWTIME_ID)
+        seat_ids = [seat_id for seat_id in occupancy.layout.seat_ids if seat_id is not None][:events]
+        deliveries = {seat_id: [] for seat_id in seat_ids}
+        snapshots = []
+
+        started = time.perf_counter()
+        streams = [Viewer(number, deliveries, snapshots) for number in range(viewers)]
+        tasks = [asyncio.create_task(main.app(v.scope(), v.receive, v.send)) for v in streams]
+        await _wait_until(lambda: len(snapshots) >= viewers, timeout=60 + viewers / 100)
+        connect_seconds = time.perf_counter() - started
+
+        delivery, broadcast = [], []
+        for seat_id in seat_ids:
+            reservation = schemas.ReservationCreate(showtime_id=SHOWTIME_ID, seat_ids=[seat_id])
+            await crud.create_reservation(reservation, user["id"])
+            await _wait_until(lambda: len(deliveries[seat_id]) >= viewers, timeout=30)
+            delivery += [received - published[seat_id] for received in deliveries[seat_id]]
+            broadcast.append(max(deliveries[seat_id]) - published[seat_id])
+
+        for v in streams:
+            v.closed.set()
+        await asyncio.gather(*tasks)
+    finally:
+        await main.shutdown()
+    return {
+        "viewers": viewers,
+        "connect_s": round(connect_seconds, 2),
+        "delivery": common.summary(delivery),
+        "broadcast": common.summary(broadcast),
+        # Linux reports kilobytes
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variant", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--viewers", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--events", type=int, default=20, help="seats booked, one event each")
+    parser.add_argument("--quick", action="store_true", help="short run for the test suite")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.viewers, args.events = [200], 5
+
+    if args.variant:
+        common.prepare()
+        common.report(asyncio.run(variant(args.viewers[0], args.events)))
+        return
+
+    rows = []
+    for viewers in args.viewers:
+        result = common.run_variant("seat_stream", args=["--viewers", str(viewers), "--events", str(args.events)])
+        rows.append({
+            "viewers": viewers,
+            "connect_s": result["connect_s"],
+            "delivery_p50": result["delivery"]["p50"],
+            "delivery_p99": result["delivery"]["p99"],
+            "broadcast_p50": result["broadcast"]["p50"],
+            "broadcast_max": result["broadcast"]["max"],
+            "max_rss_mb": result["max_rss_mb"],
+        })
+    print(f"seat-taken delivery latency (ms), {args.events} events per run")
+    common.print_table(rows, list(rows[0]))
+    common.report({"rows": rows})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import time
+from bench import common
+
+# SQLite mixed read/write throughput (python -m bench.sqlite_mixed).
+# Readers list showtimes and reservations while writers book a seat and cancel
+# it again, all through the API, for `--duration` seconds. Two setups:
+# - tuned: the default database layer (WAL, synchronous=NORMAL, read pool and
+#   a single queued writer, see sqlite_backend.py)
+# - stock: the stock `databases` SQLite backend with SQLite's defaults
+#   (rollback journal, synchronous=FULL), as before the tuning
+
+SETUPS = {
+    "tuned": {},
+    "stock": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_CACHE_SIZE": "-2000",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_TEMP_STORE": "DEFAULT",
+    },
+}
+
+async def _reader(client, number: int, headers: dict, stop: asyncio.Event, stats: dict) -> None:
+    i = number
+    while not stop.is_set():
+        if i % 2:
+            url = f"/showtimes/?movie_id={i % 5 + 1}&limit=20"
+        else:
+            url = "/users/me/reservations?limit=20"
+        started = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        _record(stats, "read", response.status_code, time.perf_counter() - started)
+        i += 1
+
+async def _writer(client, number: int, headers: dict, stop: asyncio.Event, stats: dict) -> None:
+    # Each writer books seats of its own showtime, so bookings never conflict
+    showtime_id = number + 1
+    seat_ids = [seat["id"] for seat in (await client.get(f"/showtime/{showtime_id}/seats")).json()]
+    i = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.post("/reservations/", headers=headers, json={
+            "showtime_id": showtime_id, "seat_ids": [seat_ids[i % len(seat_ids)]]
+        })
+        _record(stats, "write", response.status_code, time.perf_counter() - started)
+        if response.status_code == 200:
+            started = time.perf_counter()
+            response = await client.patch(f"/reservations/{response.json()['id']}", headers=headers, json={
+                "payment_status": "cancelled"
+            })
+            _record(stats, "write", response.status_code, time.perf_counter() - started)
+        i += 1
+
+def _record(stats: dict, kind: str, status_code: int, seconds: float) -> None:
+    if status_code < 400:
+        stats[kind].append(seconds)
+    else:
+        stats["errors"][str(status_code)] = stats["errors"].get(str(status_code), 0) + 1
+
+async def variant(setup: str, readers: int, writers: int, duration: float) -> dict:
+    import httpx
+    import main
+    if setup == "stock":
+        import database
+        from databases.backends.sqlite import SQLiteBackend
+        database.database._backend = SQLiteBackend(database.database.url)
+
+    await main.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            token = (await client.post("/token", data={"username": "user", "password": "user123"})).json()
+            headers = {"Authorization": f"Bearer {token['access_token']}"}
+            stop = asyncio.Event()
+            stats = {"read": [], "write": [], "errors": {}}
+            tasks = [asyncio.create_task(_reader(client, n, headers, stop, stats)) for n in range(readers)]
+            tasks += [asyncio.create_task(_writer(client, n, headers, stop, stats)) for n in range(writers)]
+            await asyncio.sleep(duration)
+            stop.set()
+            await asyncio.gather(*tasks)
+    finally:
+        await main.shutdown()
+    return {
+        "setup": setup,
+        "reads_per_s": round(len(stats["read"]) / duration, 1),
+        "writes_per_s": round(len(stats["write"]) / duration, 1),
+        "read": common.summary(stats["read"]),
+        "write": common.summary(stats["write"]),
+        "errors": stats["errors"],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--variant", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--setup", choices=list(SETUPS), default="tuned")
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--quick", action="store_true", help="short run for the test suite")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.readers, args.writers, args.duration = 8, 2, 2.0
+
+    if args.variant:
+        common.prepare()
+        common.report(asyncio.run(variant(args.setup, args.readers, args.writers, args.duration)))
+        return
+
+    rows = []
+    for setup, settings in SETUPS.items():
+        result = common.run_variant("sqlite_mixed", settings=settings, args=[
+            "--setup", setup, "--readers", str(args.readers), "--writers", str(args.writers),
+            "--duration", str(args.duration)
+        ])
+        rows.append({
+            "setup": setup,
+            "reads/s": result["reads_per_s"],
+            "writes/s": result["writes_per_s"],
+            "read_p99": result["read"].get("p99"),
+            "write_p99": result["write"].get("p99"),
+            "errors": result["errors"] or "",
+        })
+    print(f"{args.readers} readers, {args.writers} writers, {args.duration:g} s; latency in ms")
+    common.print_table(rows, list(rows[0]))
+    common.report({"rows": rows})
+
+if __name__ == "__main__":
+    main()
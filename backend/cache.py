@@ -0,0 +1,141 @@
+import functools
+import os
+import uuid
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Read-through cache for catalogue reads (movies, halls, showtimes).
+# Entries are grouped in namespaces; every namespace has a generation number that
+# is part of the key, so invalidating a namespace is a single increment and
+# stale entries simply age out of the LRU.
+
+CATALOGUE_CACHE_TTL_SECONDS = float(os.getenv("CATALOGUE_CACHE_TTL_SECONDS", "60"))
+CATALOGUE_CACHE_MAX_ENTRIES = int(os.getenv("CATALOGUE_CACHE_MAX_ENTRIES", "1024"))
+# Optional shared backend for multi-worker deployments, e.g. redis://localhost:6379/0
+CACHE_URL = os.getenv("CACHE_URL")
+
+_MISSING = object()
+
+class LocalBackend:
+    # In-process LRU with per-entry expiry; also the stand-in for a shared backend
+    shared = False
+
+    def __init__(self, max_entries: int):
+        # Generations restart at 0 in every process, so versions are only comparable within it
+        self.scope = uuid.uuid4().hex[:8]
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    async def bump(self, namespace: str) -> None:
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+class RedisBackend:
+    # Shared between workers; values are pickled
+    shared = True
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self.scope = "shared"
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str):
+        value = await self._redis.get(f"cache:{key}")
+        return _MISSING if value is None else pickle.loads(value)
+
+    async def set(self, key: str, value, ttl: float) -> None:
+        await self._redis.set(f"cache:{key}", pickle.dumps(value), px=int(ttl * 1000))
+
+    async def generation(self, namespace: str) -> int:
+        return int(await self._redis.get(f"cache-generation:{namespace}") or 0)
+
+    async def bump(self, namespace: str) -> None:
+        await self._redis.incr(f"cache-generation:{namespace}")
+
+def _plain(value):
+    # Records -> dicts so cached values are detached from the driver (and picklable)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_plain(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if hasattr(value, "_mapping"):
+        return {key: _plain(value[key]) for key in value.keys()}
+    return value
+
+class Cache:
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def cached(self, namespace: str):
+        # Decorator for async crud reads; the key is the function name and its arguments
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                generation = await self.backend.generation(namespace)
+                key = f"{namespace}:{generation}:{func.__name__}:{args!r}:{sorted(kwargs.items())!r}"
+                value = await self.backend.get(key)
+                if value is not _MISSING:
+                    self.hits[namespace] = self.hits.get(namespace, 0) + 1
+                    return value
+                self.misses[namespace] = self.misses.get(namespace, 0) + 1
+                value = _plain(await func(*args, **kwargs))
+                await self.backend.set(key, value, self.ttl)
+                return value
+            return wrapper
+        return decorator
+
+    async def version(self, *namespaces: str) -> Optional[str]:
+        # Changes whenever any of the namespaces is invalidated; no database access.
+        # Local generations miss the writes of other processes, so without a shared
+        # backend the version also rolls over every TTL, as the cached data does.
+        # None when there is no version to vouch for (local backend, cache off)
+        generations = [str(await self.backend.generation(namespace)) for namespace in namespaces]
+        version = f"{self.backend.scope}-{'.'.join(generations)}"
+        if not self.backend.shared:
+            if self.ttl <= 0:
+                return None
+            version += f"-{int(time.time() // self.ttl)}"
+        return version
+
+    async def invalidate(self, *namespaces: str) -> None:
+        for namespace in namespaces:
+            await self.backend.bump(namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        namespaces = sorted(set(self.hits) | set(self.misses))
+        return {
+            namespace: {"hits": self.hits.get(namespace, 0), "misses": self.misses.get(namespace, 0)}
+            for namespace in namespaces
+        }
+
+def _create_backend(url: Optional[str]):
+    if url:
+        return RedisBackend(url)
+    return LocalBackend(CATALOGUE_CACHE_MAX_ENTRIES)
+
+catalogue_cache = Cache(_create_backend(CACHE_URL), CATALOGUE_CACHE_TTL_SECONDS)
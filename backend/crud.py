@@ -1,9 +1,33 @@
-from sqlalchemy.sql import select, func
+from sqlalchemy import DateTime
+from sqlalchemy.sql import select, func, and_, or_, literal
 import models
 from database import database
-from datetime import datetime
+import layouts
+import loaders
+import sales
+from occupancy import occupancy_index, not_finished
+from revocation import revocation_index
+from seat_events import seat_events
+from pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate
+from cache import catalogue_cache
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 import schemas
+import logs
+import os
+
+logger = logs.get_logger("crud")
+
+# Pending reservations hold their seats for this long unless extended
+SEAT_HOLD_TTL_MINUTES = int(os.getenv("SEAT_HOLD_TTL_MINUTES", "15"))
+
+# Minimum gap between two showtimes in the same hall, for cleaning
+SHOWTIME_CLEANING_MINUTES = int(os.getenv("SHOWTIME_CLEANING_MINUTES", "10"))
+# Rows accepted by one schedule import
+SHOWTIME_IMPORT_MAX_ROWS = int(os.getenv("SHOWTIME_IMPORT_MAX_ROWS", "10000"))
+
+# Statuses whose seats are not claimed
+RELEASED_STATUSES = ("cancelled", "expired")
 
 # User operations
 async def get_user(user_id: int):
@@ -14,112 +38,267 @@ async def get_user_by_username(username: str):
     query = select(models.User).where(models.User.username == username)
     return await database.fetch_one(query)
 
-async def create_user(user: schemas.UserCreate, pwd_context):
-    hashed_password = pwd_context.hash(user.password)
-    print(f"Creating user: {user.username}")
-    print(f"Email: {user.email}")
-    print(f"Password hash (first 10 chars): {hashed_password[:10]}...")
+async def create_user(user: schemas.UserCreate, password_hasher):
+    hashed_password = await password_hasher.hash(user.password)
     
     query = models.User.__table__.insert().values(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password,
         is_admin=False
-    )
+    ).returning(models.User.id)
     user_id = await database.execute(query)
-    print(f"User created with ID: {user_id}")
-    
-    # Проверим, что пользователь действительно создан
-    created_user = await get_user(user_id)
-    print(f"Created user verified: {created_user is not None}")
+    logger.info("User created", extra={"user_id": user_id, "username": user.username})
     
     return {**user.dict(), "id": user_id, "is_admin": False}
 
-async def authenticate_user(username: str, password: str, pwd_context):
-    print(f"Authenticating user: {username}")
+async def authenticate_user(username: str, password: str, password_hasher):
     user = await get_user_by_username(username)
     if not user:
-        print(f"User not found: {username}")
+        logger.debug("Unknown user", extra={"username": username})
         return False
     
-    print(f"User found, verifying password...")
-    password_verified = pwd_context.verify(password, user.hashed_password)
-    print(f"Password verification result: {password_verified}")
-    
+    password_verified = await password_hasher.verify(password, user.hashed_password)
     if not password_verified:
+        logger.debug("Wrong password", extra={"user_id": user.id})
         return False
     return user
 
+# Token operations
+async def create_refresh_token(user_id: int, family: str, token: dict):
+    # token: jti, access_jti, access_expires_at, expires_at
+    query = models.RefreshToken.__table__.insert().values(
+        user_id=user_id, family=family, created_at=datetime.utcnow(), **token
+    )
+    await database.execute(query)
+
+async def rotate_refresh_token(jti: str, next_token: dict):
+    # Uses up a refresh token and stores the next one of its family; returns (user, family).
+    # A token that was already used or revoked has leaked, so its family is revoked
+    now = datetime.utcnow()
+    table = models.RefreshToken.__table__
+    user = None
+    async with database.transaction():
+        used = await database.fetch_one(table.update().where(
+            table.c.jti == jti,
+            table.c.used_at.is_(None),
+            table.c.revoked_at.is_(None),
+            table.c.expires_at > now
+        ).values(used_at=now).returning(table.c.user_id, table.c.family))
+        if used is not None:
+            user = await get_user(used["user_id"])
+            if user is not None:
+                await database.execute(table.insert().values(
+                    user_id=user.id, family=used["family"], created_at=now, **next_token
+                ))
+
+    if used is None:
+        token = await database.fetch_one(
+            select(table.c.user_id, table.c.family, table.c.expires_at).where(table.c.jti == jti)
+        )
+        if token is not None and token["expires_at"] > now:
+            logger.warning("Refresh token reused, revoking its family", extra={"user_id": token["user_id"]})
+            await revoke_token_family(token["family"])
+        raise ValueError("Invalid refresh token")
+    if user is None:
+        raise ValueError("Invalid refresh token")
+    return user, used["family"]
+
+async def _revoke_tokens(condition):
+    # Revokes the matching refresh tokens and the access tokens issued with them;
+    # returns how many access tokens were revoked
+    now = datetime.utcnow()
+    refresh = models.RefreshToken.__table__
+    revoked = models.RevokedToken.__table__
+    access_tokens = select(
+        refresh.c.access_jti, refresh.c.access_expires_at, literal(now, DateTime)
+    ).where(
+        condition,
+        refresh.c.access_expires_at > now,
+        refresh.c.access_jti.notin_(select(revoked.c.jti))
+    )
+    async with database.transaction():
+        await database.execute(refresh.update().where(condition, refresh.c.revoked_at.is_(None)).values(revoked_at=now))
+        tokens = await database.fetch_all(access_tokens)
+        await database.execute(revoked.insert().from_select(["jti", "expires_at", "revoked_at"], access_tokens))
+
+    for token in tokens:
+        revocation_index.add(token["access_jti"], token["access_expires_at"])
+    return len(tokens)
+
+async def revoke_token_family(family: str):
+    return await _revoke_tokens(models.RefreshToken.family == family)
+
+async def revoke_refresh_token_family(jti: str):
+    # Revokes the family of a refresh token, whether or not it is still usable
+    refresh = models.RefreshToken.__table__
+    family = select(refresh.c.family).where(refresh.c.jti == jti).scalar_subquery()
+    return await _revoke_tokens(models.RefreshToken.family == family)
+
+async def revoke_user_tokens(user_id: int):
+    return await _revoke_tokens(models.RefreshToken.user_id == user_id)
+
+async def prune_tokens():
+    # Expired tokens need neither rotation nor revocation
+    now = datetime.utcnow()
+    async with database.transaction():
+        await database.execute(models.RefreshToken.__table__.delete().where(models.RefreshToken.expires_at <= now))
+        await database.execute(models.RevokedToken.__table__.delete().where(models.RevokedToken.expires_at <= now))
+
 # Movie operations
-async def get_movies():
-    query = select(models.Movie)
-    return await database.fetch_all(query)
+def _after_id(query, model, cursor: Optional[str]):
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.where(model.id > last_id)
+    return query
+
+@catalogue_cache.cached("movies")
+async def get_movies(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None):
+    # Returns (movies, next_cursor)
+    query = _after_id(select(models.Movie), models.Movie, cursor)
+    movies = await database.fetch_all(query.order_by(models.Movie.id).limit(limit + 1))
+    return paginate(movies, limit, key=lambda m: (m["id"],))
 
+@catalogue_cache.cached("movies")
 async def get_movie(movie_id: int):
     query = select(models.Movie).where(models.Movie.id == movie_id)
     return await database.fetch_one(query)
 
 async def create_movie(movie: schemas.MovieCreate):
-    query = models.Movie.__table__.insert().values(**movie.dict())
+    query = models.Movie.__table__.insert().values(**movie.dict()).returning(models.Movie.id)
     movie_id = await database.execute(query)
+    await catalogue_cache.invalidate("movies")
     return {**movie.dict(), "id": movie_id}
 
 # Showtime operations
-async def get_showtimes(movie_id: Optional[int] = None):
-    if movie_id:
-        query = select(models.Showtime).where(models.Showtime.movie_id == movie_id)
-    else:
-        query = select(models.Showtime)
-    
-    showtimes = await database.fetch_all(query)
+async def get_showtimes(
+    movie_id: Optional[int] = None,
+    hall_id: Optional[int] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    upcoming: bool = False,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None
+):
+    # Returns (showtimes, next_cursor), ordered by (start_time, id).
+    # Upcoming listings depend on the clock, so they bypass the cache
+    load = _load_showtimes if upcoming else _cached_showtimes
+    return await load(movie_id, hall_id, start_from, start_to, upcoming, limit, cursor)
+
+async def _load_showtimes(movie_id, hall_id, start_from, start_to, upcoming, limit, cursor):
+    query = _filter_showtimes(select(models.Showtime), movie_id, hall_id, start_from, start_to, upcoming, cursor)
+    showtimes, next_cursor = paginate(
+        await database.fetch_all(query.limit(limit + 1)), limit, key=lambda s: (s["start_time"], s["id"])
+    )
     
     # Enhance showtimes with movie and hall data
-    result = []
-    for showtime in showtimes:
-        # Convert record to dict
-        showtime_dict = dict(showtime)
-        
-        # Get movie data
-        movie_query = select(models.Movie).where(models.Movie.id == showtime.movie_id)
-        movie = await database.fetch_one(movie_query)
-        showtime_dict["movie"] = dict(movie) if movie else None
-        
-        # Get hall data
-        hall_query = select(models.Hall).where(models.Hall.id == showtime.hall_id)
-        hall = await database.fetch_one(hall_query)
-        showtime_dict["hall"] = dict(hall) if hall else None
-        
-        result.append(showtime_dict)
-    
-    return result
+    return await loaders.load_showtimes(showtimes), next_cursor
+
+_cached_showtimes = catalogue_cache.cached("showtimes")(_load_showtimes)
+
+def _filter_showtimes(query, movie_id, hall_id, start_from, start_to, upcoming, cursor):
+    # Filters and keyset position shared by the showtime listings, ordered by (start_time, id)
+    if movie_id:
+        query = query.where(models.Showtime.movie_id == movie_id)
+    if hall_id:
+        query = query.where(models.Showtime.hall_id == hall_id)
+    if start_from:
+        query = query.where(models.Showtime.start_time >= start_from)
+    if start_to:
+        query = query.where(models.Showtime.start_time < start_to)
+    if upcoming:
+        query = query.where(models.Showtime.start_time >= datetime.now())
+    if cursor:
+        last_start, last_id = decode_cursor(cursor, datetime, int)
+        query = query.where(or_(
+            models.Showtime.start_time > last_start,
+            and_(models.Showtime.start_time == last_start, models.Showtime.id > last_id)
+        ))
+    return query.order_by(models.Showtime.start_time, models.Showtime.id)
+
+class ScheduleConflictError(ValueError):
+    def __init__(self, showtime_id: int):
+        self.showtime_id = showtime_id
+        super().__init__(f"Hall is already booked by showtime {showtime_id}")
+
+def _schedule_buffer() -> timedelta:
+    return timedelta(minutes=SHOWTIME_CLEANING_MINUTES)
+
+def _schedule_values(showtime: schemas.ShowtimeCreate, movie: Optional[dict], hall: Optional[dict]) -> dict:
+    # Row values for a showtime; end_time defaults to the movie's duration
+    if movie is None:
+        raise ValueError("Movie not found")
+    if hall is None:
+        raise ValueError("Hall not found")
+    values = showtime.dict()
+    if values["end_time"] is None:
+        if not movie["duration"]:
+            raise ValueError("Movie has no duration, end_time is required")
+        values["end_time"] = values["start_time"] + timedelta(minutes=movie["duration"])
+    if values["end_time"] <= values["start_time"]:
+        raise ValueError("Showtime must end after it starts")
+    return values
+
+async def _showtime_values(showtime: schemas.ShowtimeCreate) -> dict:
+    movies = await loaders.fetch_by_ids(models.Movie, [showtime.movie_id])
+    halls = await loaders.fetch_by_ids(models.Hall, [showtime.hall_id])
+    return _schedule_values(showtime, movies.get(showtime.movie_id), halls.get(showtime.hall_id))
+
+async def _lock_schedule(hall_id: int):
+    # Serializes schedule changes per hall (SQLite transactions are serialized anyway)
+    await database.fetch_one(select(models.Hall.id).where(models.Hall.id == hall_id).with_for_update())
+
+def _schedule_query(hall_id: int, exclude_showtime_id: Optional[int] = None):
+    query = select(models.Showtime.id, models.Showtime.start_time, models.Showtime.end_time).where(
+        models.Showtime.hall_id == hall_id
+    )
+    if exclude_showtime_id is not None:
+        query = query.where(models.Showtime.id != exclude_showtime_id)
+    return query
+
+def _overlapping_query(hall_id: int, start_time: datetime, end_time: datetime,
+                       exclude_showtime_id: Optional[int] = None):
+    # Showtimes in the hall that overlap [start_time, end_time). Existing showtimes
+    # may overlap each other (created before the check existed), so a long one
+    # can outlast later ones: the predicate checks every showtime's own end
+    ends = func.coalesce(models.Showtime.end_time, models.Showtime.start_time)
+    return _schedule_query(hall_id, exclude_showtime_id).where(
+        models.Showtime.start_time < end_time,
+        ends > start_time
+    )
+
+async def find_schedule_conflict(hall_id: int, start_time: datetime, end_time: datetime,
+                                 exclude_showtime_id: Optional[int] = None) -> Optional[int]:
+    # Showtimes closer than the cleaning buffer count as overlapping
+    buffer = _schedule_buffer()
+    query = _overlapping_query(hall_id, start_time - buffer, end_time + buffer, exclude_showtime_id)
+    conflict = await database.fetch_one(query.order_by(models.Showtime.start_time).limit(1))
+    return conflict["id"] if conflict else None
 
 async def create_showtime(showtime: schemas.ShowtimeCreate):
-    query = models.Showtime.__table__.insert().values(**showtime.dict())
-    showtime_id = await database.execute(query)
+    values = await _showtime_values(showtime)
+    query = models.Showtime.__table__.insert().values(**values).returning(models.Showtime.id)
+    async with database.transaction():
+        await _lock_schedule(values["hall_id"])
+        conflict = await find_schedule_conflict(values["hall_id"], values["start_time"], values["end_time"])
+        if conflict is not None:
+            raise ScheduleConflictError(conflict)
+        showtime_id = await database.execute(query)
+    await catalogue_cache.invalidate("showtimes")
     
     # Fetch the created showtime with movie and hall data
     return await get_showtime_by_id(showtime_id)
 
+@catalogue_cache.cached("showtimes")
 async def get_showtime_by_id(showtime_id: int):
     query = select(models.Showtime).where(models.Showtime.id == showtime_id)
     showtime = await database.fetch_one(query)
     
     if not showtime:
         return None
-        
-    showtime_dict = dict(showtime)
-    
-    # Get movie data
-    movie_query = select(models.Movie).where(models.Movie.id == showtime.movie_id)
-    movie = await database.fetch_one(movie_query)
-    showtime_dict["movie"] = dict(movie) if movie else None
-    
-    # Get hall data
-    hall_query = select(models.Hall).where(models.Hall.id == showtime.hall_id)
-    hall = await database.fetch_one(hall_query)
-    showtime_dict["hall"] = dict(hall) if hall else None
     
-    return showtime_dict
+    showtimes = await loaders.load_showtimes([showtime])
+    return showtimes[0]
 
 async def update_showtime(showtime_id: int, showtime: schemas.ShowtimeCreate):
     # First check if the showtime exists
@@ -129,15 +308,107 @@ async def update_showtime(showtime_id: int, showtime: schemas.ShowtimeCreate):
         return None
     
     # Update the showtime
+    values = await _showtime_values(showtime)
     update_query = models.Showtime.__table__.update().where(
         models.Showtime.id == showtime_id
-    ).values(**showtime.dict())
-    
-    await database.execute(update_query)
+    ).values(**values)
+    
+    # Sales totals are keyed by movie and hall, so they move with the showtime
+    moved = (existing_showtime.movie_id, existing_showtime.hall_id) != (showtime.movie_id, showtime.hall_id)
+    async with database.transaction():
+        await _lock_schedule(values["hall_id"])
+        conflict = await find_schedule_conflict(
+            values["hall_id"], values["start_time"], values["end_time"], exclude_showtime_id=showtime_id
+        )
+        if conflict is not None:
+            raise ScheduleConflictError(conflict)
+        if moved:
+            await sales.apply_sales(sales.showtime_sales_query(showtime_id), sign=-1)
+        await database.execute(update_query)
+        if moved:
+            await sales.apply_sales(sales.showtime_sales_query(showtime_id))
+    occupancy_index.drop_showtime(showtime_id)
+    seat_events.resync(showtime_id)
+    await catalogue_cache.invalidate("showtimes")
     
     # Return the updated showtime
     return await get_showtime_by_id(showtime_id)
 
+def _schedule_conflicts(existing, new_rows, buffer: timedelta) -> dict:
+    # Sweeps a hall's existing and new showtimes in start order, comparing each one
+    # with the one that ends last so far. Returns {row index: conflicting entry},
+    # entries being (start, end, row index or None, showtime id or None)
+    entries = sorted(
+        [(row["start_time"], row["end_time"] or row["start_time"], None, row["id"]) for row in existing] +
+        [(values["start_time"], values["end_time"], index, None) for index, values in new_rows],
+        key=lambda entry: entry[0]
+    )
+    conflicts = {}
+    latest = None
+    for entry in entries:
+        if latest is not None and latest[1] + buffer > entry[0]:
+            if entry[2] is not None:
+                conflicts.setdefault(entry[2], latest)
+            if latest[2] is not None:
+                conflicts.setdefault(latest[2], entry)
+        if latest is None or entry[1] > latest[1]:
+            latest = entry
+    return conflicts
+
+async def import_showtimes(showtimes: List[schemas.ShowtimeCreate], dry_run: bool = False):
+    # Validates a whole schedule in one pass - per hall, one query for the existing
+    # showtimes overlapping the imported ones - and creates it in one batch.
+    # Nothing is written if any row is invalid. Returns (created, errors)
+    if len(showtimes) > SHOWTIME_IMPORT_MAX_ROWS:
+        raise ValueError(f"At most {SHOWTIME_IMPORT_MAX_ROWS} showtimes per import")
+    movies = await loaders.fetch_by_ids(models.Movie, (showtime.movie_id for showtime in showtimes))
+    halls = await loaders.fetch_by_ids(models.Hall, (showtime.hall_id for showtime in showtimes))
+    
+    errors = {}
+    by_hall = {}
+    for index, showtime in enumerate(showtimes):
+        try:
+            values = _schedule_values(showtime, movies.get(showtime.movie_id), halls.get(showtime.hall_id))
+        except ValueError as e:
+            errors[index] = {"index": index, "message": str(e), "conflicting_showtime_id": None, "conflicting_index": None}
+            continue
+        by_hall.setdefault(values["hall_id"], []).append((index, values))
+    
+    buffer = _schedule_buffer()
+    created = 0
+    async with database.transaction():
+        for hall_id in sorted(by_hall):
+            new_rows = by_hall[hall_id]
+            await _lock_schedule(hall_id)
+            window_start = min(values["start_time"] for _, values in new_rows) - buffer
+            window_end = max(values["end_time"] for _, values in new_rows) + buffer
+            existing = await database.fetch_all(_overlapping_query(hall_id, window_start, window_end))
+            
+            for index, (_, _, other_index, showtime_id) in _schedule_conflicts(existing, new_rows, buffer).items():
+                if index in errors:
+                    continue
+                if showtime_id is not None:
+                    message = f"Overlaps showtime {showtime_id}"
+                else:
+                    message = f"Overlaps row {other_index}"
+                errors[index] = {
+                    "index": index,
+                    "message": message,
+                    "conflicting_showtime_id": showtime_id,
+                    "conflicting_index": other_index,
+                }
+        
+        if not errors and not dry_run and by_hall:
+            rows = [values for _, values in sorted(
+                (row for new_rows in by_hall.values() for row in new_rows), key=lambda row: row[0]
+            )]
+            await database.execute_many(query=models.Showtime.__table__.insert(), values=rows)
+            created = len(rows)
+    if created:
+        await catalogue_cache.invalidate("showtimes")
+    
+    return created, [errors[index] for index in sorted(errors)]
+
 async def delete_showtime(showtime_id: int):
     # First check if the showtime exists
     query = select(models.Showtime).where(models.Showtime.id == showtime_id)
@@ -145,141 +416,176 @@ async def delete_showtime(showtime_id: int):
     if not existing_showtime:
         return False
     
-    # Check if there are any reservations for this showtime
-    reservation_query = select(models.Reservation).where(
-        models.Reservation.showtime_id == showtime_id
-    )
-    reservations = await database.fetch_all(reservation_query)
-    
-    # If there are reservations, delete them first
-    if reservations:
-        delete_reservations_query = models.Reservation.__table__.delete().where(
+    # Delete the showtime together with its reservations, their seats and seat claims
+    async with database.transaction():
+        reservation_ids = select(models.Reservation.id).where(
             models.Reservation.showtime_id == showtime_id
         )
-        await database.execute(delete_reservations_query)
-    
-    # Delete the showtime
-    delete_query = models.Showtime.__table__.delete().where(
-        models.Showtime.id == showtime_id
-    )
-    await database.execute(delete_query)
+        await sales.remove_showtime_sales(showtime_id)
+        await database.execute(models.SeatClaim.__table__.delete().where(
+            models.SeatClaim.showtime_id == showtime_id
+        ))
+        await database.execute(models.ReservationSeat.__table__.delete().where(
+            models.ReservationSeat.reservation_id.in_(reservation_ids)
+        ))
+        await database.execute(models.Reservation.__table__.delete().where(
+            models.Reservation.showtime_id == showtime_id
+        ))
+        
+        # Delete the showtime
+        delete_query = models.Showtime.__table__.delete().where(
+            models.Showtime.id == showtime_id
+        )
+        await database.execute(delete_query)
+    occupancy_index.drop_showtime(showtime_id)
+    seat_events.close(showtime_id)
+    await catalogue_cache.invalidate("showtimes")
     
     return True
 
 # Seat operations
 async def get_seats_by_showtime(showtime_id: int):
-    # Get hall information from showtime
-    query = select(models.Showtime).where(models.Showtime.id == showtime_id)
-    showtime = await database.fetch_one(query)
-    
-    if not showtime:
+    # Served from the in-memory occupancy index; loaded from the database on first access
+    occupancy = await occupancy_index.get(showtime_id)
+    if occupancy is None:
         return []
     
-    # Get seats for this hall
-    query = select(models.Seat).where(models.Seat.hall_id == showtime.hall_id)
-    seats = await database.fetch_all(query)
-    
-    # Check which seats are already reserved for this showtime
-    # We need to join reservation_seats table to find all reserved seats
-    query = """
-        SELECT rs.seat_id 
-        FROM reservation_seats rs 
-        JOIN reservations r ON rs.reservation_id = r.id 
-        WHERE r.showtime_id = :showtime_id
-    """
-    reserved_seats = await database.fetch_all(query=query, values={"showtime_id": showtime_id})
-    reserved_seat_ids = [r["seat_id"] for r in reserved_seats]
-    
-    # Mark reserved seats
-    result = []
-    for seat in seats:
-        seat_dict = dict(seat)
-        seat_dict["is_reserved"] = seat.id in reserved_seat_ids
-        result.append(seat_dict)
-    
-    return result
+    return occupancy.to_seats()
+
+async def get_seat_occupancy(showtime_id: int):
+    return await occupancy_index.get(showtime_id)
+
+async def check_occupancy_consistency():
+    return await occupancy_index.check_consistency()
 
 # Reservation operations
+class SeatConflictError(ValueError):
+    def __init__(self, seat_ids: List[int]):
+        self.seat_ids = sorted(seat_ids)
+        super().__init__(f"Seats already reserved: {self.seat_ids}")
+
+async def get_conflicting_seats(showtime_id: int, seat_ids: List[int], exclude_reservation_id: Optional[int] = None):
+    query = select(models.SeatClaim.seat_id).where(
+        models.SeatClaim.showtime_id == showtime_id,
+        models.SeatClaim.seat_id.in_(seat_ids)
+    )
+    if exclude_reservation_id is not None:
+        query = query.where(models.SeatClaim.reservation_id != exclude_reservation_id)
+    claims = await database.fetch_all(query)
+    return [claim["seat_id"] for claim in claims]
+
 async def check_seats_availability(showtime_id: int, seat_ids: List[int]):
-    query = select(models.Reservation).join(
-        models.ReservationSeat, 
-        models.Reservation.id == models.ReservationSeat.reservation_id
-    ).where(
-        models.Reservation.showtime_id == showtime_id,
-        models.ReservationSeat.seat_id.in_(seat_ids)
+    conflicts = await get_conflicting_seats(showtime_id, seat_ids)
+    return len(conflicts) == 0  # Если нет бронирований, значит все места свободны
+
+async def _claim_seats(reservation_id: int, showtime_id: int, seat_ids: List[int]):
+    # Must run inside a transaction: the UNIQUE(showtime_id, seat_id) constraint
+    # makes the whole claim fail if any seat is already taken. The savepoint keeps
+    # the outer transaction usable after the violation (required on PostgreSQL)
+    try:
+        async with database.transaction():
+            await database.execute_many(
+                query=models.SeatClaim.__table__.insert(),
+                values=[
+                    {"showtime_id": showtime_id, "seat_id": seat_id, "reservation_id": reservation_id}
+                    for seat_id in seat_ids
+                ]
+            )
+    except Exception:
+        conflicts = await get_conflicting_seats(showtime_id, seat_ids, exclude_reservation_id=reservation_id)
+        if conflicts:
+            raise SeatConflictError(conflicts)
+        raise
+
+async def _release_seats(reservation_id: int):
+    query = models.SeatClaim.__table__.delete().where(
+        models.SeatClaim.reservation_id == reservation_id
     )
-    reservations = await database.fetch_all(query)
-    return len(reservations) == 0  # Если нет бронирований, значит все места свободны
+    await database.execute(query)
+
+def _seats_taken(showtime_id: int, seat_ids: List[int]):
+    # Called after commit: update the occupancy index and notify seat map viewers
+    version = occupancy_index.mark_reserved(showtime_id, seat_ids)
+    seat_events.publish(showtime_id, "seat-taken", {"seat_ids": seat_ids, "version": version})
+
+def _seats_freed(showtime_id: int, seat_ids: List[int]):
+    version = occupancy_index.mark_free(showtime_id, seat_ids)
+    seat_events.publish(showtime_id, "seat-freed", {"seat_ids": seat_ids, "version": version})
 
 async def create_reservation(reservation: schemas.ReservationCreate, user_id: int):
+    seat_ids = list(dict.fromkeys(reservation.seat_ids))
+    
     # Проверяем, чтобы количество мест было не более 5
-    if len(reservation.seat_ids) > 5:
+    if len(seat_ids) > 5:
         raise ValueError("Cannot reserve more than 5 seats at once")
-        
-    # Проверка доступности всех выбранных мест
-    seats_available = await check_seats_availability(reservation.showtime_id, reservation.seat_ids)
-    if not seats_available:
-        raise ValueError("One or more selected seats are already reserved")
-    
-    # Создание бронирования
-    reservation_query = models.Reservation.__table__.insert().values(
-        user_id=user_id,
-        showtime_id=reservation.showtime_id,
-        payment_status="pending",
-        created_at=datetime.utcnow()
-    )
-    reservation_id = await database.execute(reservation_query)
+    if not seat_ids:
+        raise ValueError("At least one seat must be selected")
     
-    # Создание связей с местами
-    for seat_id in reservation.seat_ids:
-        seat_query = models.ReservationSeat.__table__.insert().values(
-            reservation_id=reservation_id,
-            seat_id=seat_id
+    showtime_query = select(models.Showtime).where(models.Showtime.id == reservation.showtime_id)
+    showtime = await database.fetch_one(showtime_query)
+    if not showtime:
+        raise ValueError("Showtime not found")
+    
+    # Все места должны принадлежать залу сеанса
+    seat_query = select(models.Seat.id).where(
+        models.Seat.id.in_(seat_ids),
+        models.Seat.hall_id == showtime.hall_id,
+        models.Seat.is_active
+    )
+    hall_seats = await database.fetch_all(seat_query)
+    if len(hall_seats) != len(seat_ids):
+        raise ValueError("One or more selected seats do not belong to this showtime's hall")
+    
+    # Быстрая проверка до транзакции; окончательно гарантирует уникальность ограничение в БД
+    conflicts = await get_conflicting_seats(reservation.showtime_id, seat_ids)
+    if conflicts:
+        raise SeatConflictError(conflicts)
+    
+    # Бронирование, захват мест и связи с местами создаются в одной транзакции
+    now = datetime.utcnow()
+    async with database.transaction():
+        reservation_query = models.Reservation.__table__.insert().values(
+            user_id=user_id,
+            showtime_id=reservation.showtime_id,
+            payment_status="pending",
+            created_at=now,
+            amount=showtime.price * len(seat_ids),
+            hold_expires_at=now + timedelta(minutes=SEAT_HOLD_TTL_MINUTES)
+        ).returning(models.Reservation.id)
+        reservation_id = await database.execute(reservation_query)
+        
+        await _claim_seats(reservation_id, reservation.showtime_id, seat_ids)
+        
+        await database.execute_many(
+            query=models.ReservationSeat.__table__.insert(),
+            values=[{"reservation_id": reservation_id, "seat_id": seat_id} for seat_id in seat_ids]
         )
-        await database.execute(seat_query)
+    _seats_taken(reservation.showtime_id, seat_ids)
     
     # Получение данных о бронировании
     return await get_reservation(reservation_id)
 
-async def get_user_reservations(user_id: int):
+async def get_user_reservations(user_id: int, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None):
+    # Returns (reservations, next_cursor), newest first
     query = select(models.Reservation).where(models.Reservation.user_id == user_id)
-    reservations = await database.fetch_all(query)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.where(models.Reservation.id < last_id)
+    reservations, next_cursor = paginate(
+        await database.fetch_all(query.order_by(models.Reservation.id.desc()).limit(limit + 1)),
+        limit, key=lambda r: (r["id"],)
+    )
     
-    result = []
-    for reservation in reservations:
-        reservation_dict = dict(reservation)
-        
-        # Get showtime data
-        showtime_query = select(models.Showtime).where(models.Showtime.id == reservation.showtime_id)
-        showtime = await database.fetch_one(showtime_query)
-        showtime_dict = dict(showtime) if showtime else None
-        
-        # Fetch movie and hall for the showtime
-        if showtime:
-            movie_query = select(models.Movie).where(models.Movie.id == showtime.movie_id)
-            movie = await database.fetch_one(movie_query)
-            
-            hall_query = select(models.Hall).where(models.Hall.id == showtime.hall_id)
-            hall = await database.fetch_one(hall_query)
-            
-            showtime_dict["movie"] = dict(movie) if movie else None
-            showtime_dict["hall"] = dict(hall) if hall else None
-        
-        # Get seat data - Using the same join approach as get_reservation
-        seat_query = select(models.Seat).join(
-            models.ReservationSeat, 
-            models.Seat.id == models.ReservationSeat.seat_id
-        ).where(models.ReservationSeat.reservation_id == reservation.id)
-        
-        seats = await database.fetch_all(seat_query)
-        seats_list = [dict(seat) for seat in seats]
-        
-        reservation_dict["showtime"] = showtime_dict
-        reservation_dict["seats"] = seats_list  # Now returning a list of seats
-        
-        result.append(reservation_dict)
+    # Showtimes, movies, halls and seats are loaded in batches for all reservations
+    return await loaders.load_reservations(reservations), next_cursor
+
+async def get_showtime_reservations(showtime_id: int, payment_status: Optional[str] = None):
+    query = select(models.Reservation).where(models.Reservation.showtime_id == showtime_id)
+    if payment_status:
+        query = query.where(models.Reservation.payment_status == payment_status)
+    reservations = await database.fetch_all(query.order_by(models.Reservation.id))
     
-    return result
+    return await loaders.load_reservations(reservations)
 
 async def get_reservation(reservation_id: int):
     # Получаем базовую информацию о бронировании
@@ -289,72 +595,157 @@ async def get_reservation(reservation_id: int):
     if not reservation:
         return None
     
-    reservation_dict = dict(reservation)
-    
-    # Получаем информацию о сеансе
-    showtime_query = select(models.Showtime).where(models.Showtime.id == reservation.showtime_id)
-    showtime = await database.fetch_one(showtime_query)
-    showtime_dict = dict(showtime) if showtime else None
-    
-    if showtime:
-        # Получаем данные о фильме и зале
-        movie_query = select(models.Movie).where(models.Movie.id == showtime.movie_id)
-        movie = await database.fetch_one(movie_query)
+    # Добавляем связанные объекты (сеанс, фильм, зал, места) к ответу
+    reservations = await loaders.load_reservations([reservation])
+    return reservations[0]
+
+async def update_reservation_status(reservation_id: int, payment_status: str):
+    seat_query = select(models.ReservationSeat.seat_id).where(
+        models.ReservationSeat.reservation_id == reservation_id
+    )
+    seat_ids = [seat["seat_id"] for seat in await database.fetch_all(seat_query)]
+    
+    async with database.transaction():
+        # The current status is read inside the transaction (row locked on PostgreSQL),
+        # so concurrent updates cannot both claim seats or count the same sale
+        query = select(models.Reservation).where(
+            models.Reservation.id == reservation_id
+        ).with_for_update()
+        reservation = await database.fetch_one(query)
+        if not reservation:
+            return None
         
-        hall_query = select(models.Hall).where(models.Hall.id == showtime.hall_id)
-        hall = await database.fetch_one(hall_query)
+        # Cancelling frees the seats; reviving a cancelled or expired reservation claims them again
+        was_released = reservation.payment_status in RELEASED_STATUSES
+        releasing = payment_status in RELEASED_STATUSES and not was_released
+        reclaiming = was_released and payment_status not in RELEASED_STATUSES
+        was_completed = reservation.payment_status == "completed"
         
-        showtime_dict["movie"] = dict(movie) if movie else None
-        showtime_dict["hall"] = dict(hall) if hall else None
-    
-    # Получаем информацию о всех забронированных местах
-    seat_query = select(models.Seat).join(
-        models.ReservationSeat, 
-        models.Seat.id == models.ReservationSeat.seat_id
-    ).where(models.ReservationSeat.reservation_id == reservation_id)
-    seats = await database.fetch_all(seat_query)
-    seats_list = [dict(seat) for seat in seats]
+        values = {"payment_status": payment_status}
+        if payment_status == "pending" and reclaiming:
+            values["hold_expires_at"] = datetime.utcnow() + timedelta(minutes=SEAT_HOLD_TTL_MINUTES)
+        
+        query = models.Reservation.__table__.update().where(
+            models.Reservation.id == reservation_id
+        ).values(**values)
+        await database.execute(query)
+        
+        if releasing:
+            await _release_seats(reservation_id)
+        elif reclaiming:
+            await _claim_seats(reservation_id, reservation.showtime_id, seat_ids)
+        
+        # Sales statistics follow moves to and from "completed"
+        if payment_status == "completed" and not was_completed:
+            await sales.record_sale(reservation_id)
+        elif was_completed and payment_status != "completed":
+            await sales.record_sale(reservation_id, sign=-1)
     
-    # Добавляем связанные объекты к ответу
-    reservation_dict["showtime"] = showtime_dict
-    reservation_dict["seats"] = seats_list
+    if releasing:
+        _seats_freed(reservation.showtime_id, seat_ids)
+    elif reclaiming:
+        _seats_taken(reservation.showtime_id, seat_ids)
     
-    return reservation_dict
+    # Get updated reservation
+    return await get_reservation(reservation_id)
 
-async def update_reservation_status(reservation_id: int, payment_status: str):
+async def extend_seat_hold(reservation_id: int):
+    # Checkout activity keeps the hold alive; only pending, unexpired holds can be extended
+    now = datetime.utcnow()
     query = models.Reservation.__table__.update().where(
-        models.Reservation.id == reservation_id
-    ).values(payment_status=payment_status)
-    
+        models.Reservation.id == reservation_id,
+        models.Reservation.payment_status == "pending",
+        models.Reservation.hold_expires_at >= now
+    ).values(hold_expires_at=now + timedelta(minutes=SEAT_HOLD_TTL_MINUTES))
     await database.execute(query)
     
-    # Get updated reservation
     return await get_reservation(reservation_id)
 
+async def expire_seat_holds(batch_size: int = 500):
+    # Releases one batch of expired holds; returns how many reservations expired
+    now = datetime.utcnow()
+    query = select(models.Reservation.id, models.Reservation.showtime_id).where(
+        models.Reservation.payment_status == "pending",
+        models.Reservation.hold_expires_at < now
+    ).limit(batch_size)
+    expired = await database.fetch_all(query)
+    if not expired:
+        return 0
+    
+    reservation_ids = [r["id"] for r in expired]
+    async with database.transaction():
+        # Recheck status and expiry so a payment or a new hold that landed
+        # meanwhile is not expired; only the rows updated here are released
+        update_query = models.Reservation.__table__.update().where(
+            models.Reservation.id.in_(reservation_ids),
+            models.Reservation.payment_status == "pending",
+            models.Reservation.hold_expires_at < now
+        ).values(payment_status="expired").returning(models.Reservation.id)
+        expired_ids = [r["id"] for r in await database.fetch_all(update_query)]
+        
+        claims = []
+        if expired_ids:
+            claims_query = select(models.SeatClaim.showtime_id, models.SeatClaim.seat_id).where(
+                models.SeatClaim.reservation_id.in_(expired_ids)
+            )
+            claims = await database.fetch_all(claims_query)
+            await database.execute(models.SeatClaim.__table__.delete().where(
+                models.SeatClaim.reservation_id.in_(expired_ids)
+            ))
+    
+    seats_by_showtime = {}
+    for claim in claims:
+        seats_by_showtime.setdefault(claim["showtime_id"], []).append(claim["seat_id"])
+    for showtime_id, seat_ids in seats_by_showtime.items():
+        _seats_freed(showtime_id, seat_ids)
+    
+    return len(expired_ids)
+
 # Hall operations
-async def get_halls():
-    query = select(models.Hall)
-    return await database.fetch_all(query)
+@catalogue_cache.cached("halls")
+async def get_halls(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None):
+    # Returns (halls, next_cursor)
+    query = _after_id(select(models.Hall), models.Hall, cursor)
+    halls = await database.fetch_all(query.order_by(models.Hall.id).limit(limit + 1))
+    return paginate(halls, limit, key=lambda h: (h["id"],))
 
+@catalogue_cache.cached("halls")
 async def get_hall(hall_id: int):
     query = select(models.Hall).where(models.Hall.id == hall_id)
     return await database.fetch_one(query)
 
+def _hall_values(hall: schemas.HallCreate):
+    # Column values for a hall; a layout defines rows, seats_per_row and capacity
+    values = hall.dict()
+    layout_rows = layouts.hall_layout(hall.layout, hall.rows, hall.seats_per_row)
+    if hall.layout:
+        values.update(layouts.geometry(layout_rows), layout=layouts.ROW_SEPARATOR.join(layout_rows))
+    return values
+
+def _hall_seats(hall_id: int, values: dict):
+    layout_rows = layouts.hall_layout(values["layout"], values["rows"], values["seats_per_row"])
+    return [
+        {"hall_id": hall_id, "row": position.row, "number": position.number}
+        for position in layouts.seat_positions(layout_rows)
+    ]
+
 async def create_hall(hall: schemas.HallCreate):
-    query = models.Hall.__table__.insert().values(**hall.dict())
-    hall_id = await database.execute(query)
-    
-    # Create seats for this hall
-    for row in range(1, hall.rows + 1):
-        for seat_num in range(1, hall.seats_per_row + 1):
-            seat_query = models.Seat.__table__.insert().values(
-                hall_id=hall_id,
-                row=row,
-                number=seat_num
-            )
-            await database.execute(seat_query)
-    
-    return {**hall.dict(), "id": hall_id}
+    return (await create_halls([hall]))[0]
+
+async def create_halls(halls: List[schemas.HallCreate]):
+    # All halls are validated first, then created with their seats in one transaction
+    values = [_hall_values(hall) for hall in halls]
+    created, seats = [], []
+    async with database.transaction():
+        for hall_values in values:
+            query = models.Hall.__table__.insert().values(**hall_values).returning(models.Hall.id)
+            hall_id = await database.execute(query)
+            created.append({**hall_values, "id": hall_id})
+            seats.extend(_hall_seats(hall_id, hall_values))
+        await database.execute_many(query=models.Seat.__table__.insert(), values=seats)
+    await catalogue_cache.invalidate("halls")
+    
+    return created
 
 async def update_hall(hall_id: int, hall: schemas.HallCreate):
     # First check if the hall exists
@@ -362,16 +753,72 @@ async def update_hall(hall_id: int, hall: schemas.HallCreate):
     if not existing_hall:
         return None
     
-    # Update the hall
-    query = models.Hall.__table__.update().where(
-        models.Hall.id == hall_id
-    ).values(**hall.dict())
+    values = _hall_values(hall)
+    wanted = {(seat["row"], seat["number"]) for seat in _hall_seats(hall_id, values)}
+    seat_query = select(models.Seat.id, models.Seat.row, models.Seat.number, models.Seat.is_active).where(
+        models.Seat.hall_id == hall_id
+    )
     
-    await database.execute(query)
+    # Seats are reconciled with the new layout: only the difference is added or removed
+    async with database.transaction():
+        seats = {(seat["row"], seat["number"]): seat for seat in await database.fetch_all(seat_query)}
+        active = {key for key, seat in seats.items() if seat["is_active"]}
+        removed_ids = [seats[key]["id"] for key in active - wanted]
+        revived_ids = [seats[key]["id"] for key in wanted & (seats.keys() - active)]
+        added = [
+            {"hall_id": hall_id, "row": row, "number": number}
+            for row, number in sorted(wanted - seats.keys())
+        ]
+        
+        if removed_ids:
+            await _remove_seats(removed_ids)
+        if revived_ids:
+            await database.execute(models.Seat.__table__.update().where(
+                models.Seat.id.in_(revived_ids)
+            ).values(is_active=True))
+        if added:
+            await database.execute_many(query=models.Seat.__table__.insert(), values=added)
+        
+        query = models.Hall.__table__.update().where(
+            models.Hall.id == hall_id
+        ).values(**values)
+        await database.execute(query)
+    
+    for showtime_id in occupancy_index.drop_hall(hall_id):
+        seat_events.resync(showtime_id)
+    # Showtimes embed their hall
+    await catalogue_cache.invalidate("halls", "showtimes")
     
     # Return the updated hall
     return await get_hall(hall_id)
 
+async def _remove_seats(seat_ids: List[int]):
+    # Seats held for showtimes that have not finished (upcoming or running) cannot be removed
+    booked_query = select(models.Seat.row, models.Seat.number).join(
+        models.SeatClaim, models.SeatClaim.seat_id == models.Seat.id
+    ).join(
+        models.Showtime, models.Showtime.id == models.SeatClaim.showtime_id
+    ).where(
+        models.Seat.id.in_(seat_ids),
+        not_finished(datetime.now())
+    ).distinct().order_by(models.Seat.row, models.Seat.number)
+    booked = await database.fetch_all(booked_query)
+    if booked:
+        listed = ", ".join(f"{seat['row']}-{seat['number']}" for seat in booked)
+        raise ValueError(f"Seats booked for upcoming or running showtimes cannot be removed (row-number): {listed}")
+    
+    # Seats on past tickets stay as inactive rows; the others are deleted
+    referenced = select(models.ReservationSeat.seat_id).where(
+        models.ReservationSeat.seat_id.in_(seat_ids)
+    )
+    await database.execute(models.Seat.__table__.delete().where(
+        models.Seat.id.in_(seat_ids),
+        models.Seat.id.notin_(referenced)
+    ))
+    await database.execute(models.Seat.__table__.update().where(
+        models.Seat.id.in_(seat_ids)
+    ).values(is_active=False))
+
 async def delete_hall(hall_id: int):
     # Check if there are any showtimes using this hall
     query = select(models.Showtime).where(models.Showtime.hall_id == hall_id)
@@ -391,49 +838,150 @@ async def delete_hall(hall_id: int):
         models.Hall.id == hall_id
     )
     await database.execute(query)
+    for showtime_id in occupancy_index.drop_hall(hall_id):
+        seat_events.resync(showtime_id)
+    await catalogue_cache.invalidate("halls")
     
     return True
 
-# Statistics for admin
+# Statistics for admin, served from the sales aggregates
 async def get_statistics():
-    # Total sales
-    query = select(func.sum(models.Showtime.price)).select_from(models.Showtime).join(
-        models.Reservation, models.Reservation.showtime_id == models.Showtime.id
-    ).where(models.Reservation.payment_status == "completed")
-    total_sales = await database.fetch_val(query) or 0
-    
-    # Tickets sold
-    query = select(func.count()).select_from(models.Reservation).where(models.Reservation.payment_status == "completed")
-    tickets_sold = await database.fetch_val(query) or 0
-    
-    # Popular movies - Fix the query to properly include reservation counts
-    query = """
-        SELECT 
-            m.id, m.title, m.description, m.duration, m.poster_url, m.release_date,
-            COUNT(r.id) as reservations
-        FROM 
-            movies m
-        LEFT JOIN 
-            showtimes s ON m.id = s.movie_id
-        LEFT JOIN 
-            reservations r ON s.id = r.showtime_id AND r.payment_status = 'completed'
-        GROUP BY 
-            m.id
-        ORDER BY 
-            reservations DESC, m.title ASC
-        LIMIT 5
-    """
-    
-    popular_movies_data = await database.fetch_all(query=query)
-    
-    # Convert to proper dictionary format with reservations count
-    popular_movies = []
-    for record in popular_movies_data:
-        movie_dict = dict(record)
-        popular_movies.append(movie_dict)
+    # Total sales and tickets sold
+    query = select(models.SalesAggregate.revenue, models.SalesAggregate.tickets).where(
+        models.SalesAggregate.scope == "total",
+        models.SalesAggregate.key == 0
+    )
+    totals = await database.fetch_one(query)
+    
+    # Popular movies by seats sold
+    tickets = func.coalesce(models.SalesAggregate.tickets, 0)
+    movie_columns = [
+        models.Movie.id, models.Movie.title, models.Movie.description,
+        models.Movie.duration, models.Movie.poster_url, models.Movie.release_date
+    ]
+    query = select(*movie_columns).select_from(models.Movie).outerjoin(
+        models.SalesAggregate, and_(
+            models.SalesAggregate.scope == "movie",
+            models.SalesAggregate.key == models.Movie.id
+        )
+    ).order_by(tickets.desc(), models.Movie.title.asc()).limit(5)
+    
+    popular_movies = [dict(record) for record in await database.fetch_all(query)]
     
     return {
-        "total_sales": float(total_sales),
-        "tickets_sold": tickets_sold,
+        "total_sales": float(totals["revenue"]) if totals else 0.0,
+        "tickets_sold": totals["tickets"] if totals else 0,
         "popular_movies": popular_movies
-    }
\ No newline at end of file
+    }
+
+# Sales analytics, served from the per-day rollups
+ANALYTICS_GROUPS = ("day", "week", "movie", "hall", "showtime")
+
+async def get_sales_analytics(
+    group_by: str = "day",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    movie_id: Optional[int] = None,
+    hall_id: Optional[int] = None
+):
+    # Revenue and seats sold per bucket; dates are booking days, both ends inclusive
+    if group_by not in ANALYTICS_GROUPS:
+        raise ValueError(f"group_by must be one of: {', '.join(ANALYTICS_GROUPS)}")
+    rollup = models.SalesRollup
+    column = {
+        "day": rollup.day,
+        "week": rollup.day,
+        "movie": rollup.movie_id,
+        "hall": rollup.hall_id,
+        "showtime": rollup.showtime_id,
+    }[group_by]
+    
+    query = select(
+        column.label("key"),
+        func.sum(rollup.revenue).label("revenue"),
+        func.sum(rollup.seats).label("seats_sold")
+    ).group_by(column).order_by(column)
+    if date_from:
+        query = query.where(rollup.day >= date_from)
+    if date_to:
+        query = query.where(rollup.day <= date_to)
+    if movie_id:
+        query = query.where(rollup.movie_id == movie_id)
+    if hall_id:
+        query = query.where(rollup.hall_id == hall_id)
+    
+    buckets = {}
+    for row in await database.fetch_all(query):
+        key = row["key"]
+        if group_by == "week":
+            key = key - timedelta(days=key.weekday())  # week starts on Monday
+        bucket = buckets.setdefault(key, {"revenue": 0.0, "seats_sold": 0})
+        bucket["revenue"] += row["revenue"] or 0
+        bucket["seats_sold"] += row["seats_sold"] or 0
+    
+    labels = {}
+    if group_by == "movie":
+        labels = {i: m["title"] for i, m in (await loaders.fetch_by_ids(models.Movie, buckets)).items()}
+    elif group_by == "hall":
+        labels = {i: h["name"] for i, h in (await loaders.fetch_by_ids(models.Hall, buckets)).items()}
+    elif group_by == "showtime":
+        showtimes = await loaders.fetch_by_ids(models.Showtime, buckets)
+        labels = {i: s["start_time"].isoformat() for i, s in showtimes.items()}
+    
+    return [
+        {
+            "key": key.isoformat() if isinstance(key, date) else str(key),
+            "label": labels.get(key),
+            "revenue": float(bucket["revenue"]),
+            "seats_sold": bucket["seats_sold"],
+        }
+        for key, bucket in buckets.items()
+        if bucket["revenue"] or bucket["seats_sold"]
+    ]
+
+async def get_occupancy_analytics(
+    movie_id: Optional[int] = None,
+    hall_id: Optional[int] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None
+):
+    # Returns (reports, next_cursor): seats sold per showtime against the hall's seat count
+    query = _filter_showtimes(select(models.Showtime), movie_id, hall_id, start_from, start_to, False, cursor)
+    showtimes, next_cursor = paginate(
+        await database.fetch_all(query.limit(limit + 1)), limit, key=lambda s: (s["start_time"], s["id"])
+    )
+    if not showtimes:
+        return [], next_cursor
+    
+    sold_query = select(
+        models.SalesRollup.showtime_id, func.sum(models.SalesRollup.seats).label("seats")
+    ).where(
+        models.SalesRollup.showtime_id.in_([s["id"] for s in showtimes])
+    ).group_by(models.SalesRollup.showtime_id)
+    sold = {row["showtime_id"]: row["seats"] for row in await database.fetch_all(sold_query)}
+    
+    # Capacity: the seats generated from each hall's geometry
+    capacity_query = select(
+        models.Seat.hall_id, func.count().label("seats")
+    ).where(
+        models.Seat.hall_id.in_({s["hall_id"] for s in showtimes}),
+        models.Seat.is_active
+    ).group_by(models.Seat.hall_id)
+    capacity = {row["hall_id"]: row["seats"] for row in await database.fetch_all(capacity_query)}
+    
+    reports = []
+    for showtime in showtimes:
+        seats_total = capacity.get(showtime["hall_id"], 0)
+        seats_sold = sold.get(showtime["id"]) or 0
+        reports.append({
+            "showtime_id": showtime["id"],
+            "movie_id": showtime["movie_id"],
+            "hall_id": showtime["hall_id"],
+            "start_time": showtime["start_time"],
+            "capacity": seats_total,
+            "seats_sold": seats_sold,
+            "occupancy_rate": seats_sold / seats_total if seats_total else 0.0,
+        })
+    return reports, next_cursor
@@ -0,0 +1,58 @@
+from typing import Iterator, List, NamedTuple, Optional
+
+# Hall layouts.
+# A layout is one string per row, rows separated by "/", one character per
+# position: "." is an aisle or a gap, any other character is a seat of that
+# category. Seats are numbered from 1 within their row, skipping gaps. Halls
+# without a layout are plain rows x seats_per_row rectangles of standard seats.
+# Only real seats get a row in the seats table; gaps and categories live in the
+# layout string.
+
+ROW_SEPARATOR = "/"
+GAP = "."
+STANDARD = "S"
+CATEGORIES = {
+    STANDARD: "standard",
+    "V": "vip",
+    "A": "accessible",
+}
+
+class SeatPosition(NamedTuple):
+    row: int
+    number: int
+    column: int  # 0-based position in the row, gaps included
+    category: str
+
+def parse_layout(layout: str) -> List[str]:
+    rows = layout.strip().split(ROW_SEPARATOR)
+    if not any(set(row) - {GAP} for row in rows):
+        raise ValueError("Layout must contain at least one seat")
+    for index, row in enumerate(rows, start=1):
+        invalid = set(row) - {GAP} - set(CATEGORIES)
+        if invalid:
+            raise ValueError(f"Layout row {index} contains unknown characters: {''.join(sorted(invalid))}")
+    return rows
+
+def rectangular_layout(rows: int, seats_per_row: int) -> List[str]:
+    if rows < 1 or seats_per_row < 1:
+        raise ValueError("Hall must have at least one row and one seat per row")
+    return [STANDARD * seats_per_row] * rows
+
+def hall_layout(layout: Optional[str], rows: int, seats_per_row: int) -> List[str]:
+    return parse_layout(layout) if layout else rectangular_layout(rows, seats_per_row)
+
+def seat_positions(layout_rows: List[str]) -> Iterator[SeatPosition]:
+    for row, cells in enumerate(layout_rows, start=1):
+        number = 0
+        for column, cell in enumerate(cells):
+            if cell != GAP:
+                number += 1
+                yield SeatPosition(row, number, column, CATEGORIES[cell])
+
+def geometry(layout_rows: List[str]) -> dict:
+    # Hall columns derived from a layout; seats_per_row is the widest row
+    return {
+        "rows": len(layout_rows),
+        "seats_per_row": max(len(row) for row in layout_rows),
+        "capacity": sum(len(row) - row.count(GAP) for row in layout_rows),
+    }
@@ -0,0 +1,66 @@
+from sqlalchemy.sql import select
+import models
+from database import database
+from typing import Dict, Iterable, List
+
+# Batched loaders used by crud to build nested payloads.
+# Each helper issues one query per related table (IN (...) keyed by id),
+# so the number of queries does not depend on the number of rows.
+
+async def fetch_by_ids(model, ids: Iterable[int]) -> Dict[int, dict]:
+    ids = set(i for i in ids if i is not None)
+    if not ids:
+        return {}
+    query = select(model).where(model.id.in_(ids))
+    rows = await database.fetch_all(query)
+    return {row["id"]: dict(row) for row in rows}
+
+async def load_showtimes(showtimes) -> List[dict]:
+    # showtimes -> movies + halls: 2 queries
+    showtimes = [dict(showtime) for showtime in showtimes]
+    movies = await fetch_by_ids(models.Movie, (s["movie_id"] for s in showtimes))
+    halls = await fetch_by_ids(models.Hall, (s["hall_id"] for s in showtimes))
+
+    for showtime in showtimes:
+        showtime["movie"] = movies.get(showtime["movie_id"])
+        showtime["hall"] = halls.get(showtime["hall_id"])
+    return showtimes
+
+async def load_reservation_seats(reservation_ids: Iterable[int]) -> Dict[int, List[dict]]:
+    reservation_ids = set(reservation_ids)
+    seats_by_reservation = {reservation_id: [] for reservation_id in reservation_ids}
+    if not reservation_ids:
+        return seats_by_reservation
+
+    query = select(
+        models.ReservationSeat.reservation_id,
+        models.Seat.id,
+        models.Seat.hall_id,
+        models.Seat.row,
+        models.Seat.number
+    ).join(
+        models.Seat, models.Seat.id == models.ReservationSeat.seat_id
+    ).where(
+        models.ReservationSeat.reservation_id.in_(reservation_ids)
+    ).order_by(models.ReservationSeat.id)
+    rows = await database.fetch_all(query)
+
+    for row in rows:
+        seat = dict(row)
+        seats_by_reservation[seat.pop("reservation_id")].append(seat)
+    return seats_by_reservation
+
+async def load_reservations(reservations) -> List[dict]:
+    # reservations -> showtimes -> movies + halls, plus seats: 4 queries
+    reservations = [dict(reservation) for reservation in reservations]
+    if not reservations:
+        return []
+
+    showtime_rows = await fetch_by_ids(models.Showtime, (r["showtime_id"] for r in reservations))
+    showtimes = {s["id"]: s for s in await load_showtimes(showtime_rows.values())}
+    seats = await load_reservation_seats(r["id"] for r in reservations)
+
+    for reservation in reservations:
+        reservation["showtime"] = showtimes.get(reservation["showtime_id"])
+        reservation["seats"] = seats[reservation["id"]]
+    return reservations
@@ -0,0 +1,191 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from dotenv import load_dotenv
+
+# Read at import time, like the database settings
+load_dotenv()
+
+# Structured logging.
+# Records are JSON lines on stdout with the request id and route of the request
+# they belong to. Loggers only put records on a bounded queue; a background
+# thread formats and writes them, so a slow stdout never blocks the event loop,
+# and when the queue is full records are dropped (and counted) instead.
+# Lower levels can be sampled, e.g. LOG_SAMPLE_RATES="DEBUG=0.01,INFO=0.1".
+# Fields and messages are scrubbed of passwords, hashes and tokens.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATES = {
+    level.strip().upper(): float(rate)
+    for level, rate in (item.split("=", 1) for item in os.getenv("LOG_SAMPLE_RATES", "").split(",") if "=" in item)
+}
+
+REDACTED = "[redacted]"
+SECRET_FIELDS = re.compile(r"pass(word)?|secret|token|hash|authorization|cookie|api_?key", re.IGNORECASE)
+SECRET_VALUES = [
+    re.compile(r"eyJ[\w-]+\.[\w-]+\.[\w-]+"),  # JWTs
+    re.compile(r"\$2[aby]?\$\d\d\$[./\w]{53}"),  # bcrypt hashes
+    re.compile(r"(?i)(bearer\s+)[\w.~+/-]+=*"),
+    re.compile(r"(?i)((?:password|secret|token)\s*[=:]\s*)\S+"),
+]
+
+request_id = contextvars.ContextVar("request_id", default=None)
+route = contextvars.ContextVar("route", default=None)
+
+# LogRecord attributes that are not extra fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName", "color_message"}
+
+def redact_text(text: str) -> str:
+    for pattern in SECRET_VALUES:
+        text = pattern.sub(lambda match: (match.group(1) if match.groups() else "") + REDACTED, text)
+    return text
+
+def redact(value, key: str = ""):
+    if key and SECRET_FIELDS.search(key):
+        return REDACTED
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(redact(entry), default=str, ensure_ascii=False)
+
+class ContextFilter(logging.Filter):
+    # Sampling and request context, applied in the calling thread
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = LOG_SAMPLE_RATES.get(record.levelname)
+        if rate is not None and random.random() >= rate:
+            return False
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id.get()
+        if getattr(record, "route", None) is None:
+            record.route = route.get()
+        return True
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Freeze the message and traceback; JSON formatting happens on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _Listener:
+    handler = None
+    listener = None
+
+def setup() -> None:
+    # Idempotent; installs the queue handler on the root logger
+    if _Listener.handler is not None:
+        return
+    # Caller, thread and process details are not part of the output; skipping
+    # them is most of the cost of creating a record
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JSONFormatter())
+    listener = QueueListener(log_queue, output, respect_handler_level=False)
+    listener.start()
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    _Listener.handler, _Listener.listener = handler, listener
+    atexit.register(shutdown)
+
+def shutdown() -> None:
+    # Flushes the queue; call on application shutdown
+    if _Listener.listener is not None:
+        _Listener.listener.stop()
+        logging.getLogger().removeHandler(_Listener.handler)
+        _Listener.handler = _Listener.listener = None
+
+def dropped() -> int:
+    return _Listener.handler.dropped if _Listener.handler is not None else 0
+
+def get_logger(name: str) -> logging.Logger:
+    setup()
+    return logging.getLogger(name)
+
+logger = get_logger("http")
+
+class RequestLoggingMiddleware:
+    # ASGI middleware: request id (X-Request-ID, generated if missing) for every
+    # log record of the request, and one access record with status and latency
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")[:64]
+        current_id = incoming or uuid.uuid4().hex
+        request_token = request_id.set(current_id)
+        route_token = route.set(scope["path"])
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", current_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            matched = scope.get("route")
+            logger.info("request", extra={
+                "route": getattr(matched, "path", scope["path"]),
+                "method": scope["method"],
+                "status": status_code,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            })
+            request_id.reset(request_token)
+            route.reset(route_token)
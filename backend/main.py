@@ -1,18 +1,33 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 from database import database, get_db
-import models
 import schemas
 import crud
-from ticket_generator import generate_ticket_pdf
-from fastapi.responses import StreamingResponse
+import schedules
+from ticket_generator import generate_ticket_pdf, generate_tickets_pdf, generate_tickets_zip, shutdown_executor
+from passwords import PasswordHasher, PasswordHasherBusy
+from seat_events import seat_events, format_event, RESYNC, CLOSE
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from migrations import apply_migrations
+from cache import catalogue_cache
+from revocation import REVOCATION_SYNC_SECONDS
+import logs
+import metrics
+import tracing
+import ratelimit
+import secrets
+from fastapi.responses import StreamingResponse, JSONResponse
 import os
+import asyncio
+import hashlib
+import time
+import uuid
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -21,11 +36,45 @@ load_dotenv()
 # JWT Configuration from environment variables
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "fallback_secret_key_for_development_only")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("JWT_REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+# Expired refresh and revoked tokens are deleted this often
+TOKEN_PRUNE_INTERVAL_SECONDS = float(os.getenv("TOKEN_PRUNE_INTERVAL_SECONDS", "3600"))
+
+# Password hashing pool configuration
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+# Expired seat hold sweeper
+SEAT_HOLD_SWEEP_INTERVAL_SECONDS = float(os.getenv("SEAT_HOLD_SWEEP_INTERVAL_SECONDS", "30"))
+SEAT_HOLD_SWEEP_BATCH_SIZE = int(os.getenv("SEAT_HOLD_SWEEP_BATCH_SIZE", "500"))
+
+# Seat map stream keepalive interval
+SEAT_STREAM_KEEPALIVE_SECONDS = float(os.getenv("SEAT_STREAM_KEEPALIVE_SECONDS", "15"))
+
+# Cache-Control for public catalogue reads
+MOVIES_CACHE_CONTROL = os.getenv("MOVIES_CACHE_CONTROL", "public, max-age=300, stale-while-revalidate=3600")
+HALLS_CACHE_CONTROL = os.getenv("HALLS_CACHE_CONTROL", "public, max-age=300, stale-while-revalidate=3600")
+SHOWTIMES_CACHE_CONTROL = os.getenv("SHOWTIMES_CACHE_CONTROL", "public, max-age=30, stale-while-revalidate=300")
 
 # Initialize FastAPI
 app = FastAPI(title="Cinema Ticket Sales System")
 
+logger = logs.get_logger("main")
+
+def rate_limit_client(scope) -> Optional[str]:
+    # Authenticated requests are limited per user, the rest per IP address
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = decode_access_token(token)
+    return f"user:{payload['user_id']}" if payload else None
+
+# Rate limits per client and route group; inside CORS, so 429s carry the CORS headers
+if ratelimit.RATE_LIMIT_ENABLED:
+    app.add_middleware(ratelimit.RateLimitMiddleware, identify=rate_limit_client)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -36,81 +85,211 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Opt-in query tracing (QUERY_TRACE / X-Query-Trace), inside the request id context
+app.add_middleware(tracing.QueryTraceMiddleware)
+
+# Per-route latency, status and database metrics for GET /metrics
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Request ids and access log; added last, so it is the outermost middleware
+app.add_middleware(logs.RequestLoggingMiddleware)
+
 # Authentication
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(pwd_context, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# For endpoints that also work without an access token
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
-# Create database tables
+# Apply schema migrations
 @app.on_event("startup")
 async def startup():
     await database.connect()
-    models.create_tables()
+    # Migrations and backfills; workers starting together take turns
+    apply_migrations()
+    await crud.occupancy_index.rebuild()
+    await crud.revocation_index.rebuild()
+    app.state.hold_sweeper = asyncio.create_task(sweep_expired_holds())
+    app.state.revocation_sync = asyncio.create_task(sync_revoked_tokens())
 
 @app.on_event("shutdown")
 async def shutdown():
+    # Wait for the background tasks to hand back their connections before the pool is closed
+    for task in (app.state.hold_sweeper, app.state.revocation_sync):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
     await database.disconnect()
+    password_hasher.shutdown()
+    shutdown_executor()
+    tracing.slow_query_log.shutdown()
+    logs.shutdown()
+
+async def sweep_expired_holds():
+    while True:
+        try:
+            # Drain in batches, then wait for the next round
+            while await crud.expire_seat_holds(SEAT_HOLD_SWEEP_BATCH_SIZE) == SEAT_HOLD_SWEEP_BATCH_SIZE:
+                await asyncio.sleep(0)
+            # Seat maps of showtimes that have ended leave the index
+            crud.occupancy_index.evict_finished()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error expiring seat holds")
+        await asyncio.sleep(SEAT_HOLD_SWEEP_INTERVAL_SECONDS)
+
+async def sync_revoked_tokens():
+    # Revocations made by other workers, and the occasional cleanup of expired tokens
+    pruned_at = None
+    while True:
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+        try:
+            await crud.revocation_index.sync()
+            if pruned_at is None or time.monotonic() - pruned_at >= TOKEN_PRUNE_INTERVAL_SECONDS:
+                await crud.prune_tokens()
+                pruned_at = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error syncing revoked tokens")
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request, exc):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication service is busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
 
 # Authentication endpoints
+# /token checks the password and starts a token family: a short-lived access token
+# and a refresh token. /token/refresh swaps a refresh token for a new pair without
+# bcrypt; every refresh token works once. Revoked access tokens are kept in
+# crud.revocation_index, so get_current_user checks them without a query.
+def new_token_ids() -> dict:
+    now = datetime.utcnow()
+    return {
+        "jti": uuid.uuid4().hex,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        "access_jti": uuid.uuid4().hex,
+        "access_expires_at": now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    }
+
+def token_response(user, family: str, token: dict) -> dict:
+    access_token = create_access_token(
+        data={"sub": user.username, "user_id": user.id, "is_admin": user.is_admin,
+              "jti": token["access_jti"], "fam": family},
+        expires_at=token["access_expires_at"]
+    )
+    refresh_token = create_access_token(
+        data={"sub": user.username, "type": "refresh", "jti": token["jti"]},
+        expires_at=token["expires_at"]
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
 @app.post("/token", response_model=schemas.Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    # Детальное логирование для отладки
-    print(f"Login attempt for user: {form_data.username}")
-    print(f"Password received (length): {len(form_data.password or '')}")
+    # Пытаемся аутентифицировать пользователя
+    user = await crud.authenticate_user(form_data.username, form_data.password, password_hasher)
+    if not user:
+        logger.info("Login failed", extra={"username": form_data.username})
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
+    logger.info("Login succeeded", extra={"user_id": user.id, "is_admin": user.is_admin})
+    family = uuid.uuid4().hex
+    token = new_token_ids()
+    await crud.create_refresh_token(user.id, family, token)
+    return token_response(user, family, token)
+
+@app.post("/token/refresh", response_model=schemas.Token)
+async def refresh_access_token(body: schemas.TokenRefresh):
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
     try:
-        # Проверяем существование пользователя и логируем
-        user_exists = await crud.get_user_by_username(form_data.username)
-        print(f"User exists: {user_exists is not None}")
-        if user_exists:
-            print(f"User ID: {user_exists.id}, Password hash: {user_exists.hashed_password[:10]}...")
-        
-        # Пытаемся аутентифицировать пользователя
-        user = await crud.authenticate_user(form_data.username, form_data.password, pwd_context)
-        if not user:
-            print(f"Authentication failed for user: {form_data.username}")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect username or password",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        print(f"Authentication successful for user: {form_data.username}")
-        print(f"User ID: {user.id}, Is Admin: {user.is_admin}")
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.username, "user_id": user.id, "is_admin": user.is_admin}, 
-            expires_delta=access_token_expires
-        )
-        return {"access_token": access_token, "token_type": "bearer"}
-    except Exception as e:
-        print(f"Error during login: {str(e)}")
-        raise
+        payload = jwt.decode(body.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise invalid_token
+    if payload.get("type") != "refresh" or not payload.get("jti"):
+        raise invalid_token
+    
+    token = new_token_ids()
+    try:
+        user, family = await crud.rotate_refresh_token(payload["jti"], token)
+    except ValueError:
+        raise invalid_token
+    return token_response(user, family, token)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, expires_at: Optional[datetime] = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
+    expire = expires_at or datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
+def decode_access_token(token: str) -> Optional[dict]:
+    # The claims of a valid, unrevoked access token, or None
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("user_id")
-        is_admin: bool = payload.get("is_admin", False)
-        if username is None or user_id is None:
-            raise credentials_exception
-        
-        return {"username": username, "id": user_id, "is_admin": is_admin}
     except JWTError:
-        raise credentials_exception
+        return None
+    if payload.get("type", "access") != "access":
+        return None
+    if payload.get("sub") is None or payload.get("user_id") is None:
+        return None
+    if payload.get("jti") in crud.revocation_index:
+        return None
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    payload = decode_access_token(token)
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return {"username": payload["sub"], "id": payload["user_id"], "is_admin": payload.get("is_admin", False)}
+
+@app.post("/logout", status_code=204)
+async def logout(body: Optional[schemas.TokenRefresh] = None, token: Optional[str] = Depends(optional_oauth2_scheme)):
+    # Revokes the token family of this session: its refresh token and access tokens.
+    # The refresh token identifies the session even once the access token has
+    # expired; an expired refresh token still names its family, so it is accepted
+    if body is not None:
+        try:
+            payload = jwt.decode(body.refresh_token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+        except JWTError:
+            payload = {}
+        if payload.get("type") == "refresh" and payload.get("jti"):
+            await crud.revoke_refresh_token_family(payload["jti"])
+            return Response(status_code=204)
+
+    payload = decode_access_token(token) if token else None
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if payload.get("fam"):
+        await crud.revoke_token_family(payload["fam"])
+    return Response(status_code=204)
 
 async def get_current_admin(current_user = Depends(get_current_user)):
     if not current_user["is_admin"]:
@@ -120,20 +299,65 @@ async def get_current_admin(current_user = Depends(get_current_user)):
         )
     return current_user
 
+# Pagination: list endpoints return one page and the cursor of the next one in X-Next-Cursor
+async def paginated(page):
+    try:
+        return await page
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+# Conditional GETs: the ETag is built from the version counters of the tables a
+# route reads (bumped by the crud write paths) and the URL, so If-None-Match is
+# answered with 304 before the handler runs, without touching the database.
+# Without a shared cache backend the version also rolls over with the cache TTL,
+# and with the cache off there is no ETag (see Cache.version)
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def cache_validated(*namespaces: str, cache_control: str, period: Optional[int] = None):
+    # period: for responses that also depend on the clock (e.g. upcoming showtimes)
+    async def dependency(request: Request, response: Response):
+        version = await catalogue_cache.version(*namespaces)
+        if version is None:
+            response.headers["Cache-Control"] = cache_control
+            return
+        if period:
+            version += f"-{int(time.time() // period)}"
+        url = hashlib.blake2b(f"{request.url.path}?{request.url.query}".encode(), digest_size=8).hexdigest()
+        etag = f'"{version}-{url}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+    return Depends(dependency)
+
 # User endpoints
 @app.post("/users/", response_model=schemas.UserResponse)
 async def create_user(user: schemas.UserCreate):
     db_user = await crud.get_user_by_username(user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return await crud.create_user(user, pwd_context)
+    return await crud.create_user(user, password_hasher)
 
 # Movie endpoints
-@app.get("/movies/", response_model=List[schemas.Movie])
-async def get_movies():
-    return await crud.get_movies()
+@app.get("/movies/", response_model=List[schemas.Movie], dependencies=[cache_validated("movies", cache_control=MOVIES_CACHE_CONTROL)])
+async def get_movies(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    movies, next_cursor = await paginated(crud.get_movies(limit=limit, cursor=cursor))
+    set_next_cursor(response, next_cursor)
+    return movies
 
-@app.get("/movies/{movie_id}", response_model=schemas.Movie)
+@app.get("/movies/{movie_id}", response_model=schemas.Movie, dependencies=[cache_validated("movies", cache_control=MOVIES_CACHE_CONTROL)])
 async def get_movie(movie_id: int):
     db_movie = await crud.get_movie(movie_id)
     if db_movie is None:
@@ -145,17 +369,83 @@ async def create_movie(movie: schemas.MovieCreate, current_user = Depends(get_cu
     return await crud.create_movie(movie)
 
 # Showtime endpoints
-@app.get("/showtimes/", response_model=List[schemas.Showtime])
-async def get_showtimes(movie_id: Optional[int] = None):
-    return await crud.get_showtimes(movie_id)
+@app.get("/showtimes/", response_model=List[schemas.Showtime], dependencies=[cache_validated("showtimes", cache_control=SHOWTIMES_CACHE_CONTROL, period=60)])
+async def get_showtimes(
+    response: Response,
+    movie_id: Optional[int] = None,
+    hall_id: Optional[int] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    upcoming: bool = False,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    showtimes, next_cursor = await paginated(crud.get_showtimes(
+        movie_id=movie_id,
+        hall_id=hall_id,
+        start_from=start_from,
+        start_to=start_to,
+        upcoming=upcoming,
+        limit=limit,
+        cursor=cursor
+    ))
+    set_next_cursor(response, next_cursor)
+    return showtimes
+
+@app.get("/showtimes/{showtime_id}", response_model=schemas.Showtime, dependencies=[cache_validated("showtimes", cache_control=SHOWTIMES_CACHE_CONTROL)])
+async def get_showtime(showtime_id: int):
+    showtime = await crud.get_showtime_by_id(showtime_id)
+    if not showtime:
+        raise HTTPException(status_code=404, detail="Showtime not found")
+    return showtime
+
+def schedule_conflict(e: crud.ScheduleConflictError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"message": str(e), "conflicting_showtime_id": e.showtime_id}
+    )
 
 @app.post("/showtimes/", response_model=schemas.Showtime)
 async def create_showtime(showtime: schemas.ShowtimeCreate, current_user = Depends(get_current_admin)):
-    return await crud.create_showtime(showtime)
+    try:
+        return await crud.create_showtime(showtime)
+    except crud.ScheduleConflictError as e:
+        raise schedule_conflict(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def import_schedule(showtimes: List[schemas.ShowtimeCreate], dry_run: bool):
+    # All rows or nothing; a dry run only reports the errors
+    created, errors = await crud.import_showtimes(showtimes, dry_run=dry_run)
+    result = {"total": len(showtimes), "created": created, "errors": errors}
+    if errors and not dry_run:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=result)
+    return result
+
+@app.post("/showtimes/import", response_model=schemas.ShowtimeImportResult)
+async def import_showtimes(schedule: schemas.ShowtimeImport, current_user = Depends(get_current_admin)):
+    try:
+        return await import_schedule(schedule.showtimes, schedule.dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/admin/schedule/generate", response_model=schemas.ShowtimeImportResult)
+async def generate_schedule(schedule: schemas.ScheduleGenerate, current_user = Depends(get_current_admin)):
+    # Weeks of showtimes from per-hall templates, checked and created like an import
+    try:
+        showtimes = schedules.generate(schedule.templates, schedule.start_date, schedule.weeks * 7)
+        return await import_schedule(showtimes, schedule.dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/showtimes/{showtime_id}", response_model=schemas.Showtime)
 async def update_showtime(showtime_id: int, showtime: schemas.ShowtimeCreate, current_user = Depends(get_current_admin)):
-    updated_showtime = await crud.update_showtime(showtime_id, showtime)
+    try:
+        updated_showtime = await crud.update_showtime(showtime_id, showtime)
+    except crud.ScheduleConflictError as e:
+        raise schedule_conflict(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not updated_showtime:
         raise HTTPException(status_code=404, detail="Showtime not found")
     return updated_showtime
@@ -168,14 +458,80 @@ async def delete_showtime(showtime_id: int, current_user = Depends(get_current_a
     return None
 
 # Seat selection and reservation
+SEAT_MAP_MEDIA_TYPE = "application/vnd.cinema.seatmap+json"
+
 @app.get("/showtime/{showtime_id}/seats", response_model=List[schemas.Seat])
-async def get_seats(showtime_id: int):
-    return await crud.get_seats_by_showtime(showtime_id)
+async def get_seats(showtime_id: int, request: Request, format: Optional[str] = None):
+    occupancy = await crud.get_seat_occupancy(showtime_id)
+    if occupancy is None:
+        return []
+    
+    # Compact map on ?format=compact or Accept: application/vnd.cinema.seatmap+json
+    compact = format == "compact" or SEAT_MAP_MEDIA_TYPE in request.headers.get("accept", "")
+    etag = occupancy.etag("compact" if compact else "list")
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    if compact:
+        seat_map = schemas.SeatMap(**occupancy.to_compact())
+        return JSONResponse(content=seat_map.dict(), media_type=SEAT_MAP_MEDIA_TYPE, headers=headers)
+    return JSONResponse(content=occupancy.to_seats(), headers=headers)
+
+@app.get("/showtime/{showtime_id}/seats/stream")
+async def stream_seats(showtime_id: int, request: Request):
+    # Server-Sent Events: "snapshot" with the compact seat map, then
+    # "seat-taken" / "seat-freed" deltas; "showtime-removed" ends the stream
+    occupancy = await crud.get_seat_occupancy(showtime_id)
+    if occupancy is None:
+        raise HTTPException(status_code=404, detail="Showtime not found")
+    
+    # Subscribe before taking the snapshot so no delta is missed
+    subscription = seat_events.subscribe(showtime_id)
+    
+    async def snapshot():
+        occupancy = await crud.get_seat_occupancy(showtime_id)
+        if occupancy is None:
+            return None
+        return format_event("snapshot", schemas.SeatMap(**occupancy.to_compact()).dict())
+    
+    async def event_stream():
+        try:
+            message = await snapshot()
+            while message is not None:
+                yield message
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), timeout=SEAT_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    message = ": keepalive\n\n"
+                    continue
+                
+                if subscription.overflowed or item is RESYNC:
+                    subscription.drain()
+                    message = await snapshot()
+                elif item is CLOSE:
+                    message = None
+                else:
+                    message = item
+            yield format_event("showtime-removed", {"showtime_id": showtime_id})
+        finally:
+            seat_events.unsubscribe(subscription)
+    
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
 
 @app.post("/reservations/", response_model=schemas.Reservation)
 async def create_reservation(reservation: schemas.ReservationCreate, current_user = Depends(get_current_user)):
     try:
         return await crud.create_reservation(reservation, current_user["id"])
+    except crud.SeatConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(e), "conflicting_seat_ids": e.seat_ids}
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -215,27 +571,153 @@ async def update_reservation(
         )
     
     # Update the reservation status
-    return await crud.update_reservation_status(
-        reservation_id=reservation_id,
-        payment_status=reservation_update.payment_status
-    )
+    try:
+        return await crud.update_reservation_status(
+            reservation_id=reservation_id,
+            payment_status=reservation_update.payment_status
+        )
+    except crud.SeatConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(e), "conflicting_seat_ids": e.seat_ids}
+        )
+
+@app.post("/reservations/{reservation_id}/hold", response_model=schemas.Reservation)
+async def extend_reservation_hold(reservation_id: int, current_user = Depends(get_current_user)):
+    reservation = await crud.get_reservation(reservation_id)
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    
+    if reservation["user_id"] != current_user["id"] and not current_user["is_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to update this reservation"
+        )
+    
+    if reservation["payment_status"] != "pending":
+        raise HTTPException(status_code=400, detail="Only pending reservations hold seats")
+    
+    reservation = await crud.extend_seat_hold(reservation_id)
+    expires_at = reservation["hold_expires_at"]
+    if reservation["payment_status"] != "pending" or expires_at is None or expires_at < datetime.utcnow():
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Seat hold has expired")
+    return reservation
 
 # User history
 @app.get("/users/me/reservations", response_model=List[schemas.Reservation])
-async def get_user_reservations(current_user = Depends(get_current_user)):
-    return await crud.get_user_reservations(current_user["id"])
+async def get_user_reservations(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    reservations, next_cursor = await paginated(
+        crud.get_user_reservations(current_user["id"], limit=limit, cursor=cursor)
+    )
+    set_next_cursor(response, next_cursor)
+    return reservations
 
 # Admin endpoints for statistics
 @app.get("/admin/statistics", response_model=schemas.Statistics)
 async def get_statistics(current_user = Depends(get_current_admin)):
     return await crud.get_statistics()
 
+@app.get("/admin/analytics/sales", response_model=List[schemas.SalesBucket])
+async def get_sales_analytics(
+    group_by: str = "day",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    movie_id: Optional[int] = None,
+    hall_id: Optional[int] = None,
+    current_user = Depends(get_current_admin)
+):
+    try:
+        return await crud.get_sales_analytics(group_by, date_from, date_to, movie_id, hall_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/admin/analytics/occupancy", response_model=List[schemas.OccupancyReport])
+async def get_occupancy_analytics(
+    response: Response,
+    movie_id: Optional[int] = None,
+    hall_id: Optional[int] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_admin)
+):
+    reports, next_cursor = await paginated(crud.get_occupancy_analytics(
+        movie_id=movie_id,
+        hall_id=hall_id,
+        start_from=start_from,
+        start_to=start_to,
+        limit=limit,
+        cursor=cursor
+    ))
+    set_next_cursor(response, next_cursor)
+    return reports
+
+@app.get("/admin/occupancy/check")
+async def check_occupancy(current_user = Depends(get_current_admin)):
+    mismatches = await crud.check_occupancy_consistency()
+    return {"consistent": not mismatches, "mismatches": mismatches}
+
+@app.get("/admin/cache/stats")
+async def get_cache_stats(current_user = Depends(get_current_admin)):
+    return catalogue_cache.stats()
+
+@app.post("/admin/users/{user_id}/revoke-tokens")
+async def revoke_user_tokens(user_id: int, current_user = Depends(get_current_admin)):
+    # Signs the user out everywhere: refresh tokens stop working, access tokens are rejected
+    if await crud.get_user(user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    revoked = await crud.revoke_user_tokens(user_id)
+    logger.info("User tokens revoked", extra={"user_id": user_id, "revoked": revoked})
+    return {"revoked_access_tokens": revoked}
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    # Prometheus scrape endpoint; protected by METRICS_TOKEN when it is set
+    if metrics.METRICS_TOKEN:
+        authorization = request.headers.get("authorization", "").encode()
+        if not secrets.compare_digest(authorization, f"Bearer {metrics.METRICS_TOKEN}".encode()):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    cache_stats = catalogue_cache.stats()
+    extra = {
+        "cache_hits_total": ("counter", "Catalogue cache hits by namespace.", {
+            f'namespace="{namespace}"': counts["hits"] for namespace, counts in cache_stats.items()
+        }),
+        "cache_misses_total": ("counter", "Catalogue cache misses by namespace.", {
+            f'namespace="{namespace}"': counts["misses"] for namespace, counts in cache_stats.items()
+        }),
+        "log_records_dropped_total": ("counter", "Log records dropped because the log queue was full.", {
+            "": logs.dropped()
+        }),
+        "rate_limit_rejected_total": ("counter", "Requests rejected by the rate limiter by route group.", {
+            f'group="{group}"': count for group, count in ratelimit.rate_limiter.rejected.items()
+        }),
+        "rate_limit_buckets": ("gauge", "Rate limit buckets held in this worker's memory.", {
+            "": len(ratelimit.rate_limiter.buckets)
+        }),
+        "rate_limit_store_errors_total": ("counter", "Rate limit checks let through because the shared store failed.", {
+            "": ratelimit.rate_limiter.errors
+        }),
+    }
+    return Response(metrics.registry.render(extra), media_type="text/plain; version=0.0.4")
+
 # Hall management endpoints
-@app.get("/halls/", response_model=List[schemas.Hall])
-async def get_halls():
-    return await crud.get_halls()
+@app.get("/halls/", response_model=List[schemas.Hall], dependencies=[cache_validated("halls", cache_control=HALLS_CACHE_CONTROL)])
+async def get_halls(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    halls, next_cursor = await paginated(crud.get_halls(limit=limit, cursor=cursor))
+    set_next_cursor(response, next_cursor)
+    return halls
 
-@app.get("/halls/{hall_id}", response_model=schemas.Hall)
+@app.get("/halls/{hall_id}", response_model=schemas.Hall, dependencies=[cache_validated("halls", cache_control=HALLS_CACHE_CONTROL)])
 async def get_hall(hall_id: int):
     hall = await crud.get_hall(hall_id)
     if not hall:
@@ -244,11 +726,24 @@ async def get_hall(hall_id: int):
 
 @app.post("/halls/", response_model=schemas.Hall)
 async def create_hall(hall: schemas.HallCreate, current_user = Depends(get_current_admin)):
-    return await crud.create_hall(hall)
+    try:
+        return await crud.create_hall(hall)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/halls/bulk", response_model=List[schemas.Hall])
+async def create_halls(halls: List[schemas.HallCreate], current_user = Depends(get_current_admin)):
+    try:
+        return await crud.create_halls(halls)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/halls/{hall_id}", response_model=schemas.Hall)
 async def update_hall(hall_id: int, hall: schemas.HallCreate, current_user = Depends(get_current_admin)):
-    return await crud.update_hall(hall_id, hall)
+    try:
+        return await crud.update_hall(hall_id, hall)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/halls/{hall_id}", status_code=204)
 async def delete_hall(hall_id: int, current_user = Depends(get_current_admin)):
@@ -296,6 +791,33 @@ async def download_ticket(reservation_id: int, current_user = Depends(get_curren
     }
     return StreamingResponse(ticket_pdf, media_type="application/pdf", headers=headers)
 
+# Bulk ticket printing for the box office
+@app.get("/admin/showtimes/{showtime_id}/tickets", response_class=StreamingResponse)
+async def download_showtime_tickets(showtime_id: int, format: str = "pdf", current_user = Depends(get_current_admin)):
+    if format not in ("pdf", "zip"):
+        raise HTTPException(status_code=400, detail="Format must be 'pdf' or 'zip'")
+    
+    showtime = await crud.get_showtime_by_id(showtime_id)
+    if not showtime:
+        raise HTTPException(status_code=404, detail="Showtime not found")
+    
+    reservations = await crud.get_showtime_reservations(showtime_id, payment_status="completed")
+    if not reservations:
+        raise HTTPException(status_code=404, detail="No paid reservations for this showtime")
+    
+    if format == "zip":
+        content = await generate_tickets_zip(reservations)
+        media_type = "application/zip"
+    else:
+        content = await generate_tickets_pdf(reservations)
+        media_type = "application/pdf"
+    
+    filename = f"tickets_showtime_{showtime_id}.{format}"
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    }
+    return StreamingResponse(content, media_type=media_type, headers=headers)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,170 @@
+import bisect
+import contextvars
+import os
+import time
+from typing import Dict, List, Tuple
+
+# Request and database metrics in the Prometheus text format (GET /metrics).
+# Everything is plain counters in this process, updated from the event loop
+# thread: per route (the path template, so the label set stays bounded) a
+# latency histogram, requests by status and the number and total time of the
+# database queries issued while serving it. With several workers every worker
+# reports its own numbers.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+# Optional bearer token required to read /metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# Queries outside a request (startup, the hold sweeper) are counted under this route
+BACKGROUND = "background"
+UNMATCHED = "unmatched"
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        lines, cumulative = [], 0
+        separator = "," if labels else ""
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{le}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+class RequestQueries:
+    # Database work of the current request
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+current_queries = contextvars.ContextVar("current_queries", default=None)
+
+class Registry:
+    def __init__(self):
+        self.started = time.time()
+        self.in_flight = 0
+        self.requests: Dict[Tuple[str, str, int], int] = {}  # (method, route, status) -> count
+        self.latency: Dict[Tuple[str, str], Histogram] = {}  # (method, route)
+        self.route_queries: Dict[str, List] = {}  # route -> [queries, seconds]
+        self.query_latency = Histogram(QUERY_BUCKETS)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, queries: RequestQueries) -> None:
+        key = (method, route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.latency.get((method, route))
+        if histogram is None:
+            histogram = self.latency[(method, route)] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+        if queries.count:
+            self._add_queries(route, queries.count, queries.seconds)
+
+    def observe_query(self, seconds: float) -> None:
+        self.query_latency.observe(seconds)
+        queries = current_queries.get()
+        if queries is None:
+            self._add_queries(BACKGROUND, 1, seconds)
+        else:
+            queries.count += 1
+            queries.seconds += seconds
+
+    def _add_queries(self, route: str, count: int, seconds: float) -> None:
+        totals = self.route_queries.get(route)
+        if totals is None:
+            totals = self.route_queries[route] = [0, 0.0]
+        totals[0] += count
+        totals[1] += seconds
+
+    def render(self, extra: Dict[str, Tuple[str, str, Dict[str, float]]] = None) -> str:
+        # extra: name -> (type, help, {labels: value}) for metrics owned elsewhere
+        lines = [
+            "# HELP process_start_time_seconds Start time of the process since unix epoch.",
+            "# TYPE process_start_time_seconds gauge",
+            f"process_start_time_seconds {self.started}",
+            "# HELP http_requests_in_flight Requests being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Requests by method, route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(self.requests.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+        lines += [
+            "# HELP http_request_duration_seconds Request latency by method and route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(self.latency.items()):
+            lines += histogram.samples("http_request_duration_seconds", f'method="{method}",route="{_escape(route)}"')
+        lines += [
+            "# HELP db_queries_total Database queries by the route that issued them.",
+            "# TYPE db_queries_total counter",
+        ]
+        for route, (count, _) in sorted(self.route_queries.items()):
+            lines.append(f'db_queries_total{{route="{_escape(route)}"}} {count}')
+        lines += [
+            "# HELP db_query_seconds_total Time spent in database queries by route.",
+            "# TYPE db_query_seconds_total counter",
+        ]
+        for route, (_, seconds) in sorted(self.route_queries.items()):
+            lines.append(f'db_query_seconds_total{{route="{_escape(route)}"}} {seconds}')
+        lines += [
+            "# HELP db_query_duration_seconds Database query latency.",
+            "# TYPE db_query_duration_seconds histogram",
+        ]
+        lines += self.query_latency.samples("db_query_duration_seconds", "")
+        for name, (kind, help_text, values) in (extra or {}).items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in sorted(values.items()):
+                lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+registry = Registry()
+
+class MetricsMiddleware:
+    # ASGI middleware: in-flight requests, latency, status and database work per route
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        queries = RequestQueries()
+        token = current_queries.set(queries)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            registry.in_flight -= 1
+            matched = scope.get("route")
+            route = getattr(matched, "path", UNMATCHED)
+            registry.observe_request(scope["method"], route, status_code, time.perf_counter() - started, queries)
+            current_queries.reset(token)
@@ -0,0 +1,181 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+import models
+import sales
+from crud import RELEASED_STATUSES, SEAT_HOLD_TTL_MINUTES
+from database import engine, SQLITE_PRAGMAS
+
+# Versioned schema migrations, applied in order at startup.
+# Pending migrations are recorded in schema_migrations and run, followed by the
+# startup backfills, in one transaction under an exclusive lock: every worker
+# runs this at startup, and the ones that get the lock after the first find
+# nothing left to do. Steps are written to be idempotent so databases created by
+# the old create_all() call (with some of the changes already present) upgrade cleanly.
+
+# How long a worker waits for another one's migrations (SQLite; PostgreSQL waits indefinitely)
+MIGRATION_LOCK_TIMEOUT_SECONDS = float(os.getenv("MIGRATION_LOCK_TIMEOUT_SECONDS", "600"))
+# pg_advisory_xact_lock key shared by every worker
+MIGRATION_LOCK_KEY = 5_201_010
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+def _create_tables(connection, *model_classes):
+    for model in model_classes:
+        model.__table__.create(bind=connection, checkfirst=True)
+
+def _add_column(connection, model, column_name):
+    table = model.__table__
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    if column_name not in existing:
+        column = table.c[column_name]
+        definition = column.type.compile(dialect=connection.dialect)
+        if column.server_default is not None:
+            # Existing rows get the default
+            default = column.server_default.arg.compile(dialect=connection.dialect)
+            definition += f" DEFAULT {default}" + ("" if column.nullable else " NOT NULL")
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_name} {definition}"))
+
+def _create_indexes(connection, model, *index_names):
+    indexes = {index.name: index for index in model.__table__.indexes}
+    for name in index_names:
+        indexes[name].create(bind=connection, checkfirst=True)
+
+# Migrations
+def _initial_schema(connection):
+    _create_tables(
+        connection,
+        models.User, models.Movie, models.Hall, models.Showtime,
+        models.Seat, models.Reservation, models.ReservationSeat
+    )
+
+def _seat_claims(connection):
+    _create_tables(connection, models.SeatClaim)
+
+def _seat_holds(connection):
+    _add_column(connection, models.Reservation, "hold_expires_at")
+    _create_indexes(connection, models.Reservation, "ix_reservations_status_hold_expires")
+
+def _pagination_indexes(connection):
+    _create_indexes(
+        connection, models.Showtime,
+        "ix_showtimes_start_time", "ix_showtimes_movie_start_time", "ix_showtimes_hall_start_time"
+    )
+    _create_indexes(connection, models.Reservation, "ix_reservations_user_id")
+
+def _hot_lookup_indexes(connection):
+    _create_indexes(connection, models.Seat, "ix_seats_hall_row_number")
+    _create_indexes(
+        connection, models.ReservationSeat,
+        "ix_reservation_seats_reservation_seat", "ix_reservation_seats_seat_id"
+    )
+    _create_indexes(connection, models.Reservation, "ix_reservations_showtime_status")
+
+def _sales_aggregates(connection):
+    # Filled by the per-seat accounting migration
+    _create_tables(connection, models.SalesAggregate)
+
+def _per_seat_sales(connection):
+    _add_column(connection, models.Reservation, "amount")
+    _create_tables(connection, models.SalesRollup)
+    sales.rebuild(connection)
+
+def _hall_layouts(connection):
+    _add_column(connection, models.Hall, "layout")
+
+def _seat_activity(connection):
+    _add_column(connection, models.Seat, "is_active")
+
+def _auth_tokens(connection):
+    _create_tables(connection, models.RefreshToken, models.RevokedToken)
+
+MIGRATIONS = [
+    (1, "initial_schema", _initial_schema),
+    (2, "seat_claims", _seat_claims),
+    (3, "seat_holds", _seat_holds),
+    (4, "pagination_indexes", _pagination_indexes),
+    (5, "hot_lookup_indexes", _hot_lookup_indexes),
+    (6, "sales_aggregates", _sales_aggregates),
+    (7, "per_seat_sales", _per_seat_sales),
+    (8, "hall_layouts", _hall_layouts),
+    (9, "seat_activity", _seat_activity),
+    (10, "auth_tokens", _auth_tokens),
+]
+
+# Backfills, run on every startup after the migrations
+def _backfill_seat_claims(connection):
+    # Claims for reservations created before the seat_claims table existed
+    existing_claim = select(models.SeatClaim.id).where(
+        models.SeatClaim.showtime_id == models.Reservation.showtime_id,
+        models.SeatClaim.seat_id == models.ReservationSeat.seat_id
+    ).exists()
+    claims = select(
+        models.Reservation.showtime_id,
+        models.ReservationSeat.seat_id,
+        func.min(models.Reservation.id)
+    ).join(
+        models.ReservationSeat, models.Reservation.id == models.ReservationSeat.reservation_id
+    ).where(
+        models.Reservation.payment_status.notin_(RELEASED_STATUSES),
+        ~existing_claim
+    ).group_by(models.Reservation.showtime_id, models.ReservationSeat.seat_id)
+    connection.execute(models.SeatClaim.__table__.insert().from_select(
+        ["showtime_id", "seat_id", "reservation_id"], claims
+    ))
+
+def _backfill_seat_holds(connection):
+    # Pending reservations created before holds existed get a fresh hold
+    connection.execute(models.Reservation.__table__.update().where(
+        models.Reservation.payment_status == "pending",
+        models.Reservation.hold_expires_at.is_(None)
+    ).values(hold_expires_at=datetime.utcnow() + timedelta(minutes=SEAT_HOLD_TTL_MINUTES)))
+
+BACKFILLS = [_backfill_seat_claims, _backfill_seat_holds]
+
+def _lock(connection):
+    # Held until the transaction ends
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql(f"PRAGMA busy_timeout={int(MIGRATION_LOCK_TIMEOUT_SECONDS * 1000)}")
+        connection.exec_driver_sql("BEGIN EXCLUSIVE")
+    elif connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+def applied_versions(connection):
+    schema_migrations.create(bind=connection, checkfirst=True)
+    return {row.version for row in connection.execute(select(schema_migrations.c.version))}
+
+def apply_migrations(bind=engine):
+    # Returns the versions applied by this call
+    with bind.connect() as connection:
+        try:
+            _lock(connection)
+            done = applied_versions(connection)
+            applied = []
+            for version, name, migrate in MIGRATIONS:
+                if version in done:
+                    continue
+                migrate(connection)
+                connection.execute(schema_migrations.insert().values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                ))
+                applied.append(version)
+            for backfill in BACKFILLS:
+                backfill(connection)
+            connection.commit()
+        finally:
+            if connection.dialect.name == "sqlite":
+                connection.rollback()
+                connection.exec_driver_sql(f"PRAGMA busy_timeout={SQLITE_PRAGMAS['busy_timeout']}")
+    return applied
+
+if __name__ == "__main__":
+    applied = apply_migrations()
+    print(f"Applied migrations: {applied}" if applied else "Database is up to date")
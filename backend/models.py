@@ -1,6 +1,6 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Table
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, Date, DateTime, Table, UniqueConstraint, Index, true
 from sqlalchemy.orm import relationship
-from database import Base, engine
+from database import Base
 
 class User(Base):
     __tablename__ = "users"
@@ -29,6 +29,7 @@ class Hall(Base):
     capacity = Column(Integer)
     rows = Column(Integer)
     seats_per_row = Column(Integer)
+    layout = Column(String, nullable=True)  # see layouts.py; NULL = rows x seats_per_row rectangle
 
 class Showtime(Base):
     __tablename__ = "showtimes"
@@ -39,6 +40,13 @@ class Showtime(Base):
     start_time = Column(DateTime)
     end_time = Column(DateTime)
     price = Column(Float)
+    
+    __table_args__ = (
+        # Keyset pagination and the /showtimes/ filters, ordered by (start_time, id)
+        Index("ix_showtimes_start_time", "start_time", "id"),
+        Index("ix_showtimes_movie_start_time", "movie_id", "start_time", "id"),
+        Index("ix_showtimes_hall_start_time", "hall_id", "start_time", "id"),
+    )
 
 class Seat(Base):
     __tablename__ = "seats"
@@ -47,6 +55,13 @@ class Seat(Base):
     hall_id = Column(Integer, ForeignKey("halls.id"))
     row = Column(Integer)
     number = Column(Integer)
+    # False for seats removed from the layout that past reservations still refer to
+    is_active = Column(Boolean, nullable=False, default=True, server_default=true())
+    
+    __table_args__ = (
+        # Seat maps and hall layouts: seats of a hall in row/number order
+        Index("ix_seats_hall_row_number", "hall_id", "row", "number"),
+    )
 
 class ReservationSeat(Base):
     __tablename__ = "reservation_seats"
@@ -55,14 +70,107 @@ class ReservationSeat(Base):
     reservation_id = Column(Integer, ForeignKey("reservations.id"))
     seat_id = Column(Integer, ForeignKey("seats.id"))
     
+    __table_args__ = (
+        # Seats of a batch of reservations (loaders) and reservations holding a seat
+        Index("ix_reservation_seats_reservation_seat", "reservation_id", "seat_id"),
+        Index("ix_reservation_seats_seat_id", "seat_id"),
+    )
+    
 class Reservation(Base):
     __tablename__ = "reservations"
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     showtime_id = Column(Integer, ForeignKey("showtimes.id"))
-    payment_status = Column(String, default="pending")  # pending, completed, cancelled
+    payment_status = Column(String, default="pending")  # pending, completed, cancelled, expired
     created_at = Column(DateTime)
+    hold_expires_at = Column(DateTime, nullable=True)  # seats of a pending reservation are held until then
+    amount = Column(Float, nullable=True)  # price x seats at booking time
+    
+    __table_args__ = (
+        # User history, paginated by id
+        Index("ix_reservations_user_id", "user_id", "id"),
+        # Reservations of a showtime, optionally by status (tickets, showtime deletion)
+        Index("ix_reservations_showtime_status", "showtime_id", "payment_status"),
+        # Expired-hold sweeper: payment_status = 'pending' AND hold_expires_at < now
+        Index("ix_reservations_status_hold_expires", "payment_status", "hold_expires_at"),
+    )
+
+class SeatClaim(Base):
+    __tablename__ = "seat_claims"
+    # One active claim per seat and showtime - the database rejects double bookings
+    __table_args__ = (
+        UniqueConstraint("showtime_id", "seat_id", name="uq_seat_claims_showtime_seat"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    showtime_id = Column(Integer, ForeignKey("showtimes.id"), nullable=False)
+    seat_id = Column(Integer, ForeignKey("seats.id"), nullable=False)
+    reservation_id = Column(Integer, ForeignKey("reservations.id"), nullable=False, index=True)
+
+class SalesAggregate(Base):
+    __tablename__ = "sales_aggregates"
+    # Running totals of completed reservations, kept up to date by the write paths.
+    # scope is "total" (key 0), "movie", "showtime" (key = id) or "day" (key = YYYYMMDD of the booking);
+    # tickets counts seats
+    __table_args__ = (
+        UniqueConstraint("scope", "key", name="uq_sales_aggregates_scope_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String, nullable=False)
+    key = Column(Integer, nullable=False)
+    revenue = Column(Float, nullable=False, default=0)
+    tickets = Column(Integer, nullable=False, default=0)
 
-def create_tables():
-    Base.metadata.create_all(bind=engine)
+class SalesRollup(Base):
+    __tablename__ = "sales_rollups"
+    # Completed sales per booking day and showtime, for the analytics date ranges
+    __table_args__ = (
+        UniqueConstraint("day", "showtime_id", name="uq_sales_rollups_day_showtime"),
+        Index("ix_sales_rollups_showtime_id", "showtime_id"),
+        Index("ix_sales_rollups_movie_day", "movie_id", "day"),
+        Index("ix_sales_rollups_hall_day", "hall_id", "day"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    showtime_id = Column(Integer, nullable=False)
+    movie_id = Column(Integer, nullable=False)
+    hall_id = Column(Integer, nullable=False)
+    revenue = Column(Float, nullable=False, default=0)
+    seats = Column(Integer, nullable=False, default=0)
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    # One row per issued refresh token. A refresh uses its row up (used_at) and issues
+    # the next token of the same family; tokens rotated from one login share a family
+    __table_args__ = (
+        Index("ix_refresh_tokens_family", "family"),
+        Index("ix_refresh_tokens_expires_at", "expires_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String, unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    family = Column(String, nullable=False)
+    # The access token issued together with it, revoked with the family
+    access_jti = Column(String, nullable=False)
+    access_expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    # Access tokens revoked before they expire; loaded into the in-memory revocation index
+    __table_args__ = (
+        Index("ix_revoked_tokens_revoked_at", "revoked_at"),
+        Index("ix_revoked_tokens_expires_at", "expires_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String, unique=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=False)
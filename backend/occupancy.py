@@ -0,0 +1,279 @@
+import asyncio
+import base64
+import hashlib
+import itertools
+import os
+from datetime import datetime
+from sqlalchemy.sql import select, or_, and_
+import layouts
+import models
+from database import database
+from typing import Dict, Iterable, List, Optional
+
+# In-memory seat occupancy per showtime.
+# Seat positions come from hall geometry: (row - 1) * seats_per_row + column, where
+# column is the seat's place in its layout row (number - 1 in rectangular halls),
+# and each showtime keeps one bit per position. seat_claims is the source of truth;
+# crud keeps the index in step after every committed claim/release.
+
+# Versions order a seat stream's snapshot and deltas, which come from one worker.
+# ETags are derived from the map's content instead (the claims in the database
+# and the hall's seats), so every worker, and a worker with SEAT_MAP_CACHE=0,
+# gives the same map the same ETag
+_versions = itertools.count(1)
+
+# The index lives in one worker's memory. Deployments running several workers
+# against a shared database set SEAT_MAP_CACHE=0 to load maps from the database
+# on every request instead
+SEAT_MAP_CACHE = os.getenv("SEAT_MAP_CACHE", "1") == "1"
+
+class HallLayout:
+    def __init__(self, hall_id: int, rows: int, seats_per_row: int, seats, layout: Optional[str] = None):
+        self.hall_id = hall_id
+        self.rows = rows
+        self.seats_per_row = seats_per_row
+        self.layout = layout
+        # (id, row, number) in row/number order
+        self.seats = sorted(((s["id"], s["row"], s["number"]) for s in seats), key=lambda s: (s[1], s[2]))
+        cells = {}
+        if layout:
+            cells = {(p.row, p.number): p for p in layouts.seat_positions(layouts.parse_layout(layout))}
+        self.positions = {}
+        self.categories = {}
+        for seat_id, row, number in self.seats:
+            cell = cells.get((row, number))
+            column = cell.column if cell else number - 1
+            self.positions[seat_id] = (row - 1) * seats_per_row + column
+            self.categories[seat_id] = cell.category if cell else layouts.CATEGORIES[layouts.STANDARD]
+        self.size = max(max(self.positions.values(), default=-1) + 1, rows * seats_per_row)
+        # Seat id at every position, None where the hall has no seat
+        self.seat_ids = [None] * self.size
+        for seat_id, position in self.positions.items():
+            self.seat_ids[position] = seat_id
+        self.digest = hashlib.blake2b(
+            repr((rows, seats_per_row, layout, self.seats)).encode(), digest_size=6
+        ).hexdigest()
+
+class ShowtimeOccupancy:
+    def __init__(self, showtime_id: int, layout: HallLayout, ends_at: Optional[datetime] = None):
+        self.showtime_id = showtime_id
+        self.layout = layout
+        self.ends_at = ends_at
+        self.bits = bytearray((layout.size + 7) // 8)
+        self.version = next(_versions)
+
+    def etag(self, variant: str) -> str:
+        reserved = hashlib.blake2b(bytes(self.bits), digest_size=8).hexdigest()
+        return f'"{self.showtime_id}-{self.layout.digest}-{reserved}-{variant}"'
+
+    def _set(self, seat_ids: Iterable[int], reserved: bool):
+        self.version = next(_versions)
+        for seat_id in seat_ids:
+            position = self.layout.positions.get(seat_id)
+            if position is None:
+                continue
+            if reserved:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            else:
+                self.bits[position >> 3] &= ~(1 << (position & 7))
+
+    def is_reserved(self, seat_id: int) -> bool:
+        position = self.layout.positions[seat_id]
+        return bool(self.bits[position >> 3] & (1 << (position & 7)))
+
+    def reserved_seat_ids(self) -> List[int]:
+        return [seat_id for seat_id, _, _ in self.layout.seats if self.is_reserved(seat_id)]
+
+    def to_seats(self) -> List[dict]:
+        hall_id = self.layout.hall_id
+        bits = self.bits
+        positions = self.layout.positions
+        categories = self.layout.categories
+        result = []
+        for seat_id, row, number in self.layout.seats:
+            position = positions[seat_id]
+            result.append({
+                "id": seat_id,
+                "hall_id": hall_id,
+                "row": row,
+                "number": number,
+                "category": categories[seat_id],
+                "is_reserved": bool(bits[position >> 3] & (1 << (position & 7)))
+            })
+        return result
+
+    def to_compact(self) -> dict:
+        # Geometry once plus a base64 bitmask: bit i (LSB first) is position i
+        layout = self.layout
+        return {
+            "showtime_id": self.showtime_id,
+            "hall_id": layout.hall_id,
+            "rows": layout.rows,
+            "seats_per_row": layout.seats_per_row,
+            "layout": layout.layout,
+            "version": self.version,
+            "seat_ids": layout.seat_ids,
+            "reserved_mask": base64.b64encode(bytes(self.bits)).decode("ascii")
+        }
+
+def not_finished(now: datetime):
+    # Showtime times are local, like the upcoming filter in crud.
+    # Showtimes without an end time count as finished once they have started
+    return or_(
+        models.Showtime.end_time >= now,
+        and_(models.Showtime.end_time.is_(None), models.Showtime.start_time >= now)
+    )
+
+class OccupancyIndex:
+    def __init__(self, cache: bool = SEAT_MAP_CACHE):
+        self.cache = cache
+        self.layouts: Dict[int, HallLayout] = {}
+        self.showtimes: Dict[int, ShowtimeOccupancy] = {}
+        # Showtimes being loaded: changes committed meanwhile are buffered and
+        # applied to the loaded map, which may come from an older snapshot
+        self.loading: Dict[int, List] = {}
+        self.load_tasks: Dict[int, asyncio.Future] = {}
+        # Bumped when halls change, so a load started before is not cached
+        self.generation = 0
+
+    async def _load_layouts(self, halls) -> None:
+        halls = {hall["id"]: hall for hall in halls if hall["id"] not in self.layouts}
+        if not halls:
+            return
+        query = select(models.Seat).where(models.Seat.hall_id.in_(halls.keys()), models.Seat.is_active)
+        seats = await database.fetch_all(query)
+        seats_by_hall = {hall_id: [] for hall_id in halls}
+        for seat in seats:
+            seats_by_hall[seat["hall_id"]].append(seat)
+        for hall_id, hall in halls.items():
+            self.layouts[hall_id] = HallLayout(
+                hall_id, hall["rows"], hall["seats_per_row"], seats_by_hall[hall_id], hall["layout"]
+            )
+
+    async def _load(self, showtime_ids: Optional[List[int]] = None, upcoming: bool = False) -> Dict[int, ShowtimeOccupancy]:
+        # showtimes, halls, seats and claims: 4 queries for any number of showtimes
+        query = select(models.Showtime.id, models.Showtime.hall_id, models.Showtime.start_time, models.Showtime.end_time)
+        if showtime_ids is not None:
+            query = query.where(models.Showtime.id.in_(showtime_ids))
+        if upcoming:
+            query = query.where(not_finished(datetime.now()))
+        showtimes = await database.fetch_all(query)
+        if not showtimes:
+            return {}
+
+        hall_query = select(models.Hall).where(models.Hall.id.in_({s["hall_id"] for s in showtimes}))
+        await self._load_layouts(await database.fetch_all(hall_query))
+
+        loaded = {}
+        for showtime in showtimes:
+            layout = self.layouts.get(showtime["hall_id"])
+            if layout is not None:
+                loaded[showtime["id"]] = ShowtimeOccupancy(
+                    showtime["id"], layout, showtime["end_time"] or showtime["start_time"]
+                )
+
+        claim_query = select(models.SeatClaim.showtime_id, models.SeatClaim.seat_id)
+        if showtime_ids is not None:
+            claim_query = claim_query.where(models.SeatClaim.showtime_id.in_(showtime_ids))
+        elif upcoming:
+            claim_query = claim_query.where(models.SeatClaim.showtime_id.in_(query.with_only_columns(models.Showtime.id)))
+        for claim in await database.fetch_all(claim_query):
+            occupancy = loaded.get(claim["showtime_id"])
+            if occupancy is not None:
+                occupancy._set([claim["seat_id"]], True)
+        return loaded
+
+    async def rebuild(self) -> None:
+        # Upcoming showtimes only; past ones are loaded on demand and evicted again
+        self.layouts = {}
+        self.showtimes = await self._load(upcoming=True) if self.cache else {}
+
+    async def get(self, showtime_id: int) -> Optional[ShowtimeOccupancy]:
+        if not self.cache:
+            self.layouts = {}
+            return (await self._load([showtime_id])).get(showtime_id)
+        occupancy = self.showtimes.get(showtime_id)
+        if occupancy is not None:
+            return occupancy
+        # One load per showtime; concurrent requests wait for it
+        task = self.load_tasks.get(showtime_id)
+        if task is None:
+            task = self.load_tasks[showtime_id] = asyncio.ensure_future(self._load_showtime(showtime_id))
+        return await asyncio.shield(task)
+
+    async def _load_showtime(self, showtime_id: int) -> Optional[ShowtimeOccupancy]:
+        generation = self.generation
+        deltas = self.loading[showtime_id] = []
+        try:
+            occupancy = (await self._load([showtime_id])).get(showtime_id)
+        finally:
+            del self.load_tasks[showtime_id]
+            buffered = self.loading.pop(showtime_id, None)
+        if occupancy is None:
+            return None
+        for seat_ids, reserved in deltas:
+            occupancy._set(seat_ids, reserved)
+        # Dropped while loading (showtime or hall changed): serve it, but do not keep it
+        if buffered is deltas and generation == self.generation:
+            self.showtimes[showtime_id] = occupancy
+        return occupancy
+
+    def _mark(self, showtime_id: int, seat_ids: Iterable[int], reserved: bool) -> Optional[int]:
+        occupancy = self.showtimes.get(showtime_id)
+        if occupancy is not None:
+            occupancy._set(seat_ids, reserved)
+            return occupancy.version
+        deltas = self.loading.get(showtime_id)
+        if deltas is not None:
+            deltas.append((list(seat_ids), reserved))
+        return None
+
+    def mark_reserved(self, showtime_id: int, seat_ids: Iterable[int]) -> Optional[int]:
+        # Returns the new occupancy version, None if the showtime is not loaded
+        return self._mark(showtime_id, seat_ids, True)
+
+    def mark_free(self, showtime_id: int, seat_ids: Iterable[int]) -> Optional[int]:
+        return self._mark(showtime_id, seat_ids, False)
+
+    def evict_finished(self, now: Optional[datetime] = None) -> int:
+        # Drops showtimes that have ended; returns how many
+        now = now or datetime.now()
+        finished = [s for s, o in self.showtimes.items() if o.ends_at is not None and o.ends_at < now]
+        for showtime_id in finished:
+            del self.showtimes[showtime_id]
+        return len(finished)
+
+    def drop_showtime(self, showtime_id: int) -> None:
+        self.showtimes.pop(showtime_id, None)
+        self.loading.pop(showtime_id, None)
+
+    def drop_hall(self, hall_id: int) -> List[int]:
+        # Seats of the hall changed - showtimes in it are reloaded on next access
+        self.layouts.pop(hall_id, None)
+        self.generation += 1
+        dropped = [s for s, o in self.showtimes.items() if o.layout.hall_id == hall_id]
+        for showtime_id in dropped:
+            del self.showtimes[showtime_id]
+        return dropped
+
+    async def check_consistency(self) -> List[dict]:
+        # Compare every loaded showtime with seat_claims in the database
+        showtime_ids = list(self.showtimes.keys())
+        if not showtime_ids:
+            return []
+        fresh = await self._load(showtime_ids)
+
+        mismatches = []
+        for showtime_id, occupancy in self.showtimes.items():
+            expected = fresh.get(showtime_id)
+            expected_ids = set(expected.reserved_seat_ids()) if expected else set()
+            actual_ids = set(occupancy.reserved_seat_ids())
+            if expected_ids != actual_ids:
+                mismatches.append({
+                    "showtime_id": showtime_id,
+                    "missing_seat_ids": sorted(expected_ids - actual_ids),
+                    "extra_seat_ids": sorted(actual_ids - expected_ids)
+                })
+        return mismatches
+
+occupancy_index = OccupancyIndex()
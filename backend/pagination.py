@@ -0,0 +1,38 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+# Keyset (cursor) pagination helpers.
+# A cursor is the sort key of the last row of a page, JSON encoded and base64url
+# wrapped, so the next page is a plain indexed range scan instead of an OFFSET.
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+def encode_cursor(*values) -> str:
+    encoded = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(encoded).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types) -> list:
+    # types: one parser per key part, e.g. (datetime, int)
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if parser is datetime else parser(value)
+            for parser, value in zip(types, values)
+        ]
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def paginate(rows, limit: int, key: Callable) -> Tuple[List, Optional[str]]:
+    # rows were fetched with limit + 1 to find out whether another page exists
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,40 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# bcrypt is CPU-bound (~200ms per call), so hashing and verification run in a
+# bounded thread pool (bcrypt releases the GIL) instead of on the event loop.
+
+class PasswordHasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    def __init__(self, pwd_context, max_workers: int = 4, max_pending: int = 64):
+        self.pwd_context = pwd_context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+
+    async def _run(self, func, *args):
+        # Admission control: reject instead of queueing without bound
+        if self.pending >= self.max_pending:
+            raise PasswordHasherBusy("Password hashing queue is full")
+        self.pending += 1
+        try:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.pwd_context.verify, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,217 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from starlette.responses import JSONResponse
+import logs
+
+# Token-bucket rate limiting per client and route group.
+# Every (group, client) pair has a bucket of `requests` tokens, refilled at
+# requests / window per second; a request takes one token or is answered with 429.
+# The client is the user of a valid bearer token, otherwise the IP address (behind
+# a proxy, run uvicorn with --proxy-headers so that is the real client).
+# Responses carry RateLimit-Limit / -Remaining / -Reset / -Policy, and 429s Retry-After.
+# Buckets live in this worker's memory by default. A bucket left idle for a whole
+# window is full again, the same as a new one, so it is dropped. With several
+# workers set RATE_LIMIT_URL (redis://...) to share the buckets between them.
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL")
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
+
+# group -> (requests, window in seconds). Override with e.g.
+# RATE_LIMITS="auth=5/60,seats=60/10"; 0 requests turns a group's limit off
+DEFAULT_LIMITS = {
+    "auth": (10, 60),
+    "seats": (120, 60),
+    "reservations": (60, 60),
+    "admin": (300, 60),
+    "default": (600, 60),
+}
+
+def _parse_limits(value: str) -> Dict[str, Tuple[int, float]]:
+    limits = dict(DEFAULT_LIMITS)
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        group, limit = item.split("=", 1)
+        requests, _, window = limit.partition("/")
+        limits[group.strip()] = (int(requests), float(window or 60))
+    return limits
+
+RATE_LIMITS = _parse_limits(os.getenv("RATE_LIMITS", ""))
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+# (methods or None for any, path prefix, group); the first match wins, other paths are "default"
+ROUTE_GROUPS = [
+    (None, "/token", "auth"),
+    (None, "/logout", "auth"),
+    (("POST",), "/users/", "auth"),  # registration
+    (None, "/users/me/reservations", "reservations"),
+    (None, "/reservations/", "reservations"),
+    (None, "/showtime/", "seats"),
+    (None, "/admin/", "admin"),
+    # Catalogue writes are admin requests; their reads are "default"
+    (WRITE_METHODS, "/movies/", "admin"),
+    (WRITE_METHODS, "/showtimes/", "admin"),
+    (WRITE_METHODS, "/halls/", "admin"),
+]
+EXEMPT_PATHS = ("/metrics", "/docs", "/redoc", "/openapi.json")
+
+logger = logs.get_logger("ratelimit")
+
+def route_group(method: str, path: str) -> Optional[str]:
+    if path.startswith(EXEMPT_PATHS):
+        return None
+    for methods, prefix, group in ROUTE_GROUPS:
+        if path.startswith(prefix) and (methods is None or method in methods):
+            return group
+    return "default"
+
+class LocalBuckets:
+    # Buckets in least recently used order: [tokens, updated_at, window]
+    def __init__(self, max_buckets: int):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def take(self, key: str, requests: int, window: float) -> Tuple[bool, float]:
+        # Returns (allowed, tokens left)
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(requests)
+            bucket = self._buckets[key] = [tokens, now, window]
+        else:
+            tokens = min(float(requests), bucket[0] + (now - bucket[1]) * requests / window)
+            self._buckets.move_to_end(key)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        bucket[0], bucket[1], bucket[2] = tokens, now, window
+        self._evict(now)
+        return allowed, tokens
+
+    def _evict(self, now: float) -> None:
+        # Full buckets from the idle end, then the oldest ones above the cap
+        buckets = self._buckets
+        while buckets:
+            _, (_, updated_at, window) = next(iter(buckets.items()))
+            if now - updated_at < window and len(buckets) <= self.max_buckets:
+                break
+            buckets.popitem(last=False)
+
+# Atomic refill-and-take; Redis time, so every worker sees the same clock
+_TAKE_SCRIPT = """
+local requests = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = requests
+if bucket[1] then
+    tokens = math.min(requests, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * requests / window)
+end
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(window * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+class RedisBuckets:
+    # Shared between workers; a bucket expires once it would be full again
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+
+    def __len__(self) -> int:
+        return 0  # not tracked by this worker
+
+    async def take(self, key: str, requests: int, window: float) -> Tuple[bool, float]:
+        allowed, tokens = await self._take(keys=[f"ratelimit:{key}"], args=[requests, window])
+        return bool(allowed), float(tokens)
+
+class RateLimiter:
+    def __init__(self, buckets, limits: Dict[str, Tuple[int, float]]):
+        self.buckets = buckets
+        self.limits = limits
+        self.rejected: Dict[str, int] = {}
+        self.errors = 0
+        self._error_logged_at = None
+
+    async def check(self, group: str, client: str) -> Optional[Tuple[bool, list]]:
+        # (allowed, headers), or None when the group has no limit
+        requests, window = self.limits.get(group, (0, 60))
+        if requests <= 0:
+            return None
+        try:
+            allowed, tokens = await self.buckets.take(f"{group}:{client}", requests, window)
+        except Exception:
+            # A store outage must not take the site down: let the request through
+            self.errors += 1
+            now = time.monotonic()
+            if self._error_logged_at is None or now - self._error_logged_at >= 60:
+                self._error_logged_at = now
+                logger.exception("Rate limit store unavailable", extra={"errors": self.errors})
+            return None
+
+        rate = requests / window
+        headers = [
+            (b"ratelimit-limit", str(requests).encode()),
+            (b"ratelimit-remaining", str(int(tokens)).encode()),
+            (b"ratelimit-reset", str(math.ceil((requests - tokens) / rate)).encode()),
+            (b"ratelimit-policy", f"{requests};w={window:g}".encode()),
+        ]
+        if not allowed:
+            self.rejected[group] = self.rejected.get(group, 0) + 1
+            headers.append((b"retry-after", str(max(1, math.ceil((1 - tokens) / rate))).encode()))
+        return allowed, headers
+
+def _create_buckets(url: Optional[str]):
+    if url:
+        return RedisBuckets(url)
+    return LocalBuckets(RATE_LIMIT_MAX_BUCKETS)
+
+rate_limiter = RateLimiter(_create_buckets(RATE_LIMIT_URL), RATE_LIMITS)
+
+class RateLimitMiddleware:
+    # ASGI middleware; identify(scope) returns the client key of an authenticated
+    # request, or None to fall back to the IP address
+    def __init__(self, app, identify: Optional[Callable[[dict], Optional[str]]] = None):
+        self.app = app
+        self.identify = identify
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        group = route_group(scope["method"], scope["path"])
+        if group is None:
+            return await self.app(scope, receive, send)
+        client = self.identify(scope) if self.identify else None
+        if client is None:
+            client = f"ip:{scope['client'][0] if scope.get('client') else 'unknown'}"
+
+        checked = await rate_limiter.check(group, client)
+        if checked is None:
+            return await self.app(scope, receive, send)
+        allowed, headers = checked
+        if not allowed:
+            response = JSONResponse({"detail": "Too many requests"}, status_code=429)
+            response.raw_headers.extend(headers)
+            return await response(scope, receive, send)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
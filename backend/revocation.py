@@ -0,0 +1,73 @@
+import heapq
+import os
+from datetime import datetime, timedelta
+from sqlalchemy.sql import select
+import models
+from database import database
+
+# Revoked access tokens, checked by get_current_user on every request.
+# revoked_tokens is the source of truth; the index keeps the jti of every revoked
+# token that has not expired yet, so the check is a set lookup instead of a query.
+# A token that has expired fails the signature check anyway, so its entry is
+# evicted at that point and the index stays as small as the number of tokens
+# revoked within one access token lifetime. A plain set rather than a bloom
+# filter: false positives would log out real users, and revocations are rare.
+# Every worker rebuilds the index at startup and polls the table every
+# REVOCATION_SYNC_SECONDS for tokens revoked by other workers.
+
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+# Each poll re-reads rows revoked this long before the previous one, for clock
+# differences between workers and transactions that commit late
+SYNC_OVERLAP = timedelta(seconds=60)
+
+class RevocationIndex:
+    def __init__(self):
+        self.expires = {}  # jti -> expires_at
+        self.heap = []  # (expires_at, jti), for eviction
+        self.synced_at = None
+
+    def __contains__(self, jti) -> bool:
+        return jti in self.expires
+
+    def __len__(self) -> int:
+        return len(self.expires)
+
+    def add(self, jti: str, expires_at: datetime) -> None:
+        if jti in self.expires or expires_at <= datetime.utcnow():
+            return
+        self.expires[jti] = expires_at
+        heapq.heappush(self.heap, (expires_at, jti))
+
+    def evict(self) -> int:
+        # Drops tokens that have expired; returns how many
+        now = datetime.utcnow()
+        evicted = 0
+        while self.heap and self.heap[0][0] <= now:
+            _, jti = heapq.heappop(self.heap)
+            del self.expires[jti]
+            evicted += 1
+        return evicted
+
+    async def _load(self, revoked_since=None) -> None:
+        started = datetime.utcnow()
+        query = select(models.RevokedToken.jti, models.RevokedToken.expires_at).where(
+            models.RevokedToken.expires_at > started
+        )
+        if revoked_since is not None:
+            query = query.where(models.RevokedToken.revoked_at >= revoked_since)
+        for row in await database.fetch_all(query):
+            self.add(row["jti"], row["expires_at"])
+        self.synced_at = started
+
+    async def rebuild(self) -> None:
+        self.expires, self.heap = {}, []
+        await self._load()
+
+    async def sync(self) -> None:
+        # Picks up revocations made by other workers
+        self.evict()
+        if self.synced_at is None:
+            return await self.rebuild()
+        await self._load(self.synced_at - SYNC_OVERLAP)
+
+revocation_index = RevocationIndex()
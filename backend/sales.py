@@ -0,0 +1,153 @@
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.sql import select, func
+import models
+from database import database, engine, IS_SQLITE
+
+# Materialized sales statistics.
+# Completing a reservation (or taking a completed one back) adds its revenue and
+# seat count to the running totals in the same transaction, so the admin
+# statistics and analytics read a few rows instead of scanning the reservation
+# history. rebuild() recomputes everything from scratch.
+#
+# - sales_aggregates: one row per scope - overall ("total", key 0), per movie,
+#   per showtime and per booking day (key = YYYYMMDD)
+# - sales_rollups: one row per booking day and showtime, for date-range analytics
+
+def sales_query():
+    # One row per reservation with everything the totals are keyed by.
+    # Revenue is the amount charged at booking; older rows fall back to price x seats
+    seats = select(func.count()).where(
+        models.ReservationSeat.reservation_id == models.Reservation.id
+    ).scalar_subquery()
+    return select(
+        models.Reservation.id,
+        models.Reservation.created_at,
+        models.Reservation.showtime_id,
+        models.Showtime.movie_id,
+        models.Showtime.hall_id,
+        seats.label("seats"),
+        func.coalesce(models.Reservation.amount, models.Showtime.price * seats).label("amount")
+    ).join(models.Showtime, models.Showtime.id == models.Reservation.showtime_id)
+
+def completed_sales_query():
+    return sales_query().where(models.Reservation.payment_status == "completed")
+
+def _day_key(day) -> int:
+    if day is None:
+        return 0
+    return day.year * 10000 + day.month * 100 + day.day
+
+class SalesTotals:
+    def __init__(self):
+        self.aggregates = {}  # (scope, key) -> [revenue, seats]
+        self.rollups = {}  # (day, showtime_id) -> [movie_id, hall_id, revenue, seats]
+
+    def add(self, sale, sign: int = 1):
+        revenue = sign * (sale["amount"] or 0)
+        seats = sign * sale["seats"]
+        day = sale["created_at"].date() if sale["created_at"] else None
+        for key in (
+            ("total", 0),
+            ("movie", sale["movie_id"]),
+            ("showtime", sale["showtime_id"]),
+            ("day", _day_key(day)),
+        ):
+            total = self.aggregates.setdefault(key, [0.0, 0])
+            total[0] += revenue
+            total[1] += seats
+        if day is not None:
+            rollup = self.rollups.setdefault(
+                (day, sale["showtime_id"]), [sale["movie_id"], sale["hall_id"], 0.0, 0]
+            )
+            rollup[2] += revenue
+            rollup[3] += seats
+
+    def aggregate_rows(self):
+        return [
+            {"scope": scope, "key": key, "revenue": revenue, "tickets": seats}
+            for (scope, key), (revenue, seats) in self.aggregates.items()
+        ]
+
+    def rollup_rows(self):
+        return [
+            {"day": day, "showtime_id": showtime_id, "movie_id": movie_id, "hall_id": hall_id,
+             "revenue": revenue, "seats": seats}
+            for (day, showtime_id), (movie_id, hall_id, revenue, seats) in self.rollups.items()
+        ]
+
+def _insert(table):
+    return (sqlite.insert if IS_SQLITE else postgresql.insert)(table)
+
+def _upsert_aggregates(rows):
+    table = models.SalesAggregate.__table__
+    query = _insert(table).values(rows)
+    return query.on_conflict_do_update(
+        index_elements=[table.c.scope, table.c.key],
+        set_={
+            "revenue": table.c.revenue + query.excluded.revenue,
+            "tickets": table.c.tickets + query.excluded.tickets,
+        }
+    )
+
+def _upsert_rollups(rows):
+    table = models.SalesRollup.__table__
+    query = _insert(table).values(rows)
+    return query.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.showtime_id],
+        set_={
+            "movie_id": query.excluded.movie_id,
+            "hall_id": query.excluded.hall_id,
+            "revenue": table.c.revenue + query.excluded.revenue,
+            "seats": table.c.seats + query.excluded.seats,
+        }
+    )
+
+async def apply_sales(query, sign: int = 1):
+    # Adds (sign=1) or subtracts (sign=-1) the sales selected by a sales_query();
+    # must run in the transaction that changes the reservations
+    totals = SalesTotals()
+    for sale in await database.fetch_all(query):
+        totals.add(sale, sign)
+    if totals.aggregates:
+        await database.execute(_upsert_aggregates(totals.aggregate_rows()))
+    if totals.rollups:
+        await database.execute(_upsert_rollups(totals.rollup_rows()))
+
+async def record_sale(reservation_id: int, sign: int = 1):
+    await apply_sales(sales_query().where(models.Reservation.id == reservation_id), sign)
+
+def showtime_sales_query(showtime_id: int):
+    return completed_sales_query().where(models.Reservation.showtime_id == showtime_id)
+
+async def remove_showtime_sales(showtime_id: int):
+    # Before a showtime and its reservations are deleted
+    await apply_sales(showtime_sales_query(showtime_id), sign=-1)
+    await database.execute(models.SalesAggregate.__table__.delete().where(
+        models.SalesAggregate.scope == "showtime",
+        models.SalesAggregate.key == showtime_id
+    ))
+    await database.execute(models.SalesRollup.__table__.delete().where(
+        models.SalesRollup.showtime_id == showtime_id
+    ))
+
+def rebuild(connection):
+    # Recomputes all totals from the reservations (sync, for migrations and the CLI)
+    if not IS_SQLITE:
+        # Concurrent status changes wait until the rebuilt totals are committed
+        connection.execute(text("LOCK TABLE sales_aggregates, sales_rollups IN EXCLUSIVE MODE"))
+    totals = SalesTotals()
+    for sale in connection.execute(completed_sales_query()).mappings():
+        totals.add(sale)
+    connection.execute(models.SalesAggregate.__table__.delete())
+    connection.execute(models.SalesRollup.__table__.delete())
+    if totals.aggregates:
+        connection.execute(models.SalesAggregate.__table__.insert(), totals.aggregate_rows())
+    if totals.rollups:
+        connection.execute(models.SalesRollup.__table__.insert(), totals.rollup_rows())
+    return len(totals.aggregates) + len(totals.rollups)
+
+if __name__ == "__main__":
+    with engine.begin() as connection:
+        count = rebuild(connection)
+    print(f"Rebuilt {count} sales rows")
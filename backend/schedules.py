@@ -0,0 +1,60 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+import schemas
+
+# Schedule generation from weekly hall templates.
+# A template lists a hall's daily start times, the weekdays it plays and the
+# movies in rotation with their weights; generate() expands the templates day by
+# day. Movies are picked by smooth weighted round-robin: a movie with weight 2
+# gets twice the slots of one with weight 1, spread out instead of in runs, and
+# the same templates always give the same schedule.
+
+WEEKDAYS = range(7)  # 0 = Monday
+
+class MovieRotation:
+    def __init__(self, weights: Dict[int, float]):
+        self.weights = {movie_id: weight for movie_id, weight in weights.items() if weight > 0}
+        if not self.weights:
+            raise ValueError("A template needs at least one movie with a positive weight")
+        self.total = sum(self.weights.values())
+        self.current = {movie_id: 0.0 for movie_id in self.weights}
+
+    def next(self) -> int:
+        for movie_id, weight in self.weights.items():
+            self.current[movie_id] += weight
+        movie_id = max(self.current, key=self.current.get)
+        self.current[movie_id] -= self.total
+        return movie_id
+
+def _check_template(template: schemas.HallScheduleTemplate):
+    if not template.slots:
+        raise ValueError(f"Template for hall {template.hall_id} has no slots")
+    invalid = set(template.days) - set(WEEKDAYS)
+    if invalid:
+        raise ValueError(f"Template for hall {template.hall_id} has invalid weekdays: {sorted(invalid)}")
+
+def generate(templates: List[schemas.HallScheduleTemplate], start_date: date, days: int) -> List[schemas.ShowtimeCreate]:
+    # Showtimes for `days` days from start_date, in template order; end_time is left
+    # to crud (movie duration)
+    if days < 1:
+        raise ValueError("Schedule must cover at least one day")
+    for template in templates:
+        _check_template(template)
+
+    showtimes = []
+    for template in templates:
+        rotation = MovieRotation(template.movies)
+        slots = sorted(set(template.slots))
+        weekdays = set(template.days)
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            if day.weekday() not in weekdays:
+                continue
+            for slot in slots:
+                showtimes.append(schemas.ShowtimeCreate(
+                    movie_id=rotation.next(),
+                    hall_id=template.hall_id,
+                    start_time=datetime.combine(day, slot),
+                    price=template.price
+                ))
+    return showtimes
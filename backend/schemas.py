@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional
+from datetime import date, datetime, time
 
 # User schemas
 class UserBase(BaseModel):
@@ -21,6 +21,11 @@ class UserResponse(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # seconds until the access token expires
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
 
 # Movie schemas
 class MovieBase(BaseModel):
@@ -45,6 +50,7 @@ class HallBase(BaseModel):
     capacity: int
     rows: int
     seats_per_row: int
+    layout: Optional[str] = None  # e.g. "SS.SS/SS.SS"; overrides rows, seats_per_row and capacity
 
 class HallCreate(HallBase):
     pass
@@ -64,7 +70,7 @@ class ShowtimeBase(BaseModel):
     price: float
 
 class ShowtimeCreate(ShowtimeBase):
-    pass
+    end_time: Optional[datetime] = None  # defaults to start_time + movie duration
 
 class Showtime(ShowtimeBase):
     id: int
@@ -74,6 +80,36 @@ class Showtime(ShowtimeBase):
     class Config:
         orm_mode = True
 
+# Schedule import: all rows are checked before anything is created
+class ShowtimeImport(BaseModel):
+    showtimes: List[ShowtimeCreate]
+    dry_run: bool = False
+
+class ShowtimeImportError(BaseModel):
+    index: int  # position in the imported list
+    message: str
+    conflicting_showtime_id: Optional[int] = None
+    conflicting_index: Optional[int] = None
+
+class ShowtimeImportResult(BaseModel):
+    total: int
+    created: int
+    errors: List[ShowtimeImportError]
+
+# Schedule generation (see schedules.py)
+class HallScheduleTemplate(BaseModel):
+    hall_id: int
+    slots: List[time]  # start times of the day's showtimes
+    days: List[int] = [0, 1, 2, 3, 4, 5, 6]  # weekdays, 0 = Monday
+    movies: Dict[int, float]  # movie id -> rotation weight
+    price: float
+
+class ScheduleGenerate(BaseModel):
+    start_date: date
+    weeks: int = 1
+    templates: List[HallScheduleTemplate]
+    dry_run: bool = False
+
 # Seat schemas
 class SeatBase(BaseModel):
     hall_id: int
@@ -85,11 +121,23 @@ class SeatCreate(SeatBase):
 
 class Seat(SeatBase):
     id: int
+    category: str = "standard"
     is_reserved: bool = False
 
     class Config:
         orm_mode = True
 
+# Compact seat map: hall geometry once plus a base64 occupancy bitmask
+class SeatMap(BaseModel):
+    showtime_id: int
+    hall_id: int
+    rows: int
+    seats_per_row: int
+    layout: Optional[str] = None  # hall layout with seat categories, see layouts.py
+    version: int
+    seat_ids: List[Optional[int]]  # seat id at each position (row - 1) * seats_per_row + column
+    reserved_mask: str  # base64, bit i (least significant bit first) is position i
+
 # Reservation schemas
 class ReservationBase(BaseModel):
     showtime_id: int
@@ -104,6 +152,8 @@ class Reservation(BaseModel):
     showtime_id: int
     payment_status: str
     created_at: datetime
+    hold_expires_at: Optional[datetime] = None
+    amount: Optional[float] = None
     showtime: Optional[Showtime]
     seats: List[Seat]  # Изменено с seat на seats - массив мест
 
@@ -118,3 +168,19 @@ class Statistics(BaseModel):
     total_sales: float
     tickets_sold: int
     popular_movies: List[Movie]
+
+# Analytics schemas
+class SalesBucket(BaseModel):
+    key: str  # day or week start (YYYY-MM-DD), or movie / hall / showtime id
+    label: Optional[str] = None
+    revenue: float
+    seats_sold: int
+
+class OccupancyReport(BaseModel):
+    showtime_id: int
+    movie_id: int
+    hall_id: int
+    start_time: datetime
+    capacity: int
+    seats_sold: int
+    occupancy_rate: float
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import os
+from typing import Dict, Set
+
+# Per-showtime fan-out of seat availability changes to Server-Sent Events viewers.
+# Each event is encoded once and pushed to every subscriber's bounded queue;
+# a subscriber that falls behind is resynchronised with a fresh snapshot
+# instead of slowing down the publisher.
+
+SEAT_EVENTS_QUEUE_SIZE = int(os.getenv("SEAT_EVENTS_QUEUE_SIZE", "256"))
+
+# Queue markers besides encoded event strings
+RESYNC = object()
+CLOSE = object()
+
+def format_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+class Subscription:
+    def __init__(self, showtime_id: int, queue_size: int):
+        self.showtime_id = showtime_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def push(self, item) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def drain(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.overflowed = False
+
+class SeatEventBroker:
+    def __init__(self, queue_size: int = SEAT_EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.channels: Dict[int, Set[Subscription]] = {}
+
+    def subscribe(self, showtime_id: int) -> Subscription:
+        subscription = Subscription(showtime_id, self.queue_size)
+        self.channels.setdefault(showtime_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        channel = self.channels.get(subscription.showtime_id)
+        if channel is None:
+            return
+        channel.discard(subscription)
+        if not channel:
+            del self.channels[subscription.showtime_id]
+
+    def viewer_count(self, showtime_id: int) -> int:
+        return len(self.channels.get(showtime_id, ()))
+
+    def _broadcast(self, showtime_id: int, item) -> None:
+        for subscription in self.channels.get(showtime_id, ()):
+            subscription.push(item)
+
+    def publish(self, showtime_id: int, event: str, data) -> None:
+        if showtime_id in self.channels:
+            self._broadcast(showtime_id, format_event(event, data))
+
+    def resync(self, showtime_id: int) -> None:
+        self._broadcast(showtime_id, RESYNC)
+
+    def close(self, showtime_id: int) -> None:
+        self._broadcast(showtime_id, CLOSE)
+
+seat_events = SeatEventBroker()
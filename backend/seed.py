@@ -1,13 +1,23 @@
+import argparse
 import asyncio
 import os
-from datetime import datetime, timedelta
+from datetime import date, time
 import models
-from database import database, engine
+import schemas
+import crud
+import schedules
+import synthetic
+import logs
+from database import database
+from cache import catalogue_cache
+from migrations import apply_migrations
 from passlib.context import CryptContext
 
-# Ensure the database file exists and tables are created
+# Ensure the database file exists and the schema is up to date
 def create_tables():
-    models.Base.metadata.create_all(bind=engine)
+    apply_migrations()
+
+logger = logs.get_logger("seed")
 
 # Create password hash
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -26,7 +36,7 @@ async def seed_data():
             is_admin=True
         )
         await database.execute(admin_query)
-        print("Admin user created")
+        logger.info("Admin user created")
         
         # Create regular user
         user_password_hash = pwd_context.hash("user123")
@@ -37,7 +47,7 @@ async def seed_data():
             is_admin=False
         )
         await database.execute(user_query)
-        print("Regular user created")
+        logger.info("Regular user created")
         
         # Create sample movies
         movies = [
@@ -67,7 +77,8 @@ async def seed_data():
         for movie in movies:
             query = models.Movie.__table__.insert().values(**movie)
             await database.execute(query)
-        print("Sample movies created")
+        await catalogue_cache.invalidate("movies")
+        logger.info("Sample movies created")
         
         # Create halls
         halls = [
@@ -76,20 +87,9 @@ async def seed_data():
             {"name": "VIP Hall", "capacity": 50, "rows": 5, "seats_per_row": 10}
         ]
         
-        for hall in halls:
-            query = models.Hall.__table__.insert().values(**hall)
-            hall_id = await database.execute(query)
-            
-            # Create seats for each hall
-            for row in range(1, hall["rows"] + 1):
-                for seat_num in range(1, hall["seats_per_row"] + 1):
-                    seat_query = models.Seat.__table__.insert().values(
-                        hall_id=hall_id,
-                        row=row,
-                        number=seat_num
-                    )
-                    await database.execute(seat_query)
-        print("Halls and seats created")
+        # Halls and their seats are inserted in bulk
+        await crud.create_halls([schemas.HallCreate(**hall) for hall in halls])
+        logger.info("Halls and seats created")
         
         # Get movie and hall IDs for showtimes
         movie_query = models.Movie.__table__.select()
@@ -100,43 +100,60 @@ async def seed_data():
         halls = await database.fetch_all(hall_query)
         hall_ids = [hall["id"] for hall in halls]
         
-        # Create showtimes
-        current_time = datetime.now()
-        showtimes = []
-        
-        # For each movie, create multiple showtimes over the next week
-        for i, movie_id in enumerate(movie_ids):
-            movie_duration = movies[i]["duration"]
-            for day in range(7):  # Next 7 days
-                for hour in [13, 16, 19]:  # Three showtimes per day
-                    start_time = current_time + timedelta(days=day, hours=hour - current_time.hour)
-                    end_time = start_time + timedelta(minutes=movie_duration)
-                    
-                    showtime = {
-                        "movie_id": movie_id,
-                        "hall_id": hall_ids[i % len(hall_ids)],  # Rotate through halls
-                        "start_time": start_time,
-                        "end_time": end_time,
-                        "price": 10.0 + (2.0 * (i % 3))  # Different prices
-                    }
-                    showtimes.append(showtime)
-        
-        for showtime in showtimes:
-            query = models.Showtime.__table__.insert().values(**showtime)
-            await database.execute(query)
-        print("Showtimes created")
+        # Next week's schedule: three showtimes a day per hall, every hall
+        # mostly showing its own movie, with different prices
+        templates = [
+            schemas.HallScheduleTemplate(
+                hall_id=hall_id,
+                slots=[time(13, 0), time(16, 0), time(19, 0)],
+                movies={movie_id: 3 if movie_id == movie_ids[i % len(movie_ids)] else 1 for movie_id in movie_ids},
+                price=10.0 + (2.0 * (i % 3))
+            )
+            for i, hall_id in enumerate(hall_ids)
+        ]
+        showtimes = schedules.generate(templates, date.today(), days=7)
+        created, errors = await crud.import_showtimes(showtimes)
+        if errors:
+            raise ValueError(f"Schedule conflicts: {errors}")
+        logger.info("Showtimes created", extra={"count": created})
         
-        print("Database seeded successfully!")
+        logger.info("Database seeded successfully!")
         
-    except Exception as e:
-        print(f"Error seeding database: {e}")
+    except Exception:
+        logger.exception("Error seeding database")
+    finally:
+        await database.disconnect()
+
+async def seed_synthetic(args):
+    await database.connect()
+    try:
+        counts = await synthetic.generate(
+            pwd_context.hash("user123"),
+            showtimes=args.showtimes,
+            reservations=args.reservations,
+            users=args.users,
+            halls=args.halls,
+            movies=args.movies,
+            seed=args.seed
+        )
+        logger.info("Synthetic data created", extra=counts)
     finally:
         await database.disconnect()
 
 # Run the seed script
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the cinema database")
+    parser.add_argument("--synthetic", action="store_true", help="add a large generated dataset for load tests (see synthetic.py)")
+    parser.add_argument("--showtimes", type=int, default=100000)
+    parser.add_argument("--reservations", type=int, default=2000000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--halls", type=int, default=40)
+    parser.add_argument("--movies", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1, help="random seed; the same seed gives the same data")
+    args = parser.parse_args()
+    
     # Create tables
     create_tables()
     
     # Seed data - use asyncio.run() instead of manually getting the event loop
-    asyncio.run(seed_data())
+    asyncio.run(seed_synthetic(args) if args.synthetic else seed_data())
@@ -0,0 +1,203 @@
+import asyncio
+import collections
+import typing
+import aiosqlite
+from databases.backends.sqlite import SQLiteBackend, SQLiteConnection, SQLiteTransaction
+
+# SQLite backend for `databases` tuned for a busy web worker:
+# - persistent connections (the stock backend opens a new one per query),
+#   each initialised with the configured PRAGMAs
+# - a pool of read-only connections for reads; with WAL they never block on writers
+# - all writes go through a single writer connection, queued FIFO, and
+#   transactions start with BEGIN IMMEDIATE so they never fail upgrading a read lock
+
+class SQLiteConnectionPool:
+    def __init__(self, database: str, size: int, pragmas: typing.Dict[str, typing.Any], query_only: bool = False):
+        self.database = database
+        self.size = size
+        self.pragmas = dict(pragmas)
+        if query_only:
+            self.pragmas["query_only"] = 1
+        self._created = 0
+        self._idle: typing.Deque[aiosqlite.Connection] = collections.deque()
+        self._waiters: typing.Deque[asyncio.Future] = collections.deque()
+
+    async def _open(self) -> aiosqlite.Connection:
+        connection = aiosqlite.connect(database=self.database, isolation_level=None)
+        await connection.__aenter__()
+        for name, value in self.pragmas.items():
+            await connection.execute(f"PRAGMA {name}={value}")
+        return connection
+
+    async def acquire(self) -> aiosqlite.Connection:
+        if self._idle and not self._waiters:
+            return self._idle.popleft()
+        if self._created < self.size:
+            self._created += 1
+            try:
+                return await self._open()
+            except Exception:
+                self._created -= 1
+                raise
+        # Waiters are served in FIFO order: a released connection is handed to the
+        # first one, so a task that releases and acquires again cannot jump the queue
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                await self.release(waiter.result())
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    async def release(self, connection: aiosqlite.Connection) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(connection)
+                return
+        self._idle.append(connection)
+
+    async def close(self) -> None:
+        while self._idle:
+            connection = self._idle.popleft()
+            await connection.__aexit__(None, None, None)
+        self._created = 0
+
+class TunedSQLiteBackend(SQLiteBackend):
+    def __init__(self, database_url, read_pool_size: int = 8, pragmas: typing.Optional[dict] = None, **options):
+        super().__init__(database_url, **options)
+        pragmas = pragmas or {}
+        self._read_pool = SQLiteConnectionPool(self._pool._database, read_pool_size, pragmas, query_only=True)
+        self._write_pool = SQLiteConnectionPool(self._pool._database, 1, pragmas)
+
+    async def connect(self) -> None:
+        # journal_mode=WAL is persistent: set it once through the writer
+        writer = await self._write_pool.acquire()
+        await self._write_pool.release(writer)
+
+    async def disconnect(self) -> None:
+        await self._read_pool.close()
+        await self._write_pool.close()
+        await super().disconnect()
+
+    def connection(self) -> "TunedSQLiteConnection":
+        return TunedSQLiteConnection(self)
+
+class TunedSQLiteConnection(SQLiteConnection):
+    def __init__(self, backend: TunedSQLiteBackend):
+        super().__init__(backend._read_pool, backend._dialect)
+        self._write_pool = backend._write_pool
+        self._reader: typing.Optional[aiosqlite.Connection] = None
+
+    @property
+    def in_write(self) -> bool:
+        return self._reader is not None
+
+    async def begin_write(self) -> None:
+        # Swap the read connection for the writer until end_write()
+        writer = await self._write_pool.acquire()
+        self._reader = self._connection
+        self._connection = writer
+
+    async def end_write(self) -> None:
+        writer = self._connection
+        self._connection = self._reader
+        self._reader = None
+        await self._write_pool.release(writer)
+
+    async def execute(self, query) -> typing.Any:
+        if self.in_write:
+            return await super().execute(query)
+        await self.begin_write()
+        try:
+            return await super().execute(query)
+        finally:
+            await self.end_write()
+
+    async def _execute_batched(self, queries) -> None:
+        # One executemany() per run of identical statements
+        batch_sql, batch_args = None, []
+        for query in queries:
+            query_str, args, _, _ = self._compile(query)
+            if query_str != batch_sql and batch_args:
+                await self._connection.executemany(batch_sql, batch_args)
+                batch_args = []
+            batch_sql = query_str
+            batch_args.append(args)
+        if batch_args:
+            await self._connection.executemany(batch_sql, batch_args)
+
+    async def _write_batch(self, run) -> None:
+        if self.in_write:
+            return await run()
+        await self.begin_write()
+        try:
+            # Outside a transaction the batch is still applied atomically
+            await self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                await run()
+            except Exception:
+                await self._connection.execute("ROLLBACK")
+                raise
+            await self._connection.execute("COMMIT")
+        finally:
+            await self.end_write()
+
+    async def execute_many(self, queries) -> None:
+        await self._write_batch(lambda: self._execute_batched(queries))
+
+    async def insert_many(self, query, values: typing.List[dict]) -> None:
+        # The statement is compiled once for all rows (compiling is most of the cost
+        # of execute_many); every row must have the same keys as the first one
+        compiled = query.compile(dialect=self._dialect, column_keys=list(values[0]))
+        processors = compiled._bind_processors
+        defaults = {
+            column.key: column.default.arg
+            for column in compiled.insert_prefetch
+            if column.default is not None and column.default.is_scalar
+        }
+        args = []
+        for row in values:
+            params = compiled.construct_params({**defaults, **row} if defaults else row)
+            args.append([
+                processors[key](params[key]) if key in processors else params[key]
+                for key in compiled.positiontup
+            ])
+        await self._write_batch(lambda: self._connection.executemany(compiled.string, args))
+
+    def transaction(self) -> "TunedSQLiteTransaction":
+        return TunedSQLiteTransaction(self)
+
+class TunedSQLiteTransaction(SQLiteTransaction):
+    async def start(self, is_root: bool, extra_options: typing.Dict[typing.Any, typing.Any]) -> None:
+        if not is_root:
+            return await super().start(is_root, extra_options)
+        self._is_root = True
+        await self._connection.begin_write()
+        try:
+            await self._connection._connection.execute("BEGIN IMMEDIATE")
+        except Exception:
+            await self._connection.end_write()
+            raise
+
+    async def commit(self) -> None:
+        if not self._is_root:
+            return await super().commit()
+        try:
+            await self._connection._connection.execute("COMMIT")
+        except Exception:
+            await self._connection._connection.execute("ROLLBACK")
+            raise
+        finally:
+            await self._connection.end_write()
+
+    async def rollback(self) -> None:
+        if not self._is_root:
+            return await super().rollback()
+        try:
+            await self._connection._connection.execute("ROLLBACK")
+        finally:
+            await self._connection.end_write()
@@ -0,0 +1,163 @@
+import math
+import random
+from datetime import date, datetime, time, timedelta
+from sqlalchemy.sql import select, func
+import models
+import schemas
+import crud
+import sales
+import schedules
+from database import database, engine
+from cache import catalogue_cache
+
+# Synthetic data for load tests and benchmarks (python seed.py --synthetic).
+# Users, movies and halls are made up, the schedule comes from hall templates
+# through schedules.generate(), and reservations follow a rough real-world shape:
+# popular movies and evening slots sell more, most bookings are for 1-4 seats,
+# some are cancelled, expired or still pending. Everything derives from one
+# random seed. Rows are written with execute_many in batches of showtimes and the
+# sales totals are rebuilt at the end. Run it with the server stopped: running
+# workers keep their caches and seat maps.
+
+SLOTS = [time(10, 0), time(13, 30), time(17, 0), time(20, 30)]
+SLOT_DEMAND = {slot: demand for slot, demand in zip(SLOTS, [0.5, 0.8, 1.2, 1.5])}
+GROUP_SIZES = [1, 2, 3, 4, 5, 6]
+GROUP_WEIGHTS = [25, 40, 12, 15, 4, 4]
+PAST_STATUSES = (["completed", "cancelled", "expired"], [85, 10, 5])
+UPCOMING_STATUSES = (["completed", "pending", "cancelled"], [70, 15, 15])
+UPCOMING_DAYS = 14
+MOVIES_PER_HALL = 6
+BATCH_SHOWTIMES = 2000
+
+async def _next_id(model) -> int:
+    return (await database.fetch_val(select(func.max(model.id))) or 0) + 1
+
+async def _create_users(count: int, password_hash: str) -> list:
+    first_id = await _next_id(models.User)
+    users = [
+        {"id": user_id, "username": f"synthetic{user_id}", "email": f"synthetic{user_id}@example.com",
+         "hashed_password": password_hash, "is_admin": False}
+        for user_id in range(first_id, first_id + count)
+    ]
+    await database.execute_many(query=models.User.__table__.insert(), values=users)
+    return [user["id"] for user in users]
+
+async def _create_movies(count: int, rng: random.Random) -> dict:
+    first_id = await _next_id(models.Movie)
+    movies = [
+        {"id": movie_id, "title": f"Synthetic Movie {movie_id}", "description": "Generated for load tests.",
+         "duration": rng.randint(85, 180), "poster_url": "",
+         "release_date": date(rng.randint(1980, 2025), rng.randint(1, 12), rng.randint(1, 28)).isoformat()}
+        for movie_id in range(first_id, first_id + count)
+    ]
+    await database.execute_many(query=models.Movie.__table__.insert(), values=movies)
+    return {movie["id"]: movie for movie in movies}
+
+async def _create_halls(count: int, rng: random.Random) -> dict:
+    # hall id -> seat ids
+    halls = []
+    for number in range(1, count + 1):
+        rows, seats_per_row = rng.randint(6, 20), rng.randint(8, 24)
+        halls.append(schemas.HallCreate(
+            name=f"Synthetic Hall {number}", rows=rows, seats_per_row=seats_per_row, capacity=rows * seats_per_row
+        ))
+    created = await crud.create_halls(halls)
+    seats = {hall["id"]: [] for hall in created}
+    query = select(models.Seat.id, models.Seat.hall_id).where(models.Seat.hall_id.in_(list(seats)))
+    for seat in await database.fetch_all(query):
+        seats[seat["hall_id"]].append(seat["id"])
+    return seats
+
+async def _create_showtimes(count: int, movies: dict, hall_seats: dict, rng: random.Random) -> list:
+    # Enough days of templates to reach `count`, ending UPCOMING_DAYS from today;
+    # the slots are 3.5 hours apart, so showtimes never overlap
+    days = math.ceil(count / (len(hall_seats) * len(SLOTS)))
+    start_date = date.today() - timedelta(days=days - UPCOMING_DAYS)
+    templates = [
+        schemas.HallScheduleTemplate(
+            hall_id=hall_id,
+            slots=SLOTS,
+            movies={movie_id: rng.randint(1, 5) for movie_id in rng.sample(list(movies), min(MOVIES_PER_HALL, len(movies)))},
+            price=rng.choice([8.0, 10.0, 12.0, 14.0, 16.0])
+        )
+        for hall_id in hall_seats
+    ]
+    generated = sorted(schedules.generate(templates, start_date, days), key=lambda showtime: showtime.start_time)
+    first_id = await _next_id(models.Showtime)
+    showtimes = []
+    for showtime_id, showtime in enumerate(generated[-count:], start=first_id):
+        values = showtime.dict()
+        values["id"] = showtime_id
+        values["end_time"] = values["start_time"] + timedelta(minutes=movies[values["movie_id"]]["duration"])
+        showtimes.append(values)
+    await database.execute_many(query=models.Showtime.__table__.insert(), values=showtimes)
+    return showtimes
+
+def _booking(showtime: dict, now: datetime, utc_now: datetime, rng: random.Random):
+    # (status, created_at, hold_expires_at) of one reservation. Showtime times are
+    # local and compared with now; reservation times are UTC like in crud
+    upcoming = showtime["start_time"] > now
+    statuses, weights = UPCOMING_STATUSES if upcoming else PAST_STATUSES
+    status = rng.choices(statuses, weights)[0]
+    if status == "pending":
+        created_at = utc_now - timedelta(seconds=rng.randint(0, crud.SEAT_HOLD_TTL_MINUTES * 60))
+        return status, created_at, created_at + timedelta(minutes=crud.SEAT_HOLD_TTL_MINUTES)
+    created_at = showtime["start_time"] + (utc_now - now) - timedelta(minutes=rng.randint(30, 14 * 24 * 60))
+    return status, min(created_at, utc_now - timedelta(minutes=rng.randint(1, 60))), None
+
+async def _create_reservations(count: int, showtimes: list, movies: dict, hall_seats: dict,
+                               user_ids: list, rng: random.Random) -> int:
+    popularity = {movie_id: rng.lognormvariate(0, 0.8) for movie_id in movies}
+    demand = [popularity[showtime["movie_id"]] * SLOT_DEMAND.get(showtime["start_time"].time(), 1.0) for showtime in showtimes]
+    per_demand = count / sum(demand)
+    now, utc_now = datetime.now(), datetime.utcnow()
+    reservation_id = await _next_id(models.Reservation)
+    created = 0
+
+    for start in range(0, len(showtimes), BATCH_SHOWTIMES):
+        reservations, reservation_seats, claims = [], [], []
+        for showtime, showtime_demand in zip(showtimes[start:start + BATCH_SHOWTIMES], demand[start:start + BATCH_SHOWTIMES]):
+            wanted = int(showtime_demand * per_demand + rng.random())
+            seats = hall_seats[showtime["hall_id"]]
+            free = rng.sample(seats, len(seats))
+            for _ in range(wanted):
+                group = free[:rng.choices(GROUP_SIZES, GROUP_WEIGHTS)[0]]
+                if not group:
+                    break  # sold out
+                del free[:len(group)]
+                status, created_at, hold_expires_at = _booking(showtime, now, utc_now, rng)
+                reservations.append({
+                    "id": reservation_id, "user_id": rng.choice(user_ids), "showtime_id": showtime["id"],
+                    "payment_status": status, "created_at": created_at, "hold_expires_at": hold_expires_at,
+                    "amount": showtime["price"] * len(group)
+                })
+                for seat_id in group:
+                    reservation_seats.append({"reservation_id": reservation_id, "seat_id": seat_id})
+                    if status not in crud.RELEASED_STATUSES:
+                        claims.append({"showtime_id": showtime["id"], "seat_id": seat_id, "reservation_id": reservation_id})
+                reservation_id += 1
+        async with database.transaction():
+            if reservations:
+                await database.execute_many(query=models.Reservation.__table__.insert(), values=reservations)
+                await database.execute_many(query=models.ReservationSeat.__table__.insert(), values=reservation_seats)
+            if claims:
+                await database.execute_many(query=models.SeatClaim.__table__.insert(), values=claims)
+        created += len(reservations)
+    return created
+
+async def generate(password_hash: str, showtimes: int = 100000, reservations: int = 2000000,
+                   users: int = 10000, halls: int = 40, movies: int = 40, seed: int = 1) -> dict:
+    # Returns the number of rows created per table
+    if min(showtimes, users, halls, movies) < 1 or reservations < 0:
+        raise ValueError("Synthetic data needs at least one showtime, user, hall and movie")
+    rng = random.Random(seed)
+    user_ids = await _create_users(users, password_hash)
+    movie_rows = await _create_movies(movies, rng)
+    hall_seats = await _create_halls(halls, rng)
+    showtime_rows = await _create_showtimes(showtimes, movie_rows, hall_seats, rng)
+    created = await _create_reservations(reservations, showtime_rows, movie_rows, hall_seats, user_ids, rng)
+    with engine.begin() as connection:
+        sales.rebuild(connection)
+    # Reaches running workers only through a shared cache backend (CACHE_URL)
+    await catalogue_cache.invalidate("movies", "halls", "showtimes")
+    return {"users": users, "movies": movies, "halls": halls, "showtimes": len(showtime_rows), "reservations": created}
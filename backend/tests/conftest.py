@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+import tempfile
+import pytest
+
+# The backend reads its settings at import time, so the environment is set up
+# before anything from it is imported. Tests run against a throwaway SQLite file,
+# or against TEST_DATABASE_URL (an empty PostgreSQL database) when it is set.
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIRECTORY = tempfile.mkdtemp(prefix="cinema-tests-")
+
+TEST_SETTINGS = {
+    "DATABASE_URL": os.getenv("TEST_DATABASE_URL") or f"sqlite:///{os.path.join(TEST_DIRECTORY, 'cinema.db')}",
+    "LOG_LEVEL": "WARNING",
+    "RATE_LIMIT_ENABLED": "0",
+    "CATALOGUE_CACHE_TTL_SECONDS": "0",
+    "SEAT_HOLD_SWEEP_INTERVAL_SECONDS": "3600",
+    "REVOCATION_SYNC_SECONDS": "3600",
+}
+os.environ.update(TEST_SETTINGS)
+sys.path.insert(0, BACKEND)
+
+from fastapi.testclient import TestClient
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    import seed
+    seed.create_tables()
+    asyncio.run(seed.seed_data())
+    with TestClient(main.app) as client:
+        yield client
+
+def _login(client, username: str, password: str) -> dict:
+    response = client.post("/token", data={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="session")
+def user_headers(client):
+    return _login(client, "user", "user123")
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    return _login(client, "admin", "admin123")
+
+@pytest.fixture
+def count_queries(monkeypatch):
+    # Statements issued while serving a request (background tasks are not counted)
+    import logs
+    from database import database
+    queries = []
+    observe = database._observe
+
+    def counting(query, values, started):
+        if logs.request_id.get() is not None:
+            queries.append(query)
+        observe(query, values, started)
+
+    monkeypatch.setattr(database, "_observe", counting)
+    return queries
+
+@pytest.fixture
+def bench_environment(monkeypatch):
+    # Benchmarks run in their own processes with their own settings
+    for name in TEST_SETTINGS:
+        monkeypatch.delenv(name, raising=False)
+
+@pytest.fixture
+def cache_on(monkeypatch):
+    # The suite runs with the catalogue cache off (CATALOGUE_CACHE_TTL_SECONDS=0)
+    from cache import catalogue_cache
+    monkeypatch.setattr(catalogue_cache, "ttl", 60)
@@ -0,0 +1,114 @@
+from datetime import date, datetime
+from sqlalchemy import select, update
+
+# Sales and occupancy analytics, on a movie and halls of their own so the
+# buckets only hold this test's bookings
+
+PRICE = 8.0
+
+def _create(client, admin_headers, path: str, values: dict) -> int:
+    response = client.post(path, json=values, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def _book(client, user_headers, showtime_id: int, seats: int, booked_on: date) -> int:
+    import models
+    from database import engine
+    seat_ids = [seat["id"] for seat in client.get(f"/showtime/{showtime_id}/seats").json() if not seat["is_reserved"]][:seats]
+    response = client.post("/reservations/", json={"showtime_id": showtime_id, "seat_ids": seat_ids}, headers=user_headers)
+    assert response.status_code == 200, response.text
+    reservation_id = response.json()["id"]
+    # Sales are bucketed by booking day, which is taken when the sale is recorded
+    with engine.begin() as connection:
+        connection.execute(update(models.Reservation).where(models.Reservation.id == reservation_id).values(
+            created_at=datetime.combine(booked_on, datetime.min.time()).replace(hour=12)
+        ))
+    return reservation_id
+
+def _complete(client, admin_headers, reservation_id: int):
+    response = client.patch(f"/reservations/{reservation_id}", json={"payment_status": "completed"}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+def _sales(client, admin_headers, **params) -> dict:
+    response = client.get("/admin/analytics/sales", params=params, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    return {bucket["key"]: (bucket["label"], bucket["revenue"], bucket["seats_sold"]) for bucket in response.json()}
+
+def _movie_aggregate(movie_id: int):
+    import models
+    from database import engine
+    table = models.SalesAggregate.__table__
+    with engine.connect() as connection:
+        row = connection.execute(select(table.c.revenue, table.c.tickets).where(
+            table.c.scope == "movie", table.c.key == movie_id
+        )).first()
+    return (row.revenue, row.tickets) if row and row.tickets else None
+
+def test_sales_and_occupancy(client, user_headers, admin_headers):
+    import models
+    from database import engine
+    movie = {"title": "Analytics test", "description": "", "duration": 100, "poster_url": "", "release_date": "2030-01-01"}
+    movie_id = _create(client, admin_headers, "/movies/", movie)
+    other_movie_id = _create(client, admin_headers, "/movies/", {**movie, "title": "Analytics test, other"})
+    hall_id = _create(client, admin_headers, "/halls/", {"name": "Analytics hall", "capacity": 6, "rows": 2, "seats_per_row": 3})
+    other_hall_id = _create(client, admin_headers, "/halls/", {"name": "Analytics hall, other", "capacity": 4, "rows": 2, "seats_per_row": 2})
+    showtime_id = _create(client, admin_headers, "/showtimes/", {
+        "movie_id": movie_id, "hall_id": hall_id, "start_time": "2034-01-10T18:00:00", "price": PRICE
+    })
+
+    # Monday and Wednesday of one week, Monday of the next; the last one stays pending
+    bookings = [(2, date(2030, 1, 7)), (1, date(2030, 1, 9)), (2, date(2030, 1, 14))]
+    for seats, booked_on in bookings:
+        _complete(client, admin_headers, _book(client, user_headers, showtime_id, seats, booked_on))
+    _book(client, user_headers, showtime_id, 1, date(2030, 1, 14))
+
+    # Revenue is the amount charged, price x seats of each booking
+    assert _sales(client, admin_headers, group_by="day", movie_id=movie_id) == {
+        "2030-01-07": (None, 2 * PRICE, 2),
+        "2030-01-09": (None, PRICE, 1),
+        "2030-01-14": (None, 2 * PRICE, 2),
+    }
+    assert _sales(client, admin_headers, group_by="week", movie_id=movie_id) == {
+        "2030-01-07": (None, 3 * PRICE, 3),
+        "2030-01-14": (None, 2 * PRICE, 2),
+    }
+    # Both ends of the range are inclusive
+    assert _sales(client, admin_headers, group_by="day", movie_id=movie_id, date_from="2030-01-09", date_to="2030-01-14") == {
+        "2030-01-09": (None, PRICE, 1),
+        "2030-01-14": (None, 2 * PRICE, 2),
+    }
+    assert _sales(client, admin_headers, group_by="movie", hall_id=hall_id) == {
+        str(movie_id): ("Analytics test", 5 * PRICE, 5),
+    }
+    assert _sales(client, admin_headers, group_by="showtime", movie_id=movie_id) == {
+        str(showtime_id): ("2034-01-10T18:00:00", 5 * PRICE, 5),
+    }
+    assert client.get("/admin/analytics/sales", params={"group_by": "year"}, headers=admin_headers).status_code == 400
+
+    # Capacity counts the hall's active seats only
+    with engine.begin() as connection:
+        seat_id = connection.execute(select(models.Seat.id).where(
+            models.Seat.hall_id == hall_id, models.Seat.row == 2, models.Seat.number == 3
+        )).scalar()
+        connection.execute(update(models.Seat).where(models.Seat.id == seat_id).values(is_active=False))
+    response = client.get("/admin/analytics/occupancy", params={"hall_id": hall_id}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    [report] = response.json()
+    assert (report["showtime_id"], report["capacity"], report["seats_sold"]) == (showtime_id, 5, 5)
+    assert report["occupancy_rate"] == 1.0
+
+    # Moving the showtime to another movie and hall moves its sales along
+    response = client.put(f"/showtimes/{showtime_id}", json={
+        "movie_id": other_movie_id, "hall_id": other_hall_id, "start_time": "2034-01-10T18:00:00", "price": PRICE
+    }, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert _sales(client, admin_headers, group_by="day", movie_id=movie_id) == {}
+    assert _sales(client, admin_headers, group_by="hall", movie_id=other_movie_id) == {
+        str(other_hall_id): ("Analytics hall, other", 5 * PRICE, 5),
+    }
+    assert _sales(client, admin_headers, group_by="week", hall_id=other_hall_id) == {
+        "2030-01-07": (None, 3 * PRICE, 3),
+        "2030-01-14": (None, 2 * PRICE, 2),
+    }
+    assert _movie_aggregate(movie_id) is None
+    assert _movie_aggregate(other_movie_id) == (5 * PRICE, 5)
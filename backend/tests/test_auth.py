@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+# Logging out revokes the session's token family, also once the access token
+# has expired, as long as the refresh token is sent
+
+def _login(client) -> dict:
+    response = client.post("/token", data={"username": "user", "password": "user123"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def _expired(access_token: str) -> str:
+    import main
+    from jose import jwt
+    claims = jwt.get_unverified_claims(access_token)
+    return main.create_access_token(claims, expires_at=datetime.utcnow() - timedelta(minutes=1))
+
+def test_logout_with_expired_access_token(client):
+    tokens = _login(client)
+    response = client.post("/logout", json={"refresh_token": tokens["refresh_token"]}, headers={
+        "Authorization": f"Bearer {_expired(tokens['access_token'])}"
+    })
+    assert response.status_code == 204, response.text
+
+    response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+    response = client.get("/users/me/reservations", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert response.status_code == 401
+
+def test_logout_with_rotated_refresh_token(client):
+    # The newest refresh token of the family revokes it, the session's older ones too
+    first = _login(client)
+    latest = client.post("/token/refresh", json={"refresh_token": first["refresh_token"]}).json()
+    response = client.post("/logout", json={"refresh_token": latest["refresh_token"]})
+    assert response.status_code == 204, response.text
+    response = client.post("/token/refresh", json={"refresh_token": latest["refresh_token"]})
+    assert response.status_code == 401
+
+def test_logout_with_access_token(client):
+    tokens = _login(client)
+    response = client.post("/logout", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert response.status_code == 204, response.text
+    response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+def test_logout_without_tokens(client):
+    assert client.post("/logout").status_code == 401
+    assert client.post("/logout", json={"refresh_token": "not-a-token"}).status_code == 401
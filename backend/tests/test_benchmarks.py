@@ -0,0 +1,46 @@
+import pytest
+from bench import common
+
+# Quick runs of the benchmarks in bench/, checking that they work and that the
+# numbers they exist to demonstrate hold with generous margins
+
+pytestmark = pytest.mark.bench
+
+def test_login_storm(bench_environment):
+    result = common.run_variant("login_storm", args=["--mode", "pool", "--quick"])
+    assert result["logins"].get("200", 0) > 0
+    # bcrypt runs off the event loop: /movies/ stays responsive during the storm
+    assert result["storm"]["p99"] < 250
+
+def test_seat_stream(bench_environment):
+    result = common.run_variant("seat_stream", args=["--viewers", "200", "--events", "5"])
+    assert result["delivery"]["count"] == 200 * 5
+    # Every viewer gets every event well within a second
+    assert result["broadcast"]["max"] < 1000
+
+def test_sqlite_mixed(bench_environment):
+    result = common.run_variant("sqlite_mixed", args=["--setup", "tuned", "--readers", "8", "--writers", "2", "--duration", "2"])
+    assert result["errors"] == {}
+    # Writers queue with the readers instead of waiting for them to stop
+    assert result["write"]["count"] >= 4
+    assert result["write"]["p99"] < 1500
+
+def test_bulk_halls(bench_environment):
+    result = common.run_variant("bulk_halls", args=["--sizes", "100", "1000", "--repeat", "2"])
+    by_size = {row["seats"]: row for row in result["rows"]}
+    # One batched insert per hall instead of one round trip per seat
+    assert by_size[1000]["speedup"] > 5
+
+def test_login_logging(bench_environment):
+    off = common.run_variant("login_logging", settings={"LOG_LEVEL": "CRITICAL"}, args=["--level", "off", "--quick"])
+    info = common.run_variant("login_logging", settings={"LOG_LEVEL": "INFO"}, args=["--level", "info", "--quick"])
+    assert off["statuses"] == {"200": off["latency"]["count"]}
+    assert info["dropped_log_records"] == 0
+    # Records are written off the event loop: logging costs a fraction of the throughput
+    assert info["logins_per_s"] > off["logins_per_s"] * 0.5
+
+def test_metrics_overhead(bench_environment):
+    off = common.run_variant("metrics_overhead", settings={"METRICS_ENABLED": "0"}, args=["--enabled", "0", "--quick"])
+    on = common.run_variant("metrics_overhead", settings={"METRICS_ENABLED": "1"}, args=["--enabled", "1", "--quick"])
+    # A few percent per request; the margin absorbs noise between the two processes
+    assert on["us_per_request"] < off["us_per_request"] * 1.25
@@ -0,0 +1,87 @@
+# Catalogue reads are served from the cache until a write path invalidates
+# their namespace
+
+HALL = {"name": "Cache test hall", "capacity": 20, "rows": 4, "seats_per_row": 5}
+
+def _counts(client, admin_headers, namespace):
+    counts = client.get("/admin/cache/stats", headers=admin_headers).json().get(namespace, {})
+    return counts.get("hits", 0), counts.get("misses", 0)
+
+def _get(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def _assert_invalidated(client, admin_headers, namespace, url, write):
+    # A repeated read is a hit, the first read after the write a miss
+    _get(client, url)
+    hits, misses = _counts(client, admin_headers, namespace)
+    _get(client, url)
+    assert _counts(client, admin_headers, namespace) == (hits + 1, misses)
+    result = write()
+    # The write paths may read through the cache themselves
+    hits, misses = _counts(client, admin_headers, namespace)
+    _get(client, url)
+    assert _counts(client, admin_headers, namespace) == (hits, misses + 1)
+    return result
+
+def _ok(response):
+    assert response.status_code < 300, response.text
+    return response
+
+def test_hit_after_miss(client, admin_headers, cache_on):
+    hits, misses = _counts(client, admin_headers, "movies")
+    first = _get(client, "/movies/?limit=3")
+    assert _counts(client, admin_headers, "movies") == (hits, misses + 1)
+    assert _get(client, "/movies/?limit=3") == first
+    assert _counts(client, admin_headers, "movies") == (hits + 1, misses + 1)
+    # Different parameters are a different entry
+    _get(client, "/movies/?limit=4")
+    assert _counts(client, admin_headers, "movies") == (hits + 1, misses + 2)
+
+def test_movie_writes_invalidate(client, admin_headers, cache_on):
+    movie = {"title": "Cache test", "description": "", "duration": 90, "poster_url": "", "release_date": "2031-01-01"}
+    created = _assert_invalidated(client, admin_headers, "movies", "/movies/?limit=1000", lambda: _ok(
+        client.post("/movies/", json=movie, headers=admin_headers)
+    ).json())
+    assert created["id"] in [m["id"] for m in _get(client, "/movies/?limit=1000")]
+
+def test_showtime_writes_invalidate(client, admin_headers, cache_on):
+    url = "/showtimes/?hall_id=2&start_from=2032-04-01T00:00:00&limit=1000"
+    showtime = {"movie_id": 1, "hall_id": 2, "start_time": "2032-04-01T10:00:00", "end_time": "2032-04-01T12:00:00", "price": 10}
+    created = _assert_invalidated(client, admin_headers, "showtimes", url, lambda: _ok(
+        client.post("/showtimes/", json=showtime, headers=admin_headers)
+    ).json())
+    assert [s["id"] for s in _get(client, url)] == [created["id"]]
+
+    moved = {**showtime, "start_time": "2032-04-01T14:00:00", "end_time": "2032-04-01T16:00:00"}
+    _assert_invalidated(client, admin_headers, "showtimes", url, lambda: _ok(
+        client.put(f"/showtimes/{created['id']}", json=moved, headers=admin_headers)
+    ))
+    assert [s["start_time"] for s in _get(client, url)] == ["2032-04-01T14:00:00"]
+
+    _assert_invalidated(client, admin_headers, "showtimes", url, lambda: _ok(
+        client.delete(f"/showtimes/{created['id']}", headers=admin_headers)
+    ))
+    assert _get(client, url) == []
+
+def test_hall_writes_invalidate(client, admin_headers, cache_on):
+    url = "/halls/?limit=1000"
+    created = _assert_invalidated(client, admin_headers, "halls", url, lambda: _ok(
+        client.post("/halls/", json=HALL, headers=admin_headers)
+    ).json())
+    renamed = {**HALL, "name": "Cache test hall, renamed"}
+    _assert_invalidated(client, admin_headers, "halls", url, lambda: _ok(
+        client.put(f"/halls/{created['id']}", json=renamed, headers=admin_headers)
+    ))
+    assert _get(client, f"/halls/{created['id']}")["name"] == renamed["name"]
+    _assert_invalidated(client, admin_headers, "halls", url, lambda: _ok(
+        client.delete(f"/halls/{created['id']}", headers=admin_headers)
+    ))
+    assert created["id"] not in [h["id"] for h in _get(client, url)]
+
+def test_upcoming_showtimes_not_cached(client, admin_headers, cache_on):
+    before = _counts(client, admin_headers, "showtimes")
+    _get(client, "/showtimes/?upcoming=true&limit=5")
+    _get(client, "/showtimes/?upcoming=true&limit=5")
+    assert _counts(client, admin_headers, "showtimes") == before
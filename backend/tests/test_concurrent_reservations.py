@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+
+# Concurrent bookings of overlapping seats: the UNIQUE(showtime_id, seat_id)
+# constraint on seat_claims lets exactly one reservation win each seat
+
+SHOWTIME_ID = 30
+REQUESTS = 300
+
+def test_no_double_bookings(client, user_headers):
+    seat_ids = [seat["id"] for seat in client.get(f"/showtime/{SHOWTIME_ID}/seats").json()[:20]]
+
+    def book(i):
+        # Pairs of neighbouring seats, so most requests overlap with others
+        seats = [seat_ids[i % 19], seat_ids[i % 19 + 1]]
+        return client.post("/reservations/", json={"showtime_id": SHOWTIME_ID, "seat_ids": seats}, headers=user_headers).status_code
+
+    with ThreadPoolExecutor(32) as executor:
+        statuses = list(executor.map(book, range(REQUESTS)))
+
+    assert set(statuses) <= {200, 409}
+    assert statuses.count(200) >= 1
+
+    from database import engine
+    with engine.connect() as connection:
+        double_booked = connection.execute(text(
+            "SELECT rs.seat_id FROM reservation_seats rs JOIN reservations r ON r.id = rs.reservation_id "
+            "WHERE r.showtime_id = :showtime_id AND r.payment_status NOT IN ('cancelled', 'expired') "
+            "GROUP BY rs.seat_id HAVING COUNT(*) > 1"
+        ), {"showtime_id": SHOWTIME_ID}).fetchall()
+        orphan_claims = connection.execute(text(
+            "SELECT c.id FROM seat_claims c LEFT JOIN reservation_seats rs "
+            "ON rs.reservation_id = c.reservation_id AND rs.seat_id = c.seat_id "
+            "WHERE c.showtime_id = :showtime_id AND rs.id IS NULL"
+        ), {"showtime_id": SHOWTIME_ID}).fetchall()
+        booked = connection.execute(text(
+            "SELECT COUNT(*) FROM reservations WHERE showtime_id = :showtime_id"
+        ), {"showtime_id": SHOWTIME_ID}).scalar()
+
+    assert double_booked == []
+    assert orphan_claims == []
+    assert booked == statuses.count(200)
+
+    # The seat map agrees with the database
+    reserved = [seat["id"] for seat in client.get(f"/showtime/{SHOWTIME_ID}/seats").json() if seat["is_reserved"]]
+    assert len(reserved) == 2 * statuses.count(200)
@@ -0,0 +1,50 @@
+import asyncio
+
+# Catalogue ETags: If-None-Match is answered with 304 until a write changes the
+# version, and a version that only this process can vouch for expires with the TTL
+
+MOVIE = {"title": "ETag test", "description": "", "duration": 90, "poster_url": "", "release_date": "2031-01-01"}
+
+def test_not_modified_until_write(client, admin_headers, cache_on):
+    response = client.get("/movies/?limit=1000")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"]
+
+    response = client.get("/movies/?limit=1000", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    # Weak and listed validators match too, other URLs have their own
+    assert client.get("/movies/?limit=1000", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/movies/?limit=999", headers={"If-None-Match": etag}).status_code == 200
+
+    response = client.post("/movies/", json=MOVIE, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    response = client.get("/movies/?limit=1000", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert MOVIE["title"] in [movie["title"] for movie in response.json()]
+
+def test_other_namespaces_unchanged(client, admin_headers, cache_on):
+    etag = client.get("/halls/?limit=1000").headers["ETag"]
+    response = client.post("/movies/", json=MOVIE, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert client.get("/halls/?limit=1000", headers={"If-None-Match": etag}).status_code == 304
+
+def test_no_etag_with_cache_off(client):
+    # Nothing tells this process about writes made by other workers
+    response = client.get("/movies/")
+    assert "ETag" not in response.headers
+    assert response.headers["Cache-Control"]
+    assert client.get("/movies/", headers={"If-None-Match": "*"}).status_code == 200
+
+def test_local_version_rolls_over_with_ttl(monkeypatch):
+    import cache
+    local = cache.Cache(cache.LocalBackend(16), ttl=60)
+    clock = [6000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: clock[0])
+    version = asyncio.run(local.version("movies"))
+    clock[0] += 59
+    assert asyncio.run(local.version("movies")) == version
+    clock[0] += 1
+    assert asyncio.run(local.version("movies")) != version
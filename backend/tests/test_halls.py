@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+
+# Updating a hall reconciles its seats with the new layout: kept seats keep
+# their ids, seats booked for a showtime that has not finished block the update,
+# and seats on past tickets stay as inactive rows
+
+def _hall(name: str, rows: int, seats_per_row: int, layout=None) -> dict:
+    return {"name": name, "capacity": rows * seats_per_row, "rows": rows, "seats_per_row": seats_per_row, "layout": layout}
+
+def _create_hall(client, admin_headers, rows: int, seats_per_row: int) -> int:
+    response = client.post("/halls/", json=_hall("Reconcile test", rows, seats_per_row), headers=admin_headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def _update(client, admin_headers, hall_id: int, hall: dict):
+    return client.put(f"/halls/{hall_id}", json=hall, headers=admin_headers)
+
+def _seats(hall_id: int) -> dict:
+    # (row, number) -> (id, is_active)
+    import models
+    from database import engine
+    with engine.connect() as connection:
+        rows = connection.execute(select(models.Seat.id, models.Seat.row, models.Seat.number, models.Seat.is_active).where(
+            models.Seat.hall_id == hall_id
+        ))
+        return {(row.row, row.number): (row.id, row.is_active) for row in rows}
+
+def _active(hall_id: int) -> set:
+    return {key for key, (_, is_active) in _seats(hall_id).items() if is_active}
+
+def _grid(rows: int, seats_per_row: int) -> set:
+    return {(row, number) for row in range(1, rows + 1) for number in range(1, seats_per_row + 1)}
+
+def _book(hall_id: int, seat_id: int, start: datetime, end: datetime):
+    # A booking with its seat claim, written directly so it can be in the past;
+    # the sales totals are rebuilt to take it in
+    import models
+    import sales
+    from database import engine
+    with engine.begin() as connection:
+        showtime_id = connection.execute(insert(models.Showtime).values(
+            movie_id=1, hall_id=hall_id, start_time=start, end_time=end, price=10
+        )).inserted_primary_key[0]
+        reservation_id = connection.execute(insert(models.Reservation).values(
+            user_id=1, showtime_id=showtime_id, payment_status="completed", created_at=datetime.utcnow(), amount=10
+        )).inserted_primary_key[0]
+        connection.execute(insert(models.ReservationSeat).values(reservation_id=reservation_id, seat_id=seat_id))
+        connection.execute(insert(models.SeatClaim).values(
+            showtime_id=showtime_id, seat_id=seat_id, reservation_id=reservation_id
+        ))
+        sales.rebuild(connection)
+
+def test_rows_and_seats_added_and_removed(client, admin_headers):
+    hall_id = _create_hall(client, admin_headers, 2, 3)
+    before = _seats(hall_id)
+
+    response = _update(client, admin_headers, hall_id, _hall("Reconcile test", 3, 4))
+    assert response.status_code == 200, response.text
+    after = _seats(hall_id)
+    assert set(after) == _grid(3, 4)
+    assert all(after[key] == before[key] for key in before)
+
+    response = _update(client, admin_headers, hall_id, _hall("Reconcile test", 1, 2))
+    assert response.status_code == 200, response.text
+    # Seats nobody booked are deleted
+    assert _seats(hall_id) == {key: before[key] for key in _grid(1, 2)}
+
+def test_layout_with_gaps(client, admin_headers):
+    hall_id = _create_hall(client, admin_headers, 2, 4)
+    response = _update(client, admin_headers, hall_id, _hall("Reconcile test", 0, 0, layout="SS.S/.SSSS"))
+    assert response.status_code == 200, response.text
+    assert (response.json()["rows"], response.json()["seats_per_row"], response.json()["capacity"]) == (2, 5, 7)
+    # Seats are numbered within their row, skipping gaps
+    assert _active(hall_id) == {(1, 1), (1, 2), (1, 3), (2, 1), (2, 2), (2, 3), (2, 4)}
+
+def test_past_tickets_keep_inactive_seats(client, admin_headers):
+    hall_id = _create_hall(client, admin_headers, 2, 2)
+    seat_id, _ = _seats(hall_id)[(2, 2)]
+    yesterday = datetime.now() - timedelta(days=1)
+    _book(hall_id, seat_id, yesterday, yesterday + timedelta(hours=2))
+
+    response = _update(client, admin_headers, hall_id, _hall("Reconcile test", 1, 2))
+    assert response.status_code == 200, response.text
+    seats = _seats(hall_id)
+    assert seats[(2, 2)] == (seat_id, False)
+    assert (2, 1) not in seats
+    assert _active(hall_id) == _grid(1, 2)
+
+    # Growing back revives the kept seat instead of adding a second one
+    response = _update(client, admin_headers, hall_id, _hall("Reconcile test", 2, 2))
+    assert response.status_code == 200, response.text
+    seats = _seats(hall_id)
+    assert seats[(2, 2)] == (seat_id, True)
+    assert set(seats) == _active(hall_id) == _grid(2, 2)
+
+def test_booked_seats_block_removal(client, admin_headers):
+    now = datetime.now()
+    for start, end in (
+        (now + timedelta(days=30), now + timedelta(days=30, hours=2)),  # upcoming
+        (now - timedelta(hours=1), now + timedelta(hours=1)),  # playing right now
+    ):
+        hall_id = _create_hall(client, admin_headers, 2, 2)
+        seat_id, _ = _seats(hall_id)[(2, 1)]
+        _book(hall_id, seat_id, start, end)
+        before = _seats(hall_id)
+
+        response = _update(client, admin_headers, hall_id, _hall("Reconcile test", 1, 2))
+        assert response.status_code == 400, response.text
+        assert "2-1" in response.json()["detail"]
+        assert _seats(hall_id) == before
+        assert client.get(f"/halls/{hall_id}").json()["rows"] == 2
+
+def test_invalid_geometry(client, admin_headers):
+    hall_id = _create_hall(client, admin_headers, 1, 1)
+    assert _update(client, admin_headers, hall_id, _hall("Reconcile test", 0, 3)).status_code == 400
+    assert _update(client, admin_headers, hall_id, _hall("Reconcile test", 1, 1, layout="SX")).status_code == 400
+    assert client.post("/halls/", json=_hall("Reconcile test", 2, 0), headers=admin_headers).status_code == 400
@@ -0,0 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from conftest import BACKEND, TEST_DIRECTORY
+
+# Every worker applies the migrations at startup; workers starting together
+# must take turns instead of racing each other
+
+WORKERS = 4
+
+APPLY = "import json, migrations; print(json.dumps(migrations.apply_migrations()))"
+
+@pytest.mark.skipif(bool(os.getenv("TEST_DATABASE_URL")), reason="needs an empty database per run")
+def test_workers_migrate_one_at_a_time():
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(TEST_DIRECTORY, 'migrations.db')}"}
+    workers = [
+        subprocess.Popen([sys.executable, "-c", APPLY], cwd=BACKEND, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for _ in range(WORKERS)
+    ]
+    results = []
+    for worker in workers:
+        stdout, stderr = worker.communicate(timeout=120)
+        assert worker.returncode == 0, stderr
+        results.append(json.loads(stdout.strip().splitlines()[-1]))
+
+    import migrations
+    everything = [version for version, _, _ in migrations.MIGRATIONS]
+    assert sorted(results, key=len) == [[]] * (WORKERS - 1) + [everything]
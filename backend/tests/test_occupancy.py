@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+
+# The in-memory seat occupancy index (occupancy.py)
+
+def _seat_ids(client, showtime_id, count):
+    return [seat["id"] for seat in client.get(f"/showtime/{showtime_id}/seats").json()[:count]]
+
+def test_change_during_load_is_kept(client):
+    # A reservation that commits after the load read the claims, but before the
+    # map is stored, must still show up in the map
+    from occupancy import OccupancyIndex
+    showtime_id = 50
+    seat_id = _seat_ids(client, showtime_id, 1)[0]
+    index = OccupancyIndex(cache=True)
+    load = index._load
+
+    async def load_then_commit(*args, **kwargs):
+        loaded = await load(*args, **kwargs)
+        index.mark_reserved(showtime_id, [seat_id])
+        return loaded
+
+    index._load = load_then_commit
+    occupancy = client.portal.call(index.get, showtime_id)
+    assert occupancy.is_reserved(seat_id)
+    assert index.showtimes[showtime_id] is occupancy
+    assert index.loading == {} and index.load_tasks == {}
+
+def test_drop_during_load_is_not_cached(client):
+    from occupancy import OccupancyIndex
+    showtime_id = 51
+    index = OccupancyIndex(cache=True)
+    load = index._load
+
+    async def load_then_drop(*args, **kwargs):
+        loaded = await load(*args, **kwargs)
+        index.drop_showtime(showtime_id)
+        return loaded
+
+    index._load = load_then_drop
+    assert client.portal.call(index.get, showtime_id) is not None
+    assert showtime_id not in index.showtimes
+
+def test_rebuild_skips_finished_showtimes(client):
+    import models
+    from database import engine
+    from occupancy import OccupancyIndex
+    started = datetime.now() - timedelta(days=2)
+    with engine.begin() as connection:
+        showtime_id = connection.execute(insert(models.Showtime).values(
+            movie_id=1, hall_id=1, start_time=started, end_time=started + timedelta(hours=2), price=10
+        )).inserted_primary_key[0]
+
+    index = OccupancyIndex(cache=True)
+    rebuilt_at = datetime.now()
+    client.portal.call(index.rebuild)
+    assert index.showtimes
+    assert showtime_id not in index.showtimes
+    assert all(o.ends_at >= rebuilt_at for o in index.showtimes.values())
+
+    # Loaded on demand, and evicted again once finished
+    assert client.portal.call(index.get, showtime_id) is not None
+    assert index.evict_finished() >= 1
+    assert showtime_id not in index.showtimes
+
+def test_seat_map_etag(client, user_headers):
+    # The ETag depends on the seats and claims only: a worker with its own index,
+    # or one loading maps from the database on every request, gives the same one
+    from occupancy import OccupancyIndex
+    showtime_id = 52
+    response = client.get(f"/showtime/{showtime_id}/seats")
+    etag = response.headers["ETag"]
+    assert client.get(f"/showtime/{showtime_id}/seats", headers={"If-None-Match": etag}).status_code == 304
+    for index in (OccupancyIndex(cache=True), OccupancyIndex(cache=False)):
+        assert client.portal.call(index.get, showtime_id).etag("list") == etag
+
+    seat_id = response.json()[0]["id"]
+    booked = client.post("/reservations/", json={"showtime_id": showtime_id, "seat_ids": [seat_id]}, headers=user_headers)
+    assert booked.status_code == 200, booked.text
+    changed = client.get(f"/showtime/{showtime_id}/seats", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert client.portal.call(OccupancyIndex(cache=False).get, showtime_id).etag("list") == changed.headers["ETag"]
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+# Keyset pagination: pages are followed through X-Next-Cursor
+
+def _all_pages(client, url, headers=None, **params):
+    rows, pages = [], 0
+    while True:
+        response = client.get(url, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        rows += response.json()
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return rows, pages
+        params["cursor"] = cursor
+
+def test_reservations_newest_first(client, user_headers):
+    for showtime_id in (61, 62, 63):
+        seat_id = client.get(f"/showtime/{showtime_id}/seats").json()[0]["id"]
+        response = client.post("/reservations/", json={"showtime_id": showtime_id, "seat_ids": [seat_id]}, headers=user_headers)
+        assert response.status_code == 200, response.text
+
+    rows, pages = _all_pages(client, "/users/me/reservations", user_headers, limit=2)
+    ids = [r["id"] for r in rows]
+    assert pages > 1
+    assert ids == sorted(ids, reverse=True)
+    assert len(set(ids)) == len(ids)
+    assert rows[0]["showtime_id"] == 63
+
+def test_upcoming_showtimes_pages(client):
+    rows, pages = _all_pages(client, "/showtimes/", movie_id=1, upcoming="true", limit=5)
+    assert pages > 1
+    now = datetime.now()
+    assert all(datetime.fromisoformat(r["start_time"]) >= now for r in rows)
+    keys = [(r["start_time"], r["id"]) for r in rows]
+    assert keys == sorted(keys) and len(set(keys)) == len(keys)
@@ -0,0 +1,49 @@
+import pytest
+
+# Nested payloads are built with batched loaders (loaders.py), so the number of
+# queries per request does not depend on the number of rows returned
+
+@pytest.fixture(scope="module")
+def reservations(client, user_headers):
+    ids = []
+    for showtime_id in range(10, 16):
+        seat_ids = _seat_ids(client, showtime_id, 2)
+        response = client.post("/reservations/", json={"showtime_id": showtime_id, "seat_ids": seat_ids}, headers=user_headers)
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+    return ids
+
+def _seat_ids(client, showtime_id, count):
+    return [seat["id"] for seat in client.get(f"/showtime/{showtime_id}/seats").json()[:count]]
+
+def test_showtime_list_queries(client, count_queries):
+    client.get("/showtimes/?limit=5")
+    small = len(count_queries)
+    count_queries.clear()
+    response = client.get("/showtimes/?limit=50")
+    assert len(response.json()) == 50
+    # showtimes, movies, halls
+    assert len(count_queries) == small == 3
+
+def test_user_reservations_queries(client, user_headers, reservations, count_queries):
+    response = client.get("/users/me/reservations?limit=2", headers=user_headers)
+    assert len(response.json()) == 2
+    small = len(count_queries)
+    count_queries.clear()
+    response = client.get("/users/me/reservations?limit=100", headers=user_headers)
+    assert len(response.json()) >= len(reservations)
+    # reservations, showtimes, movies, halls, seats
+    assert len(count_queries) == small == 5
+
+def test_seat_map_queries(client, count_queries):
+    import crud
+    crud.occupancy_index.drop_showtime(20)
+    client.get("/showtime/20/seats")
+    # showtime, hall and claims when the map is not loaded yet (the hall's seats
+    # are already known from the startup rebuild)
+    assert len(count_queries) == 3
+    count_queries.clear()
+    response = client.get("/showtime/20/seats")
+    assert len(response.json()) == 100
+    # served from the occupancy index
+    assert len(count_queries) == 0
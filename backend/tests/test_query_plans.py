@@ -0,0 +1,78 @@
+import re
+import pytest
+
+# EXPLAIN-based regression tests: the statements behind the hot endpoints must
+# find their rows through an index, not by scanning a whole table. On PostgreSQL
+# sequential scans are switched off for the EXPLAIN, so the planner picks an
+# index whenever one fits, even though the test tables are small.
+
+HOT_TABLES = ("showtimes", "seats", "reservations", "reservation_seats", "seat_claims", "refresh_tokens")
+
+# SQLite: "SCAN reservations" without "USING ... INDEX"; PostgreSQL: "Seq Scan on reservations"
+FULL_SCAN = re.compile(r"^(?:SCAN (\w+)(?!.*\bUSING\b)|.*Seq Scan on (\w+))")
+
+@pytest.fixture
+def statements(monkeypatch):
+    from database import database
+    captured = []
+    observe = database._observe
+
+    def capturing(query, values, started):
+        captured.append((query, values))
+        observe(query, values, started)
+
+    monkeypatch.setattr(database, "_observe", capturing)
+    return captured
+
+def _full_scans(query, values):
+    import tracing
+    from database import engine, IS_SQLITE
+    compiled, params = tracing._compile(query, values)
+    with engine.connect() as connection:
+        if not IS_SQLITE:
+            connection.exec_driver_sql("SET enable_seqscan = off")
+        plan = tracing._explain(compiled, params, connection)
+    scans = []
+    for line in plan:
+        match = FULL_SCAN.match(line.strip())
+        if match and (match.group(1) or match.group(2)) in HOT_TABLES:
+            scans.append(line.strip())
+    return str(compiled), scans
+
+def _assert_indexed(statements):
+    assert statements
+    problems = []
+    for query, values in statements:
+        sql, scans = _full_scans(query, values)
+        if scans and not sql.lstrip().upper().startswith("INSERT"):
+            problems.append(f"{scans}: {sql}")
+    assert problems == []
+
+def test_showtime_listing_plans(client, statements):
+    client.get("/showtimes/?movie_id=1&upcoming=true&limit=5")
+    client.get("/showtimes/?hall_id=1&limit=5")
+    _assert_indexed(statements)
+
+def test_seat_map_plans(client, statements):
+    import crud
+    crud.occupancy_index.drop_showtime(5)
+    assert client.get("/showtime/5/seats").status_code == 200
+    _assert_indexed(statements)
+
+def test_reservation_plans(client, user_headers, statements):
+    seat_id = client.get("/showtime/6/seats").json()[0]["id"]
+    response = client.post("/reservations/", json={"showtime_id": 6, "seat_ids": [seat_id]}, headers=user_headers)
+    assert response.status_code == 200, response.text
+    client.get("/users/me/reservations?limit=5", headers=user_headers)
+    client.get(f"/reservations/{response.json()['id']}", headers=user_headers)
+    _assert_indexed(statements)
+
+def test_hold_sweeper_plans(client, statements):
+    import crud
+    client.portal.call(crud.expire_seat_holds, 500)
+    _assert_indexed(statements)
+
+def test_admin_plans(client, admin_headers, statements):
+    client.get("/admin/statistics", headers=admin_headers)
+    client.get("/admin/analytics/occupancy?limit=5", headers=admin_headers)
+    _assert_indexed(statements)
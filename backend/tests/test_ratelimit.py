@@ -0,0 +1,118 @@
+import asyncio
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Rate limiting: route groups, the 429 and RateLimit-* headers, per-user and
+# per-IP buckets, refill and bucket eviction. The suite runs with limiting off,
+# so the middleware is put in front of a small app with its own limits
+
+def test_route_groups():
+    from ratelimit import route_group
+    assert route_group("POST", "/token") == "auth"
+    assert route_group("POST", "/users/") == "auth"
+    assert route_group("GET", "/users/me/reservations") == "reservations"
+    assert route_group("PATCH", "/reservations/5") == "reservations"
+    assert route_group("GET", "/showtime/5/seats") == "seats"
+    assert route_group("GET", "/admin/statistics") == "admin"
+    for method, path in (
+        ("POST", "/movies/"),
+        ("POST", "/showtimes/"), ("PUT", "/showtimes/5"), ("DELETE", "/showtimes/5"), ("POST", "/showtimes/import"),
+        ("POST", "/halls/"), ("POST", "/halls/bulk"), ("PUT", "/halls/2"), ("DELETE", "/halls/2"),
+    ):
+        assert route_group(method, path) == "admin", (method, path)
+    for path in ("/movies/", "/showtimes/5", "/halls/2"):
+        assert route_group("GET", path) == "default"
+    assert route_group("GET", "/metrics") is None
+
+@pytest.fixture
+def limited(client, monkeypatch):
+    # client: the app's tokens are decoded by main.rate_limit_client
+    import main
+    import ratelimit
+    limiter = ratelimit.RateLimiter(ratelimit.LocalBuckets(100), ratelimit._parse_limits("default=2/60,admin=1/60,auth=1/0.5"))
+    monkeypatch.setattr(ratelimit, "rate_limiter", limiter)
+
+    app = FastAPI()
+
+    @app.get("/movies/")
+    @app.post("/movies/")
+    @app.post("/token")
+    @app.get("/metrics")
+    async def endpoint():
+        return {}
+
+    limited_app = ratelimit.RateLimitMiddleware(app, identify=main.rate_limit_client)
+
+    async def with_client_ip(scope, receive, send):
+        # X-Test-IP stands in for the address of the client
+        ip = dict(scope.get("headers", [])).get(b"x-test-ip")
+        if ip:
+            scope = {**scope, "client": (ip.decode(), 50000)}
+        await limited_app(scope, receive, send)
+
+    return TestClient(with_client_ip)
+
+def test_limit_headers(limited):
+    first = limited.get("/movies/")
+    assert first.status_code == 200
+    assert (first.headers["RateLimit-Limit"], first.headers["RateLimit-Remaining"]) == ("2", "1")
+    assert first.headers["RateLimit-Policy"] == "2;w=60"
+    assert "Retry-After" not in first.headers
+    assert limited.get("/movies/").headers["RateLimit-Remaining"] == "0"
+
+    rejected = limited.get("/movies/")
+    assert rejected.status_code == 429
+    assert rejected.json() == {"detail": "Too many requests"}
+    assert rejected.headers["RateLimit-Remaining"] == "0"
+    # One token comes back every 30 s
+    assert 1 <= int(rejected.headers["Retry-After"]) <= 30
+    assert 1 <= int(rejected.headers["RateLimit-Reset"]) <= 60
+
+    # Exempt paths and other groups have buckets of their own
+    assert limited.get("/metrics").status_code == 200
+    assert "RateLimit-Limit" not in limited.get("/metrics").headers
+    assert limited.post("/movies/", headers={"X-Test-IP": "10.0.0.9"}).headers["RateLimit-Limit"] == "1"
+
+def test_per_user_and_per_ip(limited, user_headers, admin_headers):
+    for _ in range(2):
+        assert limited.get("/movies/", headers={"X-Test-IP": "10.0.0.1"}).status_code == 200
+    assert limited.get("/movies/", headers={"X-Test-IP": "10.0.0.1"}).status_code == 429
+    # Another address, and signed-in users on the same address, are counted apart
+    assert limited.get("/movies/", headers={"X-Test-IP": "10.0.0.2"}).status_code == 200
+    assert limited.get("/movies/", headers={"X-Test-IP": "10.0.0.1", **user_headers}).status_code == 200
+    assert limited.get("/movies/", headers={"X-Test-IP": "10.0.0.1", **admin_headers}).status_code == 200
+    # A user keeps their bucket from any address
+    assert limited.get("/movies/", headers={"X-Test-IP": "10.0.0.3", **user_headers}).status_code == 200
+    assert limited.get("/movies/", headers={"X-Test-IP": "10.0.0.4", **user_headers}).status_code == 429
+    # An invalid token counts against the address
+    assert limited.get("/movies/", headers={"X-Test-IP": "10.0.0.1", "Authorization": "Bearer nonsense"}).status_code == 429
+
+def test_refill(limited):
+    headers = {"X-Test-IP": "10.0.0.5"}
+    assert limited.post("/token", headers=headers).status_code == 200
+    rejected = limited.post("/token", headers=headers)
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "1"
+    time.sleep(0.6)
+    assert limited.post("/token", headers=headers).status_code == 200
+
+def test_bucket_eviction(monkeypatch):
+    import ratelimit
+    clock = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: clock[0])
+    buckets = ratelimit.LocalBuckets(max_buckets=2)
+    take = lambda key, window=10: asyncio.run(buckets.take(key, 5, window))
+
+    # Above the cap the least recently used bucket goes
+    take("a"), take("b"), take("a"), take("c")
+    assert list(buckets._buckets) == ["a", "c"]
+
+    # A bucket idle for a whole window is full again and dropped
+    clock[0] += 5
+    take("c")
+    clock[0] += 6
+    take("d")
+    assert list(buckets._buckets) == ["c", "d"]
+    assert take("a") == (True, 4)
@@ -0,0 +1,140 @@
+import itertools
+import pytest
+from sqlalchemy import select
+
+# The sales totals follow reservations in and out of "completed" and always
+# match what sales.rebuild() computes from the reservation history
+
+MOVIE_ID = 3
+PRICE = 12.5
+DAYS = itertools.count(1)
+
+def _aggregates() -> dict:
+    import models
+    from database import engine
+    table = models.SalesAggregate.__table__
+    with engine.connect() as connection:
+        rows = connection.execute(select(table.c.scope, table.c.key, table.c.revenue, table.c.tickets))
+        return {(row.scope, row.key): (round(row.revenue, 2), row.tickets) for row in rows}
+
+def _rollups() -> dict:
+    import models
+    from database import engine
+    table = models.SalesRollup.__table__
+    with engine.connect() as connection:
+        rows = connection.execute(select(table.c.day, table.c.showtime_id, table.c.movie_id, table.c.hall_id, table.c.revenue, table.c.seats))
+        return {(row.day, row.showtime_id): (row.movie_id, row.hall_id, round(row.revenue, 2), row.seats) for row in rows}
+
+def _nonzero(rows: dict) -> dict:
+    # Totals that dropped back to zero stay behind as rows; rebuild() leaves them out
+    return {key: value for key, value in rows.items() if value[-2:] != (0, 0)}
+
+def _rebuilt():
+    # What rebuild() would write, rolled back afterwards
+    import sales
+    from database import engine
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        sales.rebuild(connection)
+        aggregates = _read(connection, "sales_aggregates", "scope, key", "revenue, tickets")
+        rollups = _read(connection, "sales_rollups", "day, showtime_id", "movie_id, hall_id, revenue, seats")
+        transaction.rollback()
+    return aggregates, rollups
+
+def _read(connection, table: str, keys: str, values: str) -> dict:
+    from sqlalchemy import text
+    rows = connection.execute(text(f"SELECT {keys}, {values} FROM {table}"))
+    width = len(keys.split(","))
+    result = {}
+    for row in rows:
+        value = list(row[width:])
+        value[-2] = round(value[-2], 2)
+        result[tuple(row[:width])] = tuple(value)
+    return result
+
+def _assert_matches_rebuild():
+    aggregates, rollups = _rebuilt()
+    assert _nonzero(_aggregates()) == aggregates
+    assert _nonzero({(_date(day), showtime_id): value for (day, showtime_id), value in _rollups().items()}) == {
+        (_date(day), showtime_id): value for (day, showtime_id), value in rollups.items()
+    }
+
+def _date(day):
+    # SQLite hands back dates read with text() as strings
+    return day if isinstance(day, str) else day.isoformat()
+
+def _day_key(reservation_id: int) -> int:
+    import models
+    from database import engine
+    with engine.connect() as connection:
+        created_at = connection.execute(
+            select(models.Reservation.created_at).where(models.Reservation.id == reservation_id)
+        ).scalar()
+    return int(created_at.strftime("%Y%m%d"))
+
+@pytest.fixture
+def showtime_id(client, admin_headers):
+    # A day of its own in 2033 for every test
+    day = f"2033-05-{next(DAYS):02d}"
+    response = client.post("/showtimes/", json={
+        "movie_id": MOVIE_ID, "hall_id": 2, "start_time": f"{day}T18:00:00",
+        "end_time": f"{day}T20:00:00", "price": PRICE
+    }, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def _book(client, user_headers, showtime_id: int, seats: int) -> int:
+    seat_ids = [seat["id"] for seat in client.get(f"/showtime/{showtime_id}/seats").json() if not seat["is_reserved"]][:seats]
+    response = client.post("/reservations/", json={"showtime_id": showtime_id, "seat_ids": seat_ids}, headers=user_headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def _set_status(client, headers, reservation_id: int, payment_status: str):
+    response = client.patch(f"/reservations/{reservation_id}", json={"payment_status": payment_status}, headers=headers)
+    assert response.status_code == 200, response.text
+
+def _delta(before: dict, after: dict, key) -> tuple:
+    old = before.get(key, (0, 0))
+    new = after.get(key, (0, 0))
+    return round(new[0] - old[0], 2), new[1] - old[1]
+
+def test_status_changes(client, user_headers, admin_headers, showtime_id):
+    before = _aggregates()
+    reservation_id = _book(client, user_headers, showtime_id, 2)
+    # Pending bookings are not sales
+    assert _aggregates() == before
+
+    _set_status(client, admin_headers, reservation_id, "completed")
+    after = _aggregates()
+    day = _day_key(reservation_id)
+    for key in (("total", 0), ("movie", MOVIE_ID), ("showtime", showtime_id), ("day", day)):
+        assert _delta(before, after, key) == (2 * PRICE, 2), key
+    assert [value for (_, rollup_showtime), value in _rollups().items() if rollup_showtime == showtime_id] == [
+        (MOVIE_ID, 2, 2 * PRICE, 2)
+    ]
+    _assert_matches_rebuild()
+
+    # Completing again changes nothing, cancelling takes the sale back
+    _set_status(client, admin_headers, reservation_id, "completed")
+    assert _aggregates() == after
+    _set_status(client, user_headers, reservation_id, "cancelled")
+    after = _aggregates()
+    for key in (("total", 0), ("movie", MOVIE_ID), ("showtime", showtime_id), ("day", day)):
+        assert _delta(before, after, key) == (0, 0), key
+    _assert_matches_rebuild()
+
+def test_showtime_delete(client, user_headers, admin_headers, showtime_id):
+    before = _aggregates()
+    for seats in (1, 3):
+        _set_status(client, admin_headers, _book(client, user_headers, showtime_id, seats), "completed")
+    _book(client, user_headers, showtime_id, 1)
+    assert _delta(before, _aggregates(), ("movie", MOVIE_ID)) == (4 * PRICE, 4)
+
+    response = client.delete(f"/showtimes/{showtime_id}", headers=admin_headers)
+    assert response.status_code == 204, response.text
+    after = _aggregates()
+    assert ("showtime", showtime_id) not in after
+    assert not [key for key in _rollups() if key[1] == showtime_id]
+    assert _delta(before, after, ("movie", MOVIE_ID)) == (0, 0)
+    assert _delta(before, after, ("total", 0)) == (0, 0)
+    _assert_matches_rebuild()
@@ -0,0 +1,41 @@
+from datetime import datetime
+from sqlalchemy import insert
+
+# Schedule conflicts are found even when the hall already has overlapping
+# showtimes, e.g. a long one outlasting a later short one
+
+HALL_ID = 2
+DAY = datetime(2031, 3, 3)
+
+def _at(hour, minute=0):
+    return DAY.replace(hour=hour, minute=minute)
+
+def _showtime(start, end):
+    return {"movie_id": 1, "hall_id": HALL_ID, "start_time": start.isoformat(), "end_time": end.isoformat(), "price": 10}
+
+def test_conflict_with_long_showtime(client, admin_headers):
+    import models
+    from database import engine
+    # Overlapping rows from before the check existed: 10:00-16:00 and 11:00-12:00
+    with engine.begin() as connection:
+        long_id = connection.execute(insert(models.Showtime).values(
+            movie_id=1, hall_id=HALL_ID, start_time=_at(10), end_time=_at(16), price=10
+        )).inserted_primary_key[0]
+        connection.execute(insert(models.Showtime).values(
+            movie_id=1, hall_id=HALL_ID, start_time=_at(11), end_time=_at(12), price=10
+        ))
+
+    # 14:00 is after the short one but inside the long one
+    response = client.post("/showtimes/", json=_showtime(_at(14), _at(15)), headers=admin_headers)
+    assert response.status_code == 409, response.text
+    assert response.json()["detail"]["conflicting_showtime_id"] == long_id
+
+    response = client.post("/showtimes/import", json={
+        "showtimes": [_showtime(_at(14), _at(15))], "dry_run": True
+    }, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert [e["conflicting_showtime_id"] for e in response.json()["errors"]] == [long_id]
+
+    # After the long one plus the cleaning buffer is free
+    response = client.post("/showtimes/", json=_showtime(_at(16, 30), _at(18)), headers=admin_headers)
+    assert response.status_code == 200, response.text
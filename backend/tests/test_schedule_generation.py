@@ -0,0 +1,80 @@
+from collections import Counter
+from datetime import date, datetime, time
+import pytest
+
+# Schedules generated from weekly hall templates: weighted rotation, weekdays,
+# and the admin endpoint that checks and imports them
+
+START = date(2036, 6, 2)  # a Monday
+
+def _template(**values):
+    import schemas
+    return schemas.HallScheduleTemplate(**{
+        "hall_id": 3, "slots": [time(14, 0), time(18, 0)], "movies": {1: 3, 2: 1}, "price": 9.0, **values
+    })
+
+def test_rotation_weights():
+    from schedules import MovieRotation
+    rotation = MovieRotation({1: 3, 2: 1, 3: 0})
+    picks = [rotation.next() for _ in range(400)]
+    assert Counter(picks) == {1: 300, 2: 100}
+    # Every round of total weight holds each movie by its weight, not in long runs
+    for start in range(0, len(picks), 4):
+        assert Counter(picks[start:start + 4]) == {1: 3, 2: 1}
+
+    with pytest.raises(ValueError):
+        MovieRotation({1: 0})
+
+def test_generate_is_deterministic():
+    import schedules
+    templates = [_template(), _template(hall_id=2, movies={1: 1, 2: 1, 3: 2})]
+    first = schedules.generate(templates, START, days=14)
+    assert first == schedules.generate(templates, START, days=14)
+    assert len(first) == 2 * 14 * 2
+    # In template order, then by day and slot
+    assert [s.hall_id for s in first] == [3] * 28 + [2] * 28
+    assert first[0].start_time == datetime(2036, 6, 2, 14, 0)
+    assert Counter(s.movie_id for s in first[:28]) == {1: 21, 2: 7}
+
+def test_generate_weekdays():
+    import schedules
+    showtimes = schedules.generate([_template(days=[5, 6])], START, days=14)
+    assert {s.start_time.weekday() for s in showtimes} == {5, 6}
+    assert len(showtimes) == 4 * 2
+
+    for template, days in ((_template(days=[7]), 7), (_template(slots=[]), 7), (_template(), 0)):
+        with pytest.raises(ValueError):
+            schedules.generate([template], START, days=days)
+
+def test_generate_endpoint(client, admin_headers):
+    schedule = {
+        "start_date": START.isoformat(), "weeks": 1, "dry_run": True,
+        "templates": [{"hall_id": 3, "slots": ["14:00", "18:00"], "days": [0, 2, 4], "movies": {"1": 1, "2": 1}, "price": 9.0}],
+    }
+    listing = {"hall_id": 3, "start_from": START.isoformat(), "start_to": "2036-06-09", "limit": 100}
+
+    response = client.post("/admin/schedule/generate", json=schedule, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert response.json() == {"total": 6, "created": 0, "errors": []}
+    assert client.get("/showtimes/", params=listing).json() == []
+
+    response = client.post("/admin/schedule/generate", json={**schedule, "dry_run": False}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 6
+    created = client.get("/showtimes/", params=listing).json()
+    assert [(s["start_time"], s["movie_id"]) for s in created] == [
+        ("2036-06-02T14:00:00", 1), ("2036-06-02T18:00:00", 2),
+        ("2036-06-04T14:00:00", 1), ("2036-06-04T18:00:00", 2),
+        ("2036-06-06T14:00:00", 1), ("2036-06-06T18:00:00", 2),
+    ]
+
+    # Generating the same week again only reports the conflicts
+    response = client.post("/admin/schedule/generate", json=schedule, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 0
+    assert [e["conflicting_showtime_id"] for e in response.json()["errors"]] == [s["id"] for s in created]
+
+    response = client.post("/admin/schedule/generate", json={**schedule, "templates": [
+        {**schedule["templates"][0], "days": [9]}
+    ]}, headers=admin_headers)
+    assert response.status_code == 400
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+from sqlalchemy import text
+
+# Expired seat holds release their seats; a hold extended while the sweeper
+# runs must survive it
+
+SHOWTIME_ID = 60
+
+def _reserve(client, headers, seat_id):
+    response = client.post("/reservations/", json={"showtime_id": SHOWTIME_ID, "seat_ids": [seat_id]}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def _set_hold(reservation_id, expires_at):
+    from database import engine
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE reservations SET hold_expires_at = :expires_at WHERE id = :id"),
+                           {"expires_at": expires_at, "id": reservation_id})
+
+def test_extended_hold_is_not_expired(client, user_headers, monkeypatch):
+    import crud
+    from database import database
+    seats = client.get(f"/showtime/{SHOWTIME_ID}/seats").json()
+    expired_id = _reserve(client, user_headers, seats[0]["id"])
+    extended_id = _reserve(client, user_headers, seats[1]["id"])
+    past = datetime.utcnow() - timedelta(minutes=1)
+    _set_hold(expired_id, past)
+    _set_hold(extended_id, past)
+
+    # The hold is extended after the sweeper selected it, before its update
+    fetch_all = database.fetch_all
+    calls = []
+
+    async def extend_after_select(query, values=None):
+        rows = await fetch_all(query, values)
+        calls.append(query)
+        if len(calls) == 1:
+            _set_hold(extended_id, datetime.utcnow() + timedelta(minutes=10))
+        return rows
+
+    monkeypatch.setattr(database, "fetch_all", extend_after_select)
+    assert client.portal.call(crud.expire_seat_holds, 500) == 1
+    monkeypatch.undo()
+
+    statuses = {r["id"]: r["payment_status"] for r in client.get("/users/me/reservations?limit=100", headers=user_headers).json()}
+    assert statuses[expired_id] == "expired"
+    assert statuses[extended_id] == "pending"
+    taken = {seat["id"]: seat["is_reserved"] for seat in client.get(f"/showtime/{SHOWTIME_ID}/seats").json()}
+    assert not taken[seats[0]["id"]]
+    assert taken[seats[1]["id"]]
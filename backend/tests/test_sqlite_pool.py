@@ -0,0 +1,30 @@
+import asyncio
+import os
+from conftest import TEST_DIRECTORY
+
+# The tuned SQLite backend's connection pools hand connections out in FIFO order
+
+def test_released_connection_goes_to_the_first_waiter():
+    from sqlite_backend import SQLiteConnectionPool
+    pool = SQLiteConnectionPool(os.path.join(TEST_DIRECTORY, "pool.db"), 1, {})
+    order = []
+
+    async def waiter(name):
+        connection = await pool.acquire()
+        order.append(name)
+        await pool.release(connection)
+
+    async def run():
+        connection = await pool.acquire()
+        waiting = asyncio.create_task(waiter("waiter"))
+        await asyncio.sleep(0)
+        # Releasing and acquiring again without yielding must not jump the queue
+        await pool.release(connection)
+        connection = await pool.acquire()
+        order.append("again")
+        await pool.release(connection)
+        await waiting
+        await pool.close()
+
+    asyncio.run(run())
+    assert order == ["waiter", "again"]
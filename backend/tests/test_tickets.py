@@ -0,0 +1,12 @@
+import ticket_generator
+
+def test_ticket_renders_in_worker_process(client, user_headers):
+    seat_ids = [seat["id"] for seat in client.get("/showtime/40/seats").json()[:2]]
+    reservation = client.post("/reservations/", json={"showtime_id": 40, "seat_ids": seat_ids}, headers=user_headers).json()
+    client.patch(f"/reservations/{reservation['id']}", json={"payment_status": "completed"}, headers=user_headers)
+
+    response = client.get(f"/reservations/{reservation['id']}/ticket", headers=user_headers)
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF")
+    # The pool does not fork the (threaded) server process
+    assert ticket_generator._get_executor()._mp_context.get_start_method() != "fork"
@@ -0,0 +1,27 @@
+import json
+import os
+from conftest import TEST_DIRECTORY
+
+# The slow-query log is opt-in and written from a worker thread
+
+def test_slow_query_log_is_off_by_default(monkeypatch):
+    import tracing
+    assert tracing.SLOW_QUERY_LOG is None
+    submitted = []
+    monkeypatch.setattr(tracing.slow_query_log, "submit", lambda *args: submitted.append(args))
+    tracing.observe_query("SELECT 1", None, 10.0)
+    assert submitted == []
+
+def test_slow_query_log_writes_every_entry(client, monkeypatch):
+    import tracing
+    path = os.path.join(TEST_DIRECTORY, "slow_queries.log")
+    monkeypatch.setattr(tracing, "SLOW_QUERY_LOG", path)
+    log = tracing._SlowQueryLog()
+    for i in range(200):
+        log.submit({"n": i}, "SELECT 1", None)
+    log.shutdown()
+    assert log.pending == 0
+    with open(path) as f:
+        entries = [json.loads(line) for line in f]
+    assert sorted(entry["n"] for entry in entries) == list(range(200))
+    assert any(entry["plan"] for entry in entries)
@@ -1,8 +1,16 @@
 import io
+import os
+import asyncio
+import multiprocessing
+import hashlib
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A6
 from reportlab.lib import colors
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Image
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Image, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, cm
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
@@ -10,16 +18,13 @@ from datetime import datetime
 import qrcode
 from io import BytesIO
 
-async def generate_ticket_pdf(reservation, showtime, movie, hall, seats):
-    # Создаем буфер для PDF
-    buffer = io.BytesIO()
-    
-    # Используем A6 для размера билета (как карточка)
-    doc = SimpleDocTemplate(buffer, pagesize=A6, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
-    
-    elements = []
-    
-    # Настройка стилей
+# Rendering runs in a process pool; rendered PDFs are cached by content
+TICKET_RENDER_WORKERS = int(os.getenv("TICKET_RENDER_WORKERS", "2"))
+TICKET_CACHE_MAX_BYTES = int(os.getenv("TICKET_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+@lru_cache(maxsize=None)
+def get_ticket_styles():
+    # Built once per worker process
     styles = getSampleStyleSheet()
     # Use custom style names that don't conflict with built-in styles
     styles.add(ParagraphStyle(
@@ -43,13 +48,22 @@ async def generate_ticket_pdf(reservation, showtime, movie, hall, seats):
         alignment=TA_CENTER,
         spaceAfter=8
     ))
-    
+    return styles
+
+def _new_document(buffer):
+    # Используем A6 для размера билета (как карточка)
+    return SimpleDocTemplate(buffer, pagesize=A6, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
+
+def _ticket_elements(reservation, showtime, movie, hall, seats):
+    elements = []
+    styles = get_ticket_styles()
+
     # Заголовок билета
     elements.append(Paragraph("CINEMA TICKET", styles['TicketTitle']))
-    
+
     # Информация о фильме
     elements.append(Paragraph(movie['title'], styles['TicketMovieTitle']))
-    
+
     # Информация о сеансе
     # Handle different datetime string formats
     if isinstance(showtime['start_time'], str):
@@ -59,18 +73,18 @@ async def generate_ticket_pdf(reservation, showtime, movie, hall, seats):
             show_date = datetime.strptime(showtime['start_time'], "%Y-%m-%dT%H:%M:%S")
     else:
         show_date = showtime['start_time']  # Already a datetime object
-        
+
     date_str = show_date.strftime("%d %B %Y")
     time_str = show_date.strftime("%H:%M")
-    
+
     elements.append(Paragraph(f"Date: {date_str}", styles['TicketNormal']))
     elements.append(Paragraph(f"Time: {time_str}", styles['TicketNormal']))
     elements.append(Paragraph(f"Hall: {hall['name']}", styles['TicketNormal']))
-    
+
     # Информация о местах
     seat_info = ", ".join([f"Row {seat['row']} / Seat {seat['number']}" for seat in seats])
     elements.append(Paragraph(f"Seats: {seat_info}", styles['TicketNormal']))
-    
+
     # Генерируем QR код с информацией о билете
     qr = qrcode.QRCode(
         version=1,
@@ -81,24 +95,135 @@ async def generate_ticket_pdf(reservation, showtime, movie, hall, seats):
     qr_data = f"ID:{reservation['id']}\nMovie:{movie['title']}\nDate:{date_str}\nTime:{time_str}\nHall:{hall['name']}\nSeats:{seat_info}"
     qr.add_data(qr_data)
     qr.make(fit=True)
-    
+
     img = qr.make_image(fill_color="black", back_color="white")
-    
+
     # Сохраняем QR код во временный файл
     qr_buffer = BytesIO()
     img.save(qr_buffer)
     qr_buffer.seek(0)
-    
+
     # Add the QR code image to the PDF
     elements.append(Spacer(1, 0.2 * inch))
     qr_img = Image(qr_buffer, 1.5*inch, 1.5*inch)
     qr_img.hAlign = 'CENTER'
     elements.append(qr_img)
-    
+
+    return elements
+
+def render_ticket_pdf(reservation, showtime, movie, hall, seats) -> bytes:
+    # Создаем буфер для PDF
+    buffer = io.BytesIO()
+    doc = _new_document(buffer)
+
     # Сгенерировать документ
+    doc.build(_ticket_elements(reservation, showtime, movie, hall, seats))
+    return buffer.getvalue()
+
+def render_tickets_pdf(reservations) -> bytes:
+    # Все билеты в одном многостраничном PDF, по одному билету на страницу
+    buffer = io.BytesIO()
+    doc = _new_document(buffer)
+
+    elements = []
+    for reservation in reservations:
+        if elements:
+            elements.append(PageBreak())
+        showtime = reservation["showtime"]
+        elements.extend(_ticket_elements(
+            reservation, showtime, showtime["movie"], showtime["hall"], reservation["seats"]
+        ))
+
     doc.build(elements)
-    
-    # Получаем содержимое буфера
+    return buffer.getvalue()
+
+# Process pool
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # Not fork: the server already runs threads (log queue, slow-query log,
+        # bcrypt pool) and a forked child could inherit one of their locks held
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _executor = ProcessPoolExecutor(
+            max_workers=TICKET_RENDER_WORKERS,
+            initializer=get_ticket_styles,
+            mp_context=multiprocessing.get_context(start_method)
+        )
+    return _executor
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+async def _render(func, *args) -> bytes:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), func, *args)
+
+# Rendered ticket cache: LRU bounded by total size in bytes
+class TicketCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        pdf = self._items.get(key)
+        if pdf is not None:
+            self._items.move_to_end(key)
+        return pdf
+
+    def put(self, key, pdf: bytes):
+        if len(pdf) > self.max_bytes:
+            return
+        if key in self._items:
+            self.size -= len(self._items.pop(key))
+        self._items[key] = pdf
+        self.size += len(pdf)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+ticket_cache = TicketCache(TICKET_CACHE_MAX_BYTES)
+
+def _content_hash(showtime, movie, hall, seats) -> str:
+    # Everything printed on the ticket, so edits to the showtime/movie/hall produce a new entry
+    content = repr((
+        str(showtime['start_time']), movie['title'], hall['name'],
+        [(seat['row'], seat['number']) for seat in seats]
+    ))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+async def get_ticket_bytes(reservation, showtime, movie, hall, seats) -> bytes:
+    key = (reservation['id'], _content_hash(showtime, movie, hall, seats))
+    pdf = ticket_cache.get(key)
+    if pdf is None:
+        pdf = await _render(render_ticket_pdf, dict(reservation), showtime, movie, hall, seats)
+        ticket_cache.put(key, pdf)
+    return pdf
+
+async def generate_ticket_pdf(reservation, showtime, movie, hall, seats):
+    pdf = await get_ticket_bytes(reservation, showtime, movie, hall, seats)
+    return io.BytesIO(pdf)
+
+async def generate_tickets_pdf(reservations):
+    pdf = await _render(render_tickets_pdf, reservations)
+    return io.BytesIO(pdf)
+
+async def generate_tickets_zip(reservations):
+    pdfs = await asyncio.gather(*[
+        get_ticket_bytes(
+            reservation, reservation["showtime"], reservation["showtime"]["movie"],
+            reservation["showtime"]["hall"], reservation["seats"]
+        )
+        for reservation in reservations
+    ])
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for reservation, pdf in zip(reservations, pdfs):
+            archive.writestr(f"ticket_{reservation['id']}.pdf", pdf)
     buffer.seek(0)
     return buffer
-
@@ -0,0 +1,209 @@
+import contextvars
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from sqlalchemy import text
+import logs
+
+# Query tracing and the slow-query log.
+# - Tracing is opt-in per request: QUERY_TRACE=1 traces every request, otherwise a
+#   request is traced when it sends "X-Query-Trace: <QUERY_TRACE_TOKEN>". A traced
+#   request records every statement with its parameters, duration and the
+#   function that issued it; the response gets a short summary in the
+#   X-Query-Trace header and the full list goes to the log.
+# - With SLOW_QUERY_LOG set to a file path, statements slower than SLOW_QUERY_MS
+#   are appended, traced or not, to that rotating JSON-lines file together with
+#   their query plan. The plan is fetched with EXPLAIN on a worker thread (sync
+#   engine), so the request is not delayed.
+
+QUERY_TRACE = os.getenv("QUERY_TRACE", "0") == "1"
+QUERY_TRACE_TOKEN = os.getenv("QUERY_TRACE_TOKEN")
+QUERY_TRACE_HEADER = "x-query-trace"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))  # 0 turns the slow-query log off
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG")  # unset: no slow-query log
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+# Slow queries waiting for their plan; beyond this they are logged without one
+SLOW_QUERY_MAX_PENDING = 16
+
+# Frames skipped when looking for the function that issued a query
+_INFRASTRUCTURE = ("database", "tracing", "metrics", "cache", "databases", "sqlalchemy", "asyncio", "contextlib")
+
+logger = logs.get_logger("tracing")
+
+class Trace:
+    def __init__(self):
+        self.queries = []
+
+    def summary(self) -> str:
+        # count, total time and the functions with the most query time
+        functions = {}
+        for query in self.queries:
+            count, total = functions.get(query["function"], (0, 0.0))
+            functions[query["function"]] = (count + 1, total + query["duration_ms"])
+        top = sorted(functions.items(), key=lambda item: -item[1][1])[:5]
+        total = sum(query["duration_ms"] for query in self.queries)
+        return f"queries={len(self.queries)}; total_ms={total:.2f}; " + ", ".join(
+            f"{function}={count}x/{milliseconds:.2f}ms" for function, (count, milliseconds) in top
+        )
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+def _caller() -> str:
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_INFRASTRUCTURE):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+def _compile(query, values):
+    from database import engine
+    if isinstance(query, str):
+        query = text(query).bindparams(**values) if values else text(query)
+        values = None
+    # IN lists are expanded into the SQL; columns left to defaults come out as None
+    compiled = query.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    return compiled, compiled.construct_params(values, _check=False) if values else compiled.params
+
+class _SlowQueryLog:
+    def __init__(self):
+        self.executor = None
+        self.logger = None
+        # Changed by the event loop (submit) and the writer thread (_done)
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-log")
+        self.logger = logging.getLogger("slow_queries")
+        self.logger.propagate = False
+        handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_MAX_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+
+    def submit(self, entry: dict, query, values) -> None:
+        if self.executor is None:
+            self.start()
+        with self.lock:
+            explain = self.pending < SLOW_QUERY_MAX_PENDING
+            self.pending += 1
+        future = self.executor.submit(self._write, entry, query, values, explain)
+        future.add_done_callback(self._done)
+
+    def _done(self, future) -> None:
+        with self.lock:
+            self.pending -= 1
+
+    def _write(self, entry: dict, query, values, explain: bool) -> None:
+        try:
+            compiled, params = _compile(query, values)
+            entry["sql"] = str(compiled)
+            entry["params"] = params
+            entry["plan"] = _explain(compiled, params) if explain else None
+        except Exception as e:
+            entry["plan_error"] = str(e)
+        self.logger.info(json.dumps(logs.redact(entry), default=str, ensure_ascii=False))
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+slow_query_log = _SlowQueryLog()
+
+def _explain(compiled, params: dict, connection=None):
+    from database import engine, IS_SQLITE
+    processors = compiled._bind_processors
+    processed = {key: processors[key](value) if key in processors else value for key, value in params.items()}
+    if compiled.positional:
+        processed = tuple(processed[key] for key in compiled.positiontup)
+    sql = ("EXPLAIN QUERY PLAN " if IS_SQLITE else "EXPLAIN ") + str(compiled)
+    if connection is not None:
+        return [row[-1] for row in connection.exec_driver_sql(sql, processed)]
+    with engine.connect() as connection:
+        # The last column is the plan line on both SQLite and PostgreSQL
+        return [row[-1] for row in connection.exec_driver_sql(sql, processed)]
+
+def observe_query(query, values, seconds: float) -> None:
+    # Called by the Database wrapper after every statement
+    trace = current_trace.get()
+    slow = SLOW_QUERY_LOG and SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS
+    if trace is None and not slow:
+        return
+    function = _caller()
+    rows = None
+    if isinstance(values, list):
+        # execute_many: the first row stands for the batch
+        rows = len(values)
+        values = values[0] if values else None
+    if trace is not None:
+        try:
+            compiled, params = _compile(query, values)
+            sql = str(compiled)
+        except Exception as e:
+            # Never fail the query because of the tracer
+            sql, params = f"<not compiled: {e}>", values
+        trace.queries.append({
+            "function": function,
+            "sql": sql,
+            "params": params,
+            "rows": rows,
+            "duration_ms": round(seconds * 1000, 3),
+        })
+    if slow:
+        slow_query_log.submit({
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "request_id": logs.request_id.get(),
+            "route": logs.route.get(),
+            "function": function,
+            "rows": rows,
+            "duration_ms": round(seconds * 1000, 3),
+        }, query, values)
+
+def _requested(scope) -> bool:
+    if QUERY_TRACE:
+        return True
+    if not QUERY_TRACE_TOKEN:
+        return False
+    for name, value in scope["headers"]:
+        if name == QUERY_TRACE_HEADER.encode():
+            return secrets.compare_digest(value, QUERY_TRACE_TOKEN.encode())
+    return False
+
+class QueryTraceMiddleware:
+    # ASGI middleware: traces opted-in requests, adds the X-Query-Trace summary and logs the statements
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            return await self.app(scope, receive, send)
+        trace = Trace()
+        token = current_trace.set(trace)
+
+        async def send_with_summary(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-query-trace", trace.summary().encode("latin-1", "replace"))
+                ]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_summary)
+        finally:
+            current_trace.reset(token)
+            logger.info("Query trace", extra={
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "queries": trace.queries,
+            })
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import api from '../../services/api';
+import api, { getAllPages, revalidate } from '../../services/api';
 import { useLanguage } from '../../context/LanguageContext';
 
 const HallsManagement = () => {
@@ -23,8 +23,7 @@ const HallsManagement = () => {
   const fetchHalls = async () => {
     try {
       setLoading(true);
-      const response = await api.get('/halls/');
-      setHalls(response.data);
+      setHalls(await getAllPages('/halls/', revalidate));
       setLoading(false);
     } catch (err) {
       console.error('Error fetching halls:', err);
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import api from '../../services/api';
+import api, { getAllPages, revalidate } from '../../services/api';
 import { useLanguage } from '../../context/LanguageContext';
 
 const MoviesManagement = () => {
@@ -26,8 +26,7 @@ const MoviesManagement = () => {
   const fetchMovies = async () => {
     try {
       setLoading(true);
-      const response = await api.get('/movies/');
-      setMovies(response.data);
+      setMovies(await getAllPages('/movies/', revalidate));
       setLoading(false);
     } catch (err) {
       console.error('Error fetching movies:', err);
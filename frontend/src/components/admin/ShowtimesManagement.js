@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import api from '../../services/api';
+import api, { getAllPages, revalidate } from '../../services/api';
 import { useLanguage } from '../../context/LanguageContext';
 import { format } from 'date-fns';
 
@@ -23,15 +23,15 @@ const ShowtimesManagement = () => {
     const fetchData = async () => {
       try {
         setLoading(true);
-        const [showtimesRes, moviesRes, hallsRes] = await Promise.all([
-          api.get('/showtimes/'),
-          api.get('/movies/'),
-          api.get('/halls/')
+        const [showtimesList, moviesList, hallsList] = await Promise.all([
+          getAllPages('/showtimes/', revalidate),
+          getAllPages('/movies/', revalidate),
+          getAllPages('/halls/', revalidate)
         ]);
         
-        setShowtimes(showtimesRes.data);
-        setMovies(moviesRes.data);
-        setHalls(hallsRes.data);
+        setShowtimes(showtimesList);
+        setMovies(moviesList);
+        setHalls(hallsList);
         setLoading(false);
       } catch (err) {
         console.error('Error fetching data:', err);
@@ -99,13 +99,13 @@ const ShowtimesManagement = () => {
       }
 
       // Refresh the list of showtimes
-      const response = await api.get('/showtimes/');
-      setShowtimes(response.data);
+      setShowtimes(await getAllPages('/showtimes/', revalidate));
       
       handleCloseModal();
     } catch (err) {
       console.error('Error saving showtime:', err);
-      setError('Failed to save showtime');
+      // 409: the hall is already booked at that time
+      setError(err.response?.data?.detail?.message || 'Failed to save showtime');
     }
   };
 
@@ -116,8 +116,7 @@ const ShowtimesManagement = () => {
       await api.delete(`/showtimes/${id}`);
       
       // Refresh the list
-      const response = await api.get('/showtimes/');
-      setShowtimes(response.data);
+      setShowtimes(await getAllPages('/showtimes/', revalidate));
     } catch (err) {
       console.error('Error deleting showtime:', err);
       setError('Failed to delete showtime');
@@ -1,6 +1,7 @@
 import React, { createContext, useState, useContext, useEffect } from 'react';
 import jwt_decode from 'jwt-decode';
 import axios from 'axios';
+import { authApi } from '../services/api';
 
 const AuthContext = createContext();
 
@@ -19,7 +20,8 @@ export const AuthProvider = ({ children }) => {
         const decoded = jwt_decode(token);
         const currentTime = Date.now() / 1000;
 
-        if (decoded.exp > currentTime) {
+        // An expired access token is renewed on the first API call while the refresh token is valid
+        if (decoded.exp > currentTime || localStorage.getItem('refreshToken')) {
           setCurrentUser({
             id: decoded.user_id,
             username: decoded.sub,
@@ -30,9 +32,11 @@ export const AuthProvider = ({ children }) => {
         } else {
           // Token expired
           localStorage.removeItem('token');
+          localStorage.removeItem('refreshToken');
         }
       } catch (error) {
         localStorage.removeItem('token');
+        localStorage.removeItem('refreshToken');
       }
     }
     setLoading(false);
@@ -55,10 +59,11 @@ export const AuthProvider = ({ children }) => {
       console.log('Login response:', response.data);
       
       if (response.data && response.data.access_token) {
-        const { access_token } = response.data;
+        const { access_token, refresh_token } = response.data;
         console.log('Login successful, token received');
         
         localStorage.setItem('token', access_token);
+        localStorage.setItem('refreshToken', refresh_token);
         
         const decoded = jwt_decode(access_token);
         console.log('Decoded token:', decoded);
@@ -83,7 +88,12 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    // Revoke the session server-side; the local tokens go either way
+    if (localStorage.getItem('token') || localStorage.getItem('refreshToken')) {
+      authApi.logout().catch(() => {});
+    }
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
     setCurrentUser(null);
     setIsAuthenticated(false);
     setIsAdmin(false);
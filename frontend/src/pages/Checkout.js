@@ -19,6 +19,12 @@ const Checkout = () => {
         const response = await api.get(`/reservations/${reservationId}`);
         setReservation(response.data);
         setLoading(false);
+
+        // Opening checkout extends the seat hold
+        if (response.data.payment_status === 'pending') {
+          const holdResponse = await api.post(`/reservations/${reservationId}/hold`);
+          setReservation(holdResponse.data);
+        }
       } catch (err) {
         setError(t("checkout.fetchError"));
         setLoading(false);
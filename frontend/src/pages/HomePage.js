@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { useLanguage } from '../context/LanguageContext';
-import api from '../services/api';
+import { getAllPages } from '../services/api';
 
 const HomePage = () => {
   const { t } = useLanguage();
@@ -14,18 +14,18 @@ const HomePage = () => {
     const fetchMovies = async () => {
       try {
         setLoading(true);
-        const response = await api.get('/movies');
-        console.log('Movies API response:', response.data);
+        const moviesList = await getAllPages('/movies/');
+        console.log('Movies API response:', moviesList);
         
         // First try to get movies that are now showing
-        let nowShowingMovies = response.data
+        let nowShowingMovies = moviesList
           .filter(movie => movie.now_showing)
           .slice(0, 5);
         
         // If no "now showing" movies found, just display the latest 5 movies
         if (nowShowingMovies.length === 0) {
           console.log('No movies marked as "now_showing", displaying latest movies instead');
-          nowShowingMovies = response.data
+          nowShowingMovies = moviesList
             .sort((a, b) => new Date(b.release_date) - new Date(a.release_date))
             .slice(0, 5);
         }
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { format } from 'date-fns';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { useAuth } from '../context/AuthContext';
 import { useLanguage } from '../context/LanguageContext';
 
@@ -28,14 +28,14 @@ const MovieDetails = () => {
         console.log("Fetched movie data:", movieResponse.data); // Debug log
         setMovie(movieResponse.data);
         
-        // Fetch showtimes for this movie
-        const showtimesResponse = await api.get(`/showtimes/?movie_id=${id}`);
-        console.log("Fetched showtimes:", showtimesResponse.data); // Debug log
-        setShowtimes(showtimesResponse.data);
+        // Fetch upcoming showtimes for this movie
+        const showtimesList = await getAllPages('/showtimes/', { params: { movie_id: id, upcoming: true } });
+        console.log("Fetched showtimes:", showtimesList); // Debug log
+        setShowtimes(showtimesList);
         
         // Set the first date as selected if showtimes exist
-        if (showtimesResponse.data.length > 0) {
-          const dates = [...new Set(showtimesResponse.data.map(st => 
+        if (showtimesList.length > 0) {
+          const dates = [...new Set(showtimesList.map(st => 
             format(new Date(st.start_time), 'yyyy-MM-dd')
           ))].sort();
           setSelectedDate(dates[0]);
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { useLanguage } from '../context/LanguageContext';
-import api from '../services/api';
+import { getAllPages } from '../services/api';
 import LoadingSpinner from '../components/LoadingSpinner';
 
 const Movies = () => {
@@ -35,8 +35,7 @@ const Movies = () => {
         
         // You might need to update the API endpoint according to your backend structure
         // For example: `/movies/?genre=${filters.genre}&sort=${filters.sortBy}`
-        const response = await api.get('/movies/');
-        setMovies(response.data);
+        setMovies(await getAllPages('/movies/'));
         setLoading(false);
       } catch (err) {
         console.error('Error fetching movies:', err);
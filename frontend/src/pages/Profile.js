@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useLocation } from 'react-router-dom';
 import { format } from 'date-fns';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { useAuth } from '../context/AuthContext';
 import { useLanguage } from '../context/LanguageContext';
 
@@ -20,8 +20,8 @@ const Profile = () => {
     }
     const fetchReservations = async () => {
       try {
-        const response = await api.get('/users/me/reservations');
-        setReservations(response.data);
+        // Newest first
+        setReservations(await getAllPages('/users/me/reservations'));
         setLoading(false);
       } catch (err) {
         setError(t("profile.fetchError") || 'Failed to load your reservations');
@@ -22,9 +22,8 @@ const SeatSelection = () => {
         setSeats(seatsResponse.data);
         
         // Get showtime details
-        const showtimeResponse = await api.get(`/showtimes/`);
-        const showtime = showtimeResponse.data.find(s => s.id === parseInt(showtimeId));
-        setShowtimeDetails(showtime);
+        const showtimeResponse = await api.get(`/showtimes/${showtimeId}`);
+        setShowtimeDetails(showtimeResponse.data);
         
         setLoading(false);
       } catch (err) {
@@ -36,6 +35,46 @@ const SeatSelection = () => {
     fetchData();
   }, [showtimeId, t]);
 
+  // Live seat availability updates
+  useEffect(() => {
+    const source = new EventSource(`${api.defaults.baseURL}/showtime/${showtimeId}/seats/stream`);
+
+    const applyReserved = (reservedIds) => {
+      setSeats(prevSeats => prevSeats.map(seat => (
+        reservedIds.has(seat.id) !== seat.is_reserved ? { ...seat, is_reserved: reservedIds.has(seat.id) } : seat
+      )));
+      setSelectedSeats(prevSelected => prevSelected.filter(id => !reservedIds.has(id)));
+    };
+
+    const applyDelta = (seatIds, isReserved) => {
+      const changed = new Set(seatIds);
+      setSeats(prevSeats => prevSeats.map(seat => (
+        changed.has(seat.id) ? { ...seat, is_reserved: isReserved } : seat
+      )));
+      if (isReserved) {
+        setSelectedSeats(prevSelected => prevSelected.filter(id => !changed.has(id)));
+      }
+    };
+
+    source.addEventListener('snapshot', (event) => {
+      // Bit i of the mask (least significant bit first) is position i in seat_ids
+      const seatMap = JSON.parse(event.data);
+      const mask = atob(seatMap.reserved_mask);
+      const reservedIds = new Set();
+      seatMap.seat_ids.forEach((seatId, position) => {
+        if (seatId !== null && (mask.charCodeAt(position >> 3) >> (position & 7)) & 1) {
+          reservedIds.add(seatId);
+        }
+      });
+      applyReserved(reservedIds);
+    });
+    source.addEventListener('seat-taken', (event) => applyDelta(JSON.parse(event.data).seat_ids, true));
+    source.addEventListener('seat-freed', (event) => applyDelta(JSON.parse(event.data).seat_ids, false));
+    source.addEventListener('showtime-removed', () => source.close());
+
+    return () => source.close();
+  }, [showtimeId]);
+
   const handleSeatSelect = (seat) => {
     if (seat.is_reserved) return;
     
@@ -7,6 +7,26 @@ const api = axios.create({
   }
 });
 
+// Admin screens must see their own edits: revalidate instead of using the browser cache
+export const revalidate = { headers: { 'Cache-Control': 'no-cache' } };
+
+// List endpoints return one page at a time (oldest first, 100 rows by default) and
+// the cursor of the next page in X-Next-Cursor; this follows the cursors and
+// returns every row
+const MAX_PAGE_SIZE = 1000;
+
+export const getAllPages = async (url, config = {}) => {
+  const rows = [];
+  let cursor = null;
+  do {
+    const params = { limit: MAX_PAGE_SIZE, ...config.params, ...(cursor ? { cursor } : {}) };
+    const response = await api.get(url, { ...config, params });
+    rows.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return rows;
+};
+
 // Special config for authentication
 export const authApi = {
   login: (username, password) => {
@@ -21,6 +41,15 @@ export const authApi = {
     });
   },
   
+  logout: () => {
+    // The refresh token identifies the session even after the access token has expired
+    const token = localStorage.getItem('token');
+    const refreshToken = localStorage.getItem('refreshToken');
+    return axios.post('http://localhost:8000/logout', refreshToken ? { refresh_token: refreshToken } : null, {
+      headers: token ? { 'Authorization': `Bearer ${token}` } : {}
+    });
+  },
+
   register: (username, email, password) => {
     return axios.post('http://localhost:8000/users/', {
       username,
@@ -46,6 +75,27 @@ api.interceptors.request.use(
   }
 );
 
+// Access tokens are short-lived: on a 401 swap the refresh token for a new pair
+// once and retry; concurrent requests share one refresh
+let refreshing = null;
+
+const refreshTokens = () => {
+  if (!refreshing) {
+    const refreshToken = localStorage.getItem('refreshToken');
+    refreshing = (refreshToken
+      ? axios.post('http://localhost:8000/token/refresh', { refresh_token: refreshToken })
+      : Promise.reject(new Error('No refresh token'))
+    ).then((response) => {
+      localStorage.setItem('token', response.data.access_token);
+      localStorage.setItem('refreshToken', response.data.refresh_token);
+      return response.data.access_token;
+    }).finally(() => {
+      refreshing = null;
+    });
+  }
+  return refreshing;
+};
+
 // Handle token expiration and debug responses
 api.interceptors.response.use(
   (response) => {
@@ -56,11 +106,23 @@ api.interceptors.response.use(
     }
     return response;
   },
-  (error) => {
+  async (error) => {
     console.error('API Error Response:', error.response?.status, error.config?.url, error.message);
     if (error.response && error.response.status === 401) {
+      const config = error.config;
+      if (config && !config._retried) {
+        config._retried = true;
+        try {
+          const token = await refreshTokens();
+          config.headers['Authorization'] = `Bearer ${token}`;
+          return api(config);
+        } catch (refreshError) {
+          console.warn('Token refresh failed');
+        }
+      }
       console.warn('Unauthorized access, clearing token');
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
       window.location = '/login';
     }
     return Promise.reject(error);